@@ -0,0 +1,51 @@
+import glob
+import os
+import time
+
+from writing_tensile_utils import parse_tensile_file, read_tensile_file
+
+# get path to data/ folder
+path_to_tensile_folder = "../../../data/tensile/"
+
+
+def find_sample_files(path_to_tensile_folder):
+    """
+    Every sample file in the tensile folder (one folder per material)
+    :param path_to_tensile_folder: Path to the data/tensile folder
+    :return: Sorted list of paths to sample CSV files
+    """
+    return sorted(glob.glob(os.path.join(path_to_tensile_folder, "*", "*.csv")))
+
+
+def time_parser(parser, paths, repeats=5):
+    """
+    Time how long a parser takes to read every file
+    :param parser: Function that takes a path to a sample file
+    :param paths: List of paths to sample files
+    :param repeats: Number of runs; the fastest is kept
+    :return: Best time to parse all the files (seconds)
+    """
+    best = float('inf')
+
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for path in paths:
+            parser(path)
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+if __name__ == "__main__":
+
+    paths = find_sample_files(path_to_tensile_folder)
+
+    # total number of data rows, to report throughput
+    rows = sum(len(read_tensile_file(path)[1]) for path in paths)
+
+    print("Files: ", len(paths), "\tRows: ", rows)
+    print("Parser|\t\t\tTime (ms)|\tRows per second")
+
+    for name, parser in [('parse_tensile_file', parse_tensile_file), ('read_tensile_file', read_tensile_file)]:
+        seconds = time_parser(parser, paths)
+        print(name, "|\t", round(seconds * 1000, 2), "|\t", int(rows / seconds))
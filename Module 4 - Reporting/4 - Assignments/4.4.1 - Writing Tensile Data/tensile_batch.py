@@ -0,0 +1,217 @@
+import glob
+import hashlib
+import inspect
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import writing_tensile_utils
+from writing_tensile_utils import read_tensile_file, calculate_stress, calculate_max_strength_strain, \
+    calculate_elastic_modulus, calculate_yield_strength, MaterialSample
+from tensile_results_store import TensileResultsStore
+
+# get path to data/ folder
+default_path_to_tensile_folder = "../../../data/tensile/"
+
+# name of the cache written to the tensile folder
+cache_name = "analysis_cache.json"
+
+# bump when the cache layout changes; changes to the analysis code are picked up by analysis_hash()
+CACHE_VERSION = 2
+
+# results stored for each sample, in the order they are written to the CSV file
+result_fields = ['tensile_strength', 'fracture_strain', 'elastic_modulus', 'yield_strength']
+
+
+def find_samples(path_to_tensile_folder=default_path_to_tensile_folder):
+    """
+    Find every sample file. Each folder in the tensile folder is a different material.
+    :param path_to_tensile_folder: Path to the data/tensile folder
+    :return: List of (sample name, material type, path to sample file), sorted by material then name
+    """
+    samples = list()
+
+    for path_to_sample in sorted(glob.glob(os.path.join(path_to_tensile_folder, "*", "*.csv"))):
+        material = os.path.basename(os.path.dirname(path_to_sample))
+        name = os.path.basename(path_to_sample).split(".")[0]
+        samples.append((name, material, path_to_sample))
+
+    return samples
+
+
+def file_hash(path_to_file):
+    """
+    SHA-256 of a file's contents, so a re-exported file with the same data is not analyzed again
+    """
+    with open(path_to_file, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def analysis_hash():
+    """
+    SHA-256 of the code that produces each result: writing_tensile_utils.py and analyze_sample().
+    Editing either one, e.g. filling in calculate_stress(), throws away every cached result.
+    """
+    with open(writing_tensile_utils.__file__, 'rb') as file:
+        source = file.read()
+
+    return hashlib.sha256(source + inspect.getsource(analyze_sample).encode()).hexdigest()
+
+
+def analyze_sample(path_to_sample):
+    """
+    Run the full tensile analysis on one sample file
+    :param path_to_sample: Path to an MTS tensile export (CSV)
+    :return: Dictionary of tensile strength (MPa), fracture strain, elastic modulus (GPa), and yield strength (MPa)
+    """
+    metadata, time, displacement, force, strain = read_tensile_file(path_to_sample)
+
+    stress = calculate_stress(force, metadata["Gage Diameter"])
+
+    ultimate_tensile_strength, fracture_strain = calculate_max_strength_strain(strain, stress)
+
+    # Use the Secant Modulus at 40% of Peak Stress to determine elastic modulus
+    linear_index, slope, intercept = calculate_elastic_modulus(strain, stress)
+
+    yield_strength = calculate_yield_strength(strain, stress, slope)
+
+    return {'tensile_strength': float(ultimate_tensile_strength), 'fracture_strain': float(fracture_strain),
+            'elastic_modulus': float(slope / 1000), 'yield_strength': float(yield_strength)}
+
+
+def make_sample(name, material, result):
+    """
+    Build a MaterialSample from an analysis result
+    :param name: Sample name
+    :param material: Material type
+    :param result: Dictionary returned by analyze_sample()
+    :return: MaterialSample
+    """
+    sample = MaterialSample()
+    sample.name = name
+    sample.material_type = material
+
+    for field in result_fields:
+        setattr(sample, field, result[field])
+
+    return sample
+
+
+def read_cache(path_to_tensile_folder=default_path_to_tensile_folder):
+    """
+    Read the cached analysis results
+    :param path_to_tensile_folder: Path to the data/tensile folder
+    :return: Dictionary of file hash to analysis result; empty if there is no usable cache
+    """
+    try:
+        with open(os.path.join(path_to_tensile_folder, cache_name)) as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return dict()
+
+    if not isinstance(cache, dict) or cache.get('version') != CACHE_VERSION or \
+            cache.get('analysis') != analysis_hash():
+        return dict()
+
+    return cache.get('results', dict())
+
+
+def write_cache(results, path_to_tensile_folder=default_path_to_tensile_folder):
+    """
+    Replace the cached analysis results in one step
+    :param results: Dictionary of file hash to analysis result
+    :param path_to_tensile_folder: Path to the data/tensile folder
+    :return: Path of the cache
+    """
+    cache_path = os.path.join(path_to_tensile_folder, cache_name)
+    temporary_path = cache_path + ".tmp"
+
+    with open(temporary_path, 'w') as file:
+        json.dump({'version': CACHE_VERSION, 'analysis': analysis_hash(), 'results': results}, file, indent=2,
+                  sort_keys=True)
+    os.replace(temporary_path, cache_path)
+
+    return cache_path
+
+
+def run_batch(path_to_tensile_folder=default_path_to_tensile_folder, workers=None, force=False):
+    """
+    Analyze every sample in the tensile folder, one sample per worker process. Samples whose
+    file contents have already been analyzed by the same analysis code are taken from the cache.
+    :param path_to_tensile_folder: Path to the data/tensile folder
+    :param workers: Number of worker processes. None uses one per CPU core; 1 runs serially.
+    :param force: Analyze every sample even if it is in the cache
+    :return:
+    results: list of MaterialSample, sorted by material then name; failed samples are left out
+    status: dictionary with the names of the samples that were 'analyzed', 'cached', and 'failed'
+    """
+    samples = find_samples(path_to_tensile_folder)
+    hashes = [file_hash(path_to_sample) for name, material, path_to_sample in samples]
+
+    cache = dict() if force else read_cache(path_to_tensile_folder)
+
+    # the same contents may appear under more than one name; only analyze them once
+    stale = dict()
+    for (name, material, path_to_sample), digest in zip(samples, hashes):
+        if digest not in cache:
+            stale.setdefault(digest, path_to_sample)
+    stale = list(stale.items())
+
+    if workers == 1:
+        outcomes = list()
+        for digest, path_to_sample in stale:
+            try:
+                outcomes.append(analyze_sample(path_to_sample))
+            except Exception as e:
+                outcomes.append(e)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(analyze_sample, path_to_sample) for digest, path_to_sample in stale]
+            outcomes = [f.exception() or f.result() for f in futures]
+
+    errors = dict()
+    for (digest, path_to_sample), outcome in zip(stale, outcomes):
+        if isinstance(outcome, Exception):
+            errors[digest] = type(outcome).__name__ + ": " + str(outcome)
+        else:
+            cache[digest] = outcome
+
+    analyzed = set(digest for digest, path_to_sample in stale)
+    status = {'analyzed': list(), 'cached': list(), 'failed': dict()}
+    results = list()
+
+    for (name, material, path_to_sample), digest in zip(samples, hashes):
+        if digest in errors:
+            status['failed'][name] = errors[digest]
+            continue
+
+        status['analyzed' if digest in analyzed else 'cached'].append(name)
+        results.append(make_sample(name, material, cache[digest]))
+
+    # only keep results for files that are still in the folder
+    write_cache({digest: cache[digest] for digest in set(hashes) if digest in cache}, path_to_tensile_folder)
+
+    return results, status
+
+
+if __name__ == "__main__":
+
+    # number of worker processes; None will use every core
+    workers = None
+
+    start = time.perf_counter()
+    results, status = run_batch(workers=workers)
+
+    print("Analyzed: ", len(status['analyzed']), status['analyzed'])
+    print("Cached:   ", len(status['cached']), status['cached'])
+    for name, error in status['failed'].items():
+        print("Failed:   ", name, error)
+
+    # bring tensile_data.csv up to date with the results (see tensile_results_store.py). Rather
+    # than writing the whole file again, new samples are appended, samples whose results changed
+    # are replaced, and samples that are no longer in data/tensile are removed
+    changes = TensileResultsStore('tensile_data.csv').sync(results)
+
+    print("Added: ", changes['added'], "\tReplaced: ", changes['replaced'], "\tRemoved: ", changes['removed'])
+    print("Total time (s): ", round(time.perf_counter() - start, 2))
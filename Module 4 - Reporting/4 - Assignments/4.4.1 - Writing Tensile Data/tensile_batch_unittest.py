@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from tensile_batch import run_batch, analyze_sample, read_cache, cache_name
+
+# path to tensile folder
+path_to_tensile_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../data/tensile/")
+
+
+class TestRunBatch(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+        # two materials with two samples each
+        for material, names in [('1045CR', ['C01A1045CR_1', 'C02A1045CR_1']), ('PMMA', ['C01APMMA_1', 'C02APMMA_1'])]:
+            os.mkdir(os.path.join(self.folder, material))
+            for name in names:
+                shutil.copy(os.path.join(path_to_tensile_folder, material, name + ".csv"),
+                            os.path.join(self.folder, material, name + ".csv"))
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_results(self):
+        results, status = run_batch(self.folder, workers=1)
+
+        self.assertEqual([r.name for r in results], ['C01A1045CR_1', 'C02A1045CR_1', 'C01APMMA_1', 'C02APMMA_1'])
+        self.assertEqual([r.material_type for r in results], ['1045CR', '1045CR', 'PMMA', 'PMMA'])
+        self.assertEqual(len(status['analyzed']), 4)
+
+        expected = analyze_sample(os.path.join(self.folder, 'PMMA', 'C02APMMA_1.csv'))
+        self.assertEqual(results[3].yield_strength, expected['yield_strength'])
+        self.assertEqual(results[3].elastic_modulus, expected['elastic_modulus'])
+
+    def test_only_changed_files_analyzed(self):
+        run_batch(self.folder, workers=1)
+
+        results, status = run_batch(self.folder, workers=1)
+        self.assertEqual(status['analyzed'], [])
+        self.assertEqual(len(status['cached']), 4)
+
+        # a new sample and a changed sample are the only ones analyzed
+        shutil.copy(os.path.join(path_to_tensile_folder, '1045CR', 'C03A1045CR_1.csv'),
+                    os.path.join(self.folder, '1045CR', 'C03A1045CR_1.csv'))
+        shutil.copy(os.path.join(path_to_tensile_folder, 'PMMA', 'C03APMMA_1.csv'),
+                    os.path.join(self.folder, 'PMMA', 'C01APMMA_1.csv'))
+
+        results, status = run_batch(self.folder, workers=2)
+        self.assertEqual(sorted(status['analyzed']), ['C01APMMA_1', 'C03A1045CR_1'])
+        self.assertEqual(len(read_cache(self.folder)), 5)
+
+    def test_failed_sample(self):
+        with open(os.path.join(self.folder, 'PMMA', 'C09APMMA_1.csv'), 'w') as file:
+            file.write('"Time","Force"\n(s),(kN)\n"a","b","c","d"\n')
+
+        results, status = run_batch(self.folder, workers=1)
+
+        self.assertEqual(list(status['failed']), ['C09APMMA_1'])
+        self.assertEqual(len(results), 4)
+
+    def test_old_cache_ignored(self):
+        run_batch(self.folder, workers=1)
+
+        with open(os.path.join(self.folder, cache_name), 'w') as file:
+            file.write('{"results": {}}')
+
+        self.assertEqual(read_cache(self.folder), dict())
+        results, status = run_batch(self.folder, workers=1)
+        self.assertEqual(len(status['analyzed']), 4)
+
+    def test_analysis_change_invalidates(self):
+        run_batch(self.folder, workers=1)
+        self.assertEqual(len(read_cache(self.folder)), 4)
+
+        # editing the analysis code, e.g. calculate_stress(), analyzes every sample again
+        with mock.patch('tensile_batch.analysis_hash', return_value='edited'):
+            self.assertEqual(read_cache(self.folder), dict())
+            results, status = run_batch(self.folder, workers=1)
+            self.assertEqual(len(status['analyzed']), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,197 @@
+import glob
+import os
+import time
+
+import numpy as np
+
+from writing_tensile_utils import read_tensile_file, calculate_stress, calculate_max_strength_strain, \
+    calculate_elastic_modulus
+
+
+def stack_samples(arrays, fill=0.0):
+    """
+    Stack 1-D arrays of different lengths into one 2-D array, one row per sample
+    :param arrays: List of 1-D arrays
+    :param fill: Value placed after the end of each shorter row
+    :return:
+    padded: 2-D array of shape (samples, longest length)
+    lengths: array with the length of each row
+    """
+    lengths = np.asarray([len(a) for a in arrays], dtype=np.intp)
+
+    padded = np.full((len(arrays), lengths.max(initial=0)), fill, dtype=float)
+    for row, a in enumerate(arrays):
+        padded[row, :len(a)] = a
+
+    return padded, lengths
+
+
+def length_mask(lengths, width):
+    """
+    Which entries of a padded 2-D array hold real data
+    :param lengths: Array with the length of each row
+    :param width: Number of columns in the padded array
+    :return: Boolean array of shape (rows, width)
+    """
+    return np.arange(width) < np.asarray(lengths)[:, None]
+
+
+def batch_stress(force, sample_diameters):
+    """
+    calculate_stress() for every sample at once
+    :param force: Padded 2-D array of forces (kN), one row per sample
+    :param sample_diameters: Array with the diameter of each sample (mm)
+    :return: Padded 2-D array of stresses (MPa); padding stays at force's fill value times the scale
+    """
+    cross_sectional_area = np.pi * (np.asarray(sample_diameters, dtype=float) / 2) ** 2
+
+    return force / cross_sectional_area[:, None] * 1000
+
+
+def batch_max_strength_strain(strain, stress, lengths):
+    """
+    calculate_max_strength_strain() for every sample at once; padding is never picked
+    :param strain: Padded 2-D array of strain, one row per sample
+    :param stress: Padded 2-D array of stress (MPa)
+    :param lengths: Array with the length of each row
+    :return:
+    Ultimate Tensile Stress: array with the maximum stress of each sample
+    Fracture Strain: array with the maximum strain of each sample
+    """
+    mask = length_mask(lengths, stress.shape[1])
+
+    ultimate_tensile_stress = np.max(stress, axis=1, where=mask, initial=-np.inf)
+    fracture_strain = np.max(strain, axis=1, where=mask, initial=-np.inf)
+
+    return ultimate_tensile_stress, fracture_strain
+
+
+def batch_secant_index(stress, lengths, ultimate_tensile_stress, fraction=0.40):
+    """
+    The linear_index of calculate_elastic_modulus() for every sample at once: the point closest
+    to a fraction of the peak stress, found with a masked argmin over each row
+    :param stress: Padded 2-D array of stress (MPa)
+    :param lengths: Array with the length of each row
+    :param ultimate_tensile_stress: Array with the maximum stress of each sample
+    :param fraction: Fraction of the peak stress that ends the linear region. Default is 0.40
+    :return: Array with the linear index of each sample
+    """
+    mask = length_mask(lengths, stress.shape[1])
+
+    diffs = np.abs(stress - (ultimate_tensile_stress * fraction)[:, None])
+    diffs[~mask] = np.inf
+
+    return np.argmin(diffs, axis=1)
+
+
+def batch_linear_fit(strain, stress, stop):
+    """
+    Least squares line through the first stop points of every sample, the same as running
+    np.polyfit(strain[:stop], stress[:stop], 1) on each row. Uses the closed form of a straight
+    line fit, with sums taken about each row's mean for accuracy.
+    :param strain: Padded 2-D array of strain, one row per sample
+    :param stress: Padded 2-D array of stress (MPa)
+    :param stop: Array with the number of points to fit in each row; at least 2 per row
+    :return:
+    slope: array with the slope of each fit
+    intercept: array with the y-intercept of each fit
+    """
+    stop = np.asarray(stop)
+
+    # a line needs two points; fewer would divide by zero and quietly give NaN
+    too_short = np.flatnonzero(stop <= 1)
+    if len(too_short) > 0:
+        raise ValueError("rows " + str(too_short.tolist()) + " have fewer than 2 points to fit (stop = " +
+                         str(stop[too_short].tolist()) + ")")
+
+    mask = length_mask(stop, strain.shape[1])
+    count = np.count_nonzero(mask, axis=1)
+
+    mean_strain = np.sum(strain, axis=1, where=mask) / count
+    mean_stress = np.sum(stress, axis=1, where=mask) / count
+
+    dx = strain - mean_strain[:, None]
+    dy = stress - mean_stress[:, None]
+
+    slope = np.sum(dx * dy, axis=1, where=mask) / np.sum(dx * dx, axis=1, where=mask)
+    intercept = mean_stress - slope * mean_strain
+
+    return slope, intercept
+
+
+def analyze_cohort(strains, forces, sample_diameters, fraction=0.40):
+    """
+    Stress, UTS, fracture strain, secant index, and elastic modulus for many samples at once,
+    e.g. every sample of one material
+    :param strains: List of strain arrays (mm/mm), one per sample
+    :param forces: List of force arrays (kN), one per sample
+    :param sample_diameters: List of sample diameters (mm)
+    :param fraction: Fraction of the peak stress that ends the linear region. Default is 0.40
+    :return: Dictionary of arrays, one entry per sample: 'tensile_strength', 'fracture_strain',
+    'linear_index', 'slope', 'intercept', and 'elastic_modulus' (GPa); plus the padded 'strain'
+    and 'stress' and the row 'lengths'
+    """
+    strain, lengths = stack_samples(strains)
+    force, lengths = stack_samples(forces)
+
+    stress = batch_stress(force, sample_diameters)
+
+    tensile_strength, fracture_strain = batch_max_strength_strain(strain, stress, lengths)
+    linear_index = batch_secant_index(stress, lengths, tensile_strength, fraction)
+    slope, intercept = batch_linear_fit(strain, stress, linear_index)
+
+    return {'tensile_strength': tensile_strength, 'fracture_strain': fracture_strain, 'linear_index': linear_index,
+            'slope': slope, 'intercept': intercept, 'elastic_modulus': slope / 1000,
+            'strain': strain, 'stress': stress, 'lengths': lengths}
+
+
+def load_material(path_to_material_folder):
+    """
+    Read every sample of one material
+    :param path_to_material_folder: Path to a material's folder in data/tensile
+    :return:
+    names: list of sample names
+    strains: list of strain arrays (mm/mm)
+    forces: list of force arrays (kN)
+    sample_diameters: list of sample diameters (mm)
+    """
+    names, strains, forces, sample_diameters = list(), list(), list(), list()
+
+    for path_to_sample in sorted(glob.glob(os.path.join(path_to_material_folder, "*.csv"))):
+        metadata, time, displacement, force, strain = read_tensile_file(path_to_sample)
+
+        names.append(os.path.basename(path_to_sample).split(".")[0])
+        strains.append(strain)
+        forces.append(force)
+        sample_diameters.append(metadata["Gage Diameter"])
+
+    return names, strains, forces, sample_diameters
+
+
+if __name__ == "__main__":
+
+    # get path to data/ folder
+    path_to_tensile_folder = "../../../data/tensile/"
+
+    # each folder in data/ is a different material
+    for path_to_material_folder in sorted(glob.glob(os.path.join(path_to_tensile_folder, "*", ""))):
+        names, strains, forces, sample_diameters = load_material(path_to_material_folder)
+
+        start = time.perf_counter()
+        cohort = analyze_cohort(strains, forces, sample_diameters)
+        cohort_seconds = time.perf_counter() - start
+
+        # the same steps one sample at a time
+        start = time.perf_counter()
+        moduli = list()
+        for strain, force, sample_diameter in zip(strains, forces, sample_diameters):
+            stress = calculate_stress(force, sample_diameter)
+            calculate_max_strength_strain(strain, stress)
+            linear_index, slope, intercept = calculate_elastic_modulus(strain, stress)
+            moduli.append(slope / 1000)
+        serial_seconds = time.perf_counter() - start
+
+        print("Material: ", os.path.basename(os.path.dirname(path_to_material_folder)), "\tSamples: ", len(names))
+        print("\tBatched (ms): ", round(cohort_seconds * 1000, 3), "\tOne at a time (ms): ",
+              round(serial_seconds * 1000, 3))
+        print("\tLargest modulus difference (GPa): ", np.max(np.abs(cohort['elastic_modulus'] - moduli)))
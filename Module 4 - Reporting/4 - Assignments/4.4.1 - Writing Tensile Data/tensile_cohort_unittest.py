@@ -0,0 +1,59 @@
+import glob
+import os
+import unittest
+import numpy as np
+from tensile_cohort import stack_samples, batch_linear_fit, analyze_cohort, load_material
+from writing_tensile_utils import calculate_stress, calculate_max_strength_strain, calculate_elastic_modulus
+
+# path to tensile folder
+path_to_tensile_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../data/tensile/")
+
+
+class TestCohort(unittest.TestCase):
+    def test_stack_samples(self):
+        padded, lengths = stack_samples([np.asarray([1.0, 2.0, 3.0]), np.asarray([4.0])], fill=-1)
+
+        np.testing.assert_array_equal(padded, [[1, 2, 3], [4, -1, -1]])
+        np.testing.assert_array_equal(lengths, [3, 1])
+
+    def test_linear_fit_matches_polyfit(self):
+        rng = np.random.default_rng(0)
+        lengths = rng.integers(5, 200, size=20)
+        strains = [np.cumsum(rng.random(n)) * 1e-4 for n in lengths]
+        stresses = [200000 * x + 5 + rng.standard_normal(len(x)) for x in strains]
+
+        strain, lengths = stack_samples(strains)
+        stress, lengths = stack_samples(stresses)
+        stop = lengths - rng.integers(0, 4, size=len(lengths))
+
+        slope, intercept = batch_linear_fit(strain, stress, stop)
+
+        for i in range(len(strains)):
+            expected = np.polyfit(strains[i][:stop[i]], stresses[i][:stop[i]], 1)
+            np.testing.assert_allclose((slope[i], intercept[i]), expected, rtol=1e-9, atol=1e-9)
+
+    def test_linear_fit_too_few_points(self):
+        strain, lengths = stack_samples([np.arange(5.0), np.arange(5.0), np.arange(5.0)])
+
+        with self.assertRaisesRegex(ValueError, r"rows \[0, 2\]"):
+            batch_linear_fit(strain, 2 * strain, [1, 3, 0])
+
+    def test_matches_one_sample_at_a_time(self):
+        for path_to_material_folder in sorted(glob.glob(os.path.join(path_to_tensile_folder, "*", ""))):
+            names, strains, forces, sample_diameters = load_material(path_to_material_folder)
+            cohort = analyze_cohort(strains, forces, sample_diameters)
+
+            for i, (strain, force, sample_diameter) in enumerate(zip(strains, forces, sample_diameters)):
+                stress = calculate_stress(force, sample_diameter)
+                tensile_strength, fracture_strain = calculate_max_strength_strain(strain, stress)
+                linear_index, slope, intercept = calculate_elastic_modulus(strain, stress)
+
+                self.assertEqual(cohort['lengths'][i], len(strain))
+                self.assertAlmostEqual(cohort['tensile_strength'][i], tensile_strength, places=9)
+                self.assertEqual(cohort['fracture_strain'][i], fracture_strain)
+                self.assertEqual(cohort['linear_index'][i], linear_index)
+                self.assertAlmostEqual(cohort['elastic_modulus'][i], slope / 1000, places=9)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,223 @@
+import glob
+import os
+import time
+
+import numpy as np
+
+from writing_tensile_utils import read_tensile_file, calculate_stress, calculate_elastic_modulus, \
+    calculate_yield_strength
+
+
+# number of samples summarized by each entry of a LoadingBranch's envelope, and scanned at a time
+default_block_size = 4096
+
+
+class LoadingBranch:
+    """
+    The loading part of a stress-strain curve, from the start of the test up to the Ultimate
+    Tensile Stress. Intersections are only looked for here, so a point after necking, where the
+    stress falls back through the same values, can never be picked.
+
+    The data is not copied. One pass over the branch stores the running maximum of each block of
+    block_size samples, so the extra memory is 1 / block_size of the branch (about 20 KB for
+    10 million samples). Finding where the curve first reaches a stress is a binary search over
+    the blocks and a scan of one block; finding where it crosses an offset line scans forward from
+    the start a block at a time, so only the samples up to the crossing are looked at.
+    """
+
+    def __init__(self, strain, stress, block_size=default_block_size):
+        """
+        Find the loading branch of a test
+        :param strain: An array of Strain data (mm/mm)
+        :param stress: An array of Stress data (MPa)
+        :param block_size: Number of samples summarized by each entry of the envelope
+        """
+        self.strain = np.asarray(strain)
+        self.stress = np.asarray(stress)
+        self.block_size = block_size
+
+        self.uts_index = int(np.argmax(self.stress))
+
+        # running max at the end of each block; never decreases, so it can be searched. The first
+        # block it reaches a stress in holds the first sample that does
+        starts = np.arange(0, self.uts_index + 1, block_size)
+        self.envelope = np.maximum.accumulate(np.maximum.reduceat(self.stress[:self.uts_index + 1], starts))
+
+    def stress_crossing(self, target):
+        """
+        Find where the curve first reaches a stress
+        :param target: Stress to look for (MPa); must not be more than the UTS
+        :return:
+        index: the sample closest to target of the two either side of the crossing
+        position: fractional sample index of the crossing, by linear interpolation
+        """
+        block = int(np.searchsorted(self.envelope, target, side='left'))
+
+        if block == len(self.envelope):
+            raise ValueError("stress " + str(target) + " is above the ultimate tensile stress")
+
+        begin = block * self.block_size
+        end = min(begin + self.block_size, self.uts_index + 1)
+        i = begin + int(np.argmax(self.stress[begin:end] >= target))
+
+        if i == 0:
+            return 0, 0.0
+
+        # nothing before i reaches target, so stress[i - 1] < target <= stress[i]
+        low = self.stress[i - 1]
+        high = self.stress[i]
+
+        index = i if high - target < target - low else i - 1
+
+        return index, i - 1 + (target - low) / (high - low)
+
+    def offset_crossing(self, modulus, offset=0.002, start=0):
+        """
+        Find where the curve first crosses the line stress = modulus * (strain - offset)
+        :param modulus: Slope of the line (MPa per mm/mm)
+        :param offset: Strain where the line crosses zero stress. Default is 0.002 (0.2%)
+        :param start: Sample to start looking from, e.g. the end of the linear region
+        :return:
+        index: the sample closest to the line of the two either side of the crossing
+        position: fractional sample index of the crossing, by linear interpolation
+        stress: interpolated stress at the crossing (MPa)
+        """
+
+        def distance(i):
+            # above the line is positive
+            return self.stress[i] - modulus * (self.strain[i] - offset)
+
+        low = min(max(int(start), 0), self.uts_index)
+
+        if distance(low) <= 0:
+            raise ValueError("the curve is already below the offset line at sample " + str(low))
+
+        # scan forward a block at a time for the first sample on or below the line. Bisecting
+        # between low and the UTS could land on a later crossing when the curve dips below the
+        # line and comes back above it, e.g. at a yield point drop
+        high = None
+        for begin in range(low + 1, self.uts_index + 1, self.block_size):
+            end = min(begin + self.block_size, self.uts_index + 1)
+            crossed = np.flatnonzero(distance(slice(begin, end)) <= 0)
+            if crossed.size > 0:
+                high = begin + int(crossed[0])
+                break
+
+        if high is None:
+            raise ValueError("the offset line does not cross the curve before the ultimate tensile stress")
+
+        low = high - 1
+
+        above = distance(low)
+        below = distance(high)
+        fraction = above / (above - below)
+
+        index = high if -below < above else low
+        stress = self.stress[low] + fraction * (self.stress[high] - self.stress[low])
+
+        return index, low + fraction, float(stress)
+
+
+def secant_modulus(strain, stress, fraction=0.40, branch=None):
+    """
+    Same as calculate_elastic_modulus(), but the secant point is found on the loading branch by
+    binary search, and the least squares fit only touches the linear region
+    :param strain: An array of Strain data (mm/mm)
+    :param stress: An array of Stress data (MPa)
+    :param fraction: Fraction of the peak stress that ends the linear region. Default is 0.40
+    :param branch: LoadingBranch of the same data, if one has already been made
+    :return:
+    linear_index: the index within the strain/stress data that is the end of the linear region
+    slope: the slope for the linear region of the strain/stress data
+    intercept: y-intercept for linear region best fit of strain/stress data
+    """
+    if branch is None:
+        branch = LoadingBranch(strain, stress)
+
+    linear_index, position = branch.stress_crossing(branch.stress[branch.uts_index] * fraction)
+
+    slope, intercept = np.polyfit(branch.strain[:linear_index], branch.stress[:linear_index], 1)
+
+    return linear_index, slope, intercept
+
+
+def offset_yield_strength(strain, stress, modulus, offset=0.002, branch=None, start=0):
+    """
+    Same as calculate_yield_strength(), but the crossing with the offset line is found on the
+    loading branch by bisection and interpolated between samples
+    :param strain: An array of Strain data (mm/mm)
+    :param stress: An array of Stress data (MPa)
+    :param modulus: The elastic modulus of the material
+    :param offset: Desired offset. Default is 0.002 (0.2%)
+    :param branch: LoadingBranch of the same data, if one has already been made
+    :param start: Sample to start looking from; the linear_index from secant_modulus() is a good choice
+    :return: Yield strength (MPa)
+    """
+    if branch is None:
+        branch = LoadingBranch(strain, stress)
+
+    index, position, yield_strength = branch.offset_crossing(modulus, offset, start)
+
+    return yield_strength
+
+
+def compare_methods(path_to_tensile_folder="../../../data/tensile/"):
+    """
+    Run the original and the loading branch methods on every sample
+    :param path_to_tensile_folder: Path to the data/tensile folder
+    :return: List of dictionaries with the sample name, and the linear index and yield strength from each method
+    """
+    comparison = list()
+
+    for path_to_sample in sorted(glob.glob(os.path.join(path_to_tensile_folder, "*", "*.csv"))):
+        metadata, time, displacement, force, strain = read_tensile_file(path_to_sample)
+        stress = calculate_stress(force, metadata["Gage Diameter"])
+
+        linear_index, slope, intercept = calculate_elastic_modulus(strain, stress)
+        yield_strength = calculate_yield_strength(strain, stress, slope)
+
+        branch = LoadingBranch(strain, stress)
+        branch_index, branch_slope, branch_intercept = secant_modulus(strain, stress, branch=branch)
+        branch_yield = offset_yield_strength(strain, stress, branch_slope, branch=branch, start=branch_index)
+
+        comparison.append({'name': os.path.basename(path_to_sample).split(".")[0],
+                           'linear_index': int(linear_index), 'branch_index': branch_index,
+                           'yield_strength': float(yield_strength), 'branch_yield': branch_yield})
+
+    return comparison
+
+
+if __name__ == "__main__":
+
+    print("Sample|\t\tLinear index|\tBranch index|\tYield (MPa)|\tBranch yield (MPa)")
+    for r in compare_methods():
+        print(r['name'], "|\t", r['linear_index'], "|\t", r['branch_index'], "|\t", round(r['yield_strength'], 2),
+              "|\t", round(r['branch_yield'], 2))
+
+    # a high rate capture: one sample's curve resampled to 10 million points
+    metadata, time_s, displacement, force, strain = read_tensile_file("../../../data/tensile/2024/C01A2024_1.csv")
+    stress = calculate_stress(force, metadata["Gage Diameter"])
+
+    position = np.linspace(0, len(strain) - 1, 10 ** 7)
+    strain = np.interp(position, np.arange(len(strain)), strain)
+    stress = np.interp(position, np.arange(len(stress)), stress)
+
+    linear_index, slope, intercept = calculate_elastic_modulus(strain, stress)
+
+    start = time.perf_counter()
+    calculate_yield_strength(strain, stress, slope)
+    full_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    branch = LoadingBranch(strain, stress)
+    branch_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index, position = branch.stress_crossing(0.4 * stress[branch.uts_index])
+    offset_yield_strength(strain, stress, slope, branch=branch, start=index)
+    search_seconds = time.perf_counter() - start
+
+    print("\nPoints: ", len(stress))
+    print("calculate_yield_strength (ms): ", round(full_seconds * 1000, 2))
+    print("LoadingBranch setup (ms):      ", round(branch_seconds * 1000, 2))
+    print("Secant + yield search (ms):    ", round(search_seconds * 1000, 3))
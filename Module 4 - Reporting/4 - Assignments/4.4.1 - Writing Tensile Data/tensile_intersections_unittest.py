@@ -0,0 +1,116 @@
+import glob
+import os
+import unittest
+import numpy as np
+from tensile_intersections import LoadingBranch, secant_modulus, offset_yield_strength
+from writing_tensile_utils import read_tensile_file, calculate_stress, calculate_elastic_modulus, \
+    calculate_yield_strength
+
+# path to tensile folder
+path_to_tensile_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../data/tensile/")
+
+
+def bilinear_curve(n=2001):
+    """
+    Elastic up to 400 MPa at E = 200 GPa, hardening to a UTS of 500 MPa at 10% strain, then
+    necking back down to 300 MPa at 15% strain
+    """
+    strain = np.linspace(0, 0.15, n)
+    stress = np.where(strain < 0.002, 200000 * strain, 400 + (strain - 0.002) / 0.098 * 100)
+    stress = np.where(strain > 0.1, 500 - (strain - 0.1) / 0.05 * 200, stress)
+    return strain, stress
+
+
+def yield_drop_curve(n=15001):
+    """
+    Elastic up to an upper yield point of 400 MPa, then a sharp drop to a 260 MPa plateau with
+    one serration down to 230 MPa at 1.4% strain, hardening from 3% strain to a UTS of 450 MPa
+    """
+    strain = np.linspace(0, 0.15, n)
+    stress = np.where(strain < 0.002, 200000 * strain, 260.0)
+    stress[(strain >= 0.002) & (strain < 0.0021)] = 400
+    stress[(strain >= 0.014) & (strain < 0.0146)] = 230
+    stress = np.where(strain > 0.03, 260 + (strain - 0.03) / 0.07 * 190, stress)
+    stress = np.where(strain > 0.1, 450 - (strain - 0.1) * 1000, stress)
+    return strain, stress
+
+
+class TestLoadingBranch(unittest.TestCase):
+    def test_secant_matches_original(self):
+        for path in sorted(glob.glob(os.path.join(path_to_tensile_folder, "*", "*.csv"))):
+            metadata, time, displacement, force, strain = read_tensile_file(path)
+            stress = calculate_stress(force, metadata["Gage Diameter"])
+
+            expected = calculate_elastic_modulus(strain, stress)
+            self.assertEqual(secant_modulus(strain, stress), expected)
+
+    def test_first_offset_crossing(self):
+        for path in sorted(glob.glob(os.path.join(path_to_tensile_folder, "*", "*.csv"))):
+            metadata, time, displacement, force, strain = read_tensile_file(path)
+            stress = calculate_stress(force, metadata["Gage Diameter"])
+            linear_index, slope, intercept = secant_modulus(strain, stress)
+
+            index, position, yield_strength = LoadingBranch(strain, stress).offset_crossing(slope, start=linear_index)
+
+            # the first sign change after the linear region
+            distance = stress - slope * (strain - 0.002)
+            first = linear_index + np.flatnonzero(distance[linear_index:] <= 0)[0]
+            self.assertEqual(int(np.floor(position)), first - 1)
+            self.assertTrue(min(stress[first - 1], stress[first]) <= yield_strength <= max(stress[first - 1],
+                                                                                          stress[first]))
+
+    def test_yield_drop(self):
+        strain, stress = yield_drop_curve()
+
+        # with a low modulus the line first meets the curve at the serration, 240 MPa at 1.4%
+        # strain; the curve comes back above it before the line passes the plateau at 1.5%
+        distance = stress - 20000 * (strain - 0.002)
+        crossings = np.flatnonzero(np.diff(np.sign(distance[100:]))) + 100
+        self.assertGreater(len(crossings), 1)
+
+        for block_size in [4096, 7]:
+            branch = LoadingBranch(strain, stress, block_size=block_size)
+            index, position, yield_strength = branch.offset_crossing(20000, start=100)
+
+            self.assertEqual(int(np.floor(position)), crossings[0])
+            self.assertAlmostEqual(yield_strength, 240, delta=1)
+
+    def test_block_size(self):
+        strain, stress = yield_drop_curve()
+        branch = LoadingBranch(strain, stress)
+        small = LoadingBranch(strain, stress, block_size=7)
+
+        # a handful of blocks, and the same crossings as one block per 4096 samples
+        self.assertEqual(len(branch.envelope), 3)
+        for target in [0, 100, 259, 260, 300, 399, 400, 450]:
+            self.assertEqual(small.stress_crossing(target), branch.stress_crossing(target))
+
+    def test_interpolated(self):
+        strain, stress = bilinear_curve()
+        branch = LoadingBranch(strain, stress)
+
+        self.assertEqual(branch.uts_index, np.argmax(stress))
+
+        # 150 MPa is at 0.075% strain, between samples
+        index, position = branch.stress_crossing(150)
+        self.assertAlmostEqual(np.interp(position, np.arange(len(strain)), strain), 0.00075)
+
+        # the offset line meets the hardening line at 400 + (e - 0.002) / 0.098 * 100 = 200000 (e - 0.002)
+        e = 0.002 + 400 / (200000 - 100 / 0.098)
+        self.assertAlmostEqual(offset_yield_strength(strain, stress, 200000), 200000 * (e - 0.002))
+
+    def test_necking_ignored(self):
+        strain, stress = bilinear_curve()
+
+        # a modulus this low only comes close to the curve again after necking
+        self.assertGreater(strain[np.argmin(np.abs(stress - 3000 * (strain - 0.002)))], 0.1)
+        self.assertAlmostEqual(calculate_yield_strength(strain, stress, 3000), 3000 * (0.13 - 0.002), delta=3)
+
+        with self.assertRaises(ValueError):
+            offset_yield_strength(strain, stress, 3000)
+        with self.assertRaises(ValueError):
+            LoadingBranch(strain, stress).stress_crossing(600)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,329 @@
+import os
+
+import numpy as np
+
+# columns of the results CSV file, in order
+columns = ['Sample_Name', 'Material_Type', 'Tensile_Strength', 'Fracture_Strain', 'Elastic_Modulus', 'Yield_Strength']
+
+# MaterialSample attribute holding each column
+attributes = ['name', 'material_type', 'tensile_strength', 'fracture_strain', 'elastic_modulus', 'yield_strength']
+
+# columns stored as text; everything else is a float
+text_columns = ['Sample_Name', 'Material_Type']
+
+
+def format_row(sample):
+    """
+    Turn a MaterialSample into one line of the results CSV file, formatted the same way as
+    generate_csv_file() in the template
+    :param sample: MaterialSample
+    :return: String ending in a newline
+    """
+    return ",".join(str(getattr(sample, attribute)) for attribute in attributes) + "\n"
+
+
+def is_complete_row(line):
+    """
+    Whether a line of the results CSV file holds a whole row: one value per column, with every
+    numeric column a number
+    :param line: Line of the CSV file, without its newline
+    :return: True if the row is complete
+    """
+    values = line.split(",")
+    if len(values) != len(columns):
+        return False
+
+    for column, value in zip(columns, values):
+        if column in text_columns:
+            continue
+        try:
+            float(value)
+        except ValueError:
+            return False
+
+    return True
+
+
+class TensileResultsStore:
+    """
+    A results CSV file that grows by appending rows, with a columnar .npz mirror next to it.
+    Each sample name appears once; adding a sample that is already stored replaces its row.
+    Queries read the mirror, and only load the columns they use.
+    """
+
+    def __init__(self, csv_path):
+        """
+        Open a results store, creating an empty CSV file if there is none
+        :param csv_path: Path to the results CSV file; the mirror is written next to it as .npz
+        """
+        self.csv_path = csv_path
+        self.mirror_path = os.path.splitext(csv_path)[0] + ".npz"
+
+        if not os.path.exists(csv_path):
+            self._replace_csv([])
+
+        self._repair()
+
+    def _replace_csv(self, lines):
+        """
+        Rewrite the whole CSV file in one step
+        """
+        temporary_path = self.csv_path + ".tmp"
+
+        with open(temporary_path, 'w') as file:
+            file.write(",".join(columns) + "\n")
+            file.writelines(lines)
+        os.replace(temporary_path, self.csv_path)
+
+    def _repair(self):
+        """
+        Finish the last line if it has no newline. A row that is complete (e.g. the file was
+        written by hand or by another program) just gets its newline; one that is provably
+        partial, left behind if a process stopped during an append, is dropped.
+        """
+        with open(self.csv_path, 'rb+') as file:
+            size = file.seek(0, os.SEEK_END)
+            if size == 0:
+                return
+
+            file.seek(max(0, size - 4096))
+            tail = file.read()
+            if tail.endswith(b'\n'):
+                return
+
+            last_newline = tail.rfind(b'\n')
+            last_line = tail[last_newline + 1:].decode(errors='replace')
+
+            # with no newline at all, the last line is the header
+            is_header = last_newline == -1 and size <= len(tail)
+            if is_header:
+                complete = last_line == ",".join(columns)
+            else:
+                complete = is_complete_row(last_line)
+
+            if complete:
+                file.write(b'\n')
+            elif is_header:
+                # a partial header; start over
+                file.truncate(0)
+                file.seek(0)
+                file.write((",".join(columns) + "\n").encode())
+            else:
+                file.truncate(size - len(tail) + last_newline + 1)
+
+    def _read_csv(self):
+        """
+        Parse the CSV file into columns
+        :return: Dictionary of column name to array
+        """
+        with open(self.csv_path) as file:
+            file.readline()
+            rows = [line.rstrip("\n").split(",") for line in file if line.strip()]
+
+        # the last row for each sample wins
+        latest = dict()
+        for row in rows:
+            latest[row[0]] = row
+        rows = list(latest.values())
+
+        data = dict()
+        for i, column in enumerate(columns):
+            values = [row[i] for row in rows]
+            data[column] = np.asarray(values, dtype=str if column in text_columns else float)
+
+        return data
+
+    def _source_info(self):
+        """
+        Size and modification time of the CSV file, used to tell when the mirror is out of date
+        """
+        stats = os.stat(self.csv_path)
+
+        return np.asarray([stats.st_size, stats.st_mtime_ns], dtype=np.int64)
+
+    def _write_mirror(self, data):
+        """
+        Replace the .npz mirror in one step
+        """
+        temporary_path = self.mirror_path + ".tmp.npz"
+
+        np.savez(temporary_path, _source=self._source_info(), **data)
+        os.replace(temporary_path, self.mirror_path)
+
+    def _mirror(self):
+        """
+        Open the .npz mirror, rebuilding it from the CSV file if the CSV file has changed
+        :return: NpzFile; each column is only read from disk when it is used
+        """
+        try:
+            mirror = np.load(self.mirror_path)
+            if np.array_equal(mirror['_source'], self._source_info()):
+                return mirror
+            mirror.close()
+        except (OSError, ValueError, KeyError):
+            pass
+
+        self._write_mirror(self._read_csv())
+
+        return np.load(self.mirror_path)
+
+    def sample_names(self):
+        """
+        Names of every stored sample
+        :return: Array of sample names
+        """
+        with self._mirror() as mirror:
+            return mirror['Sample_Name']
+
+    def __len__(self):
+        return len(self.sample_names())
+
+    def _latest(self, results):
+        """
+        Only the last of several results for the same sample is kept
+        :return: Dictionary of sample name to MaterialSample
+        """
+        latest = dict()
+        for sample in results:
+            latest[str(sample.name)] = sample
+
+        return latest
+
+    def _write(self, data, kept, samples):
+        """
+        Keep some of the stored rows and add new ones. If every stored row is kept the new rows
+        are appended to the end of the CSV file in a single write; otherwise the file is
+        rewritten in one step.
+        :param data: Dictionary of column name to array, as stored now
+        :param kept: Boolean array, which stored rows to keep
+        :param samples: List of MaterialSample to add after the kept rows
+        :return: None
+        """
+        lines = [format_row(sample) for sample in samples]
+
+        if not np.all(kept):
+            old_lines = [",".join(str(data[column][i]) for column in columns) + "\n" for i in np.flatnonzero(kept)]
+            self._replace_csv(old_lines + lines)
+        elif len(lines) > 0:
+            # a single write to a file opened for appending, synced before the mirror is updated
+            descriptor = os.open(self.csv_path, os.O_WRONLY | os.O_APPEND)
+            try:
+                os.write(descriptor, "".join(lines).encode())
+                os.fsync(descriptor)
+            finally:
+                os.close(descriptor)
+        else:
+            return
+
+        # build the mirror's columns directly rather than parsing the CSV file again
+        for column, attribute in zip(columns, attributes):
+            if column in text_columns:
+                new = np.asarray([str(getattr(sample, attribute)) for sample in samples], dtype=str)
+            else:
+                new = np.asarray([getattr(sample, attribute) for sample in samples], dtype=float)
+            data[column] = np.concatenate((data[column][kept], new))
+        self._write_mirror(data)
+
+    def append(self, results):
+        """
+        Add results to the store. New samples are appended to the end of the CSV file in a
+        single write; if any sample is already stored, the file is rewritten in one step with
+        its old row replaced.
+        :param results: List of MaterialSample
+        :return: Number of samples that replaced a stored row
+        """
+        latest = self._latest(results)
+
+        if len(latest) == 0:
+            return 0
+
+        with self._mirror() as mirror:
+            data = {column: mirror[column] for column in columns}
+
+        replaced = np.isin(data['Sample_Name'], list(latest))
+
+        self._write(data, ~replaced, list(latest.values()))
+
+        return int(np.count_nonzero(replaced))
+
+    def sync(self, results):
+        """
+        Make the store hold exactly these results. Stored rows that already match are left
+        alone, rows whose values differ (e.g. a sample moved to another material) are replaced,
+        and samples that are not in results any more are removed. When the only change is new
+        samples, they are appended without rewriting the file.
+        :param results: List of MaterialSample, e.g. every result from run_batch()
+        :return: Dictionary with the number of samples 'added', 'replaced', and 'removed'
+        """
+        latest = self._latest(results)
+
+        with self._mirror() as mirror:
+            data = {column: mirror[column] for column in columns}
+
+        kept = np.zeros(len(data['Sample_Name']), dtype=bool)
+        stored = dict()
+        for i, name in enumerate(data['Sample_Name'].tolist()):
+            stored[name] = i
+
+            sample = latest.get(name)
+            if sample is None:
+                continue
+
+            row = tuple(data[column][i].item() for column in columns)
+            current = tuple(str(getattr(sample, attribute)) if column in text_columns else
+                            float(getattr(sample, attribute)) for column, attribute in zip(columns, attributes))
+            kept[i] = row == current
+
+        changed = [sample for name, sample in latest.items() if name not in stored or not kept[stored[name]]]
+
+        self._write(data, kept, changed)
+
+        added = sum(name not in stored for name in latest)
+
+        return {'added': added, 'replaced': len(changed) - added,
+                'removed': sum(name not in latest for name in stored)}
+
+    def read_columns(self, *names):
+        """
+        Read columns from the mirror
+        :param names: Column names, e.g. 'Material_Type', 'Yield_Strength'
+        :return: List of arrays, one per name
+        """
+        with self._mirror() as mirror:
+            return [mirror[name] for name in names]
+
+    def aggregate(self, column, by='Material_Type'):
+        """
+        Mean and sample standard deviation of a column for each group, e.g. the elastic
+        modulus of each material. Only the two columns used are read.
+        :param column: Name of a numeric column
+        :param by: Name of the column to group by
+        :return: Dictionary of group to dictionary of 'count', 'mean', and 'std' (ddof=1, as pandas)
+        """
+        groups, values = self.read_columns(by, column)
+
+        names, inverse, counts = np.unique(groups, return_inverse=True, return_counts=True)
+
+        sums = np.bincount(inverse, weights=values, minlength=len(names))
+        means = sums / np.maximum(counts, 1)
+        squares = np.bincount(inverse, weights=np.square(values - means[inverse]), minlength=len(names))
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            stds = np.sqrt(squares / (counts - 1))
+
+        return {str(name): {'count': int(count), 'mean': float(mean), 'std': float(std)}
+                for name, count, mean, std in zip(names, counts, means, stds)}
+
+
+if __name__ == "__main__":
+
+    store = TensileResultsStore("tensile_data.csv")
+
+    modulus = store.aggregate('Elastic_Modulus')
+    yield_strength = store.aggregate('Yield_Strength')
+
+    print("Samples: ", len(store))
+    print("Material|\tElastic Modulus|\tYield Strength")
+    for material in modulus:
+        print(material, "|\t", round(modulus[material]['mean'], 2), "+/-", round(modulus[material]['std'], 2), "|\t",
+              round(yield_strength[material]['mean'], 2), "+/-", round(yield_strength[material]['std'], 2))
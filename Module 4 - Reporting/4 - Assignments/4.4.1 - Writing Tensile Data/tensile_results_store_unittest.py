@@ -0,0 +1,142 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from tensile_results_store import TensileResultsStore
+from writing_tensile_utils import MaterialSample
+
+
+def make_sample(name, material, value):
+    sample = MaterialSample()
+    sample.name = name
+    sample.material_type = material
+    sample.tensile_strength = value
+    sample.fracture_strain = value / 1000
+    sample.elastic_modulus = value / 10
+    sample.yield_strength = value / 2
+    return sample
+
+
+class TestTensileResultsStore(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "tensile_data.csv")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def read_lines(self):
+        with open(self.path) as file:
+            return file.readlines()
+
+    def test_append(self):
+        store = TensileResultsStore(self.path)
+        self.assertEqual(len(store), 0)
+
+        self.assertEqual(store.append([make_sample('A1', 'steel', 800.0), make_sample('B1', 'PMMA', 80.0)]), 0)
+        self.assertEqual(store.append([make_sample('A2', 'steel', 820.0)]), 0)
+
+        lines = self.read_lines()
+        self.assertEqual(lines[0], "Sample_Name,Material_Type,Tensile_Strength,Fracture_Strain,Elastic_Modulus,"
+                                   "Yield_Strength\n")
+        self.assertEqual(lines[3], "A2,steel,820.0,0.82,82.0,410.0\n")
+
+        # a new store reads the same data back
+        names, strength = TensileResultsStore(self.path).read_columns('Sample_Name', 'Tensile_Strength')
+        self.assertEqual(names.tolist(), ['A1', 'B1', 'A2'])
+        np.testing.assert_array_equal(strength, [800, 80, 820])
+
+    def test_duplicates_replaced(self):
+        store = TensileResultsStore(self.path)
+        store.append([make_sample('A1', 'steel', 800.0), make_sample('B1', 'PMMA', 80.0)])
+
+        self.assertEqual(store.append([make_sample('A1', 'steel', 810.0), make_sample('A1', 'steel', 805.0)]), 1)
+
+        self.assertEqual(len(self.read_lines()), 3)
+        names, strength = store.read_columns('Sample_Name', 'Tensile_Strength')
+        self.assertEqual(names.tolist(), ['B1', 'A1'])
+        np.testing.assert_array_equal(strength, [80, 805])
+
+    def test_sync(self):
+        store = TensileResultsStore(self.path)
+        store.append([make_sample('A1', 'steel', 800.0), make_sample('A2', 'steel', 820.0),
+                      make_sample('B1', 'PMMA', 80.0)])
+
+        # nothing changed
+        results = [make_sample('A1', 'steel', 800.0), make_sample('A2', 'steel', 820.0),
+                   make_sample('B1', 'PMMA', 80.0)]
+        mtime = os.stat(self.path).st_mtime_ns
+        self.assertEqual(store.sync(results), {'added': 0, 'replaced': 0, 'removed': 0})
+        self.assertEqual(os.stat(self.path).st_mtime_ns, mtime)
+
+        # only new samples are appended
+        self.assertEqual(store.sync(results + [make_sample('B2', 'PMMA', 81.0)]),
+                         {'added': 1, 'replaced': 0, 'removed': 0})
+        self.assertEqual(self.read_lines()[-1], "B2,PMMA,81.0,0.081,8.1,40.5\n")
+
+        # A2 moved to another material with the same values, B1 deleted
+        results = [make_sample('A1', 'steel', 800.0), make_sample('A2', 'aluminum', 820.0),
+                   make_sample('B2', 'PMMA', 81.0)]
+        self.assertEqual(store.sync(results), {'added': 0, 'replaced': 1, 'removed': 1})
+
+        names, materials = TensileResultsStore(self.path).read_columns('Sample_Name', 'Material_Type')
+        self.assertEqual(sorted(zip(names.tolist(), materials.tolist())),
+                         [('A1', 'steel'), ('A2', 'aluminum'), ('B2', 'PMMA')])
+        self.assertEqual(len(self.read_lines()), 4)
+
+    def test_mirror_rebuilt_after_csv_edit(self):
+        store = TensileResultsStore(self.path)
+        store.append([make_sample('A1', 'steel', 800.0)])
+
+        with open(self.path, 'a') as file:
+            file.write("B1,PMMA,80.0,0.08,8.0,40.0\n")
+
+        self.assertEqual(store.sample_names().tolist(), ['A1', 'B1'])
+
+    def test_partial_row_dropped(self):
+        TensileResultsStore(self.path).append([make_sample('A1', 'steel', 800.0)])
+
+        with open(self.path, 'a') as file:
+            file.write("B1,PMMA,80")
+
+        store = TensileResultsStore(self.path)
+        self.assertEqual(store.sample_names().tolist(), ['A1'])
+        self.assertTrue(self.read_lines()[-1].startswith("A1,"))
+
+    def test_complete_row_without_newline_kept(self):
+        with open(self.path, 'w') as file:
+            file.write("Sample_Name,Material_Type,Tensile_Strength,Fracture_Strain,Elastic_Modulus,Yield_Strength\n"
+                       "A,X,1,2,3,4\nB,X,5,6,7,8")
+
+        store = TensileResultsStore(self.path)
+        self.assertEqual(store.sample_names().tolist(), ['A', 'B'])
+        self.assertEqual(self.read_lines()[-1], "B,X,5,6,7,8\n")
+
+        # appending still starts a new row
+        store.append([make_sample('C', 'X', 9.0)])
+        self.assertEqual(store.sample_names().tolist(), ['A', 'B', 'C'])
+
+    def test_header_without_newline_kept(self):
+        with open(self.path, 'w') as file:
+            file.write("Sample_Name,Material_Type,Tensile_Strength,Fracture_Strain,Elastic_Modulus,Yield_Strength")
+
+        TensileResultsStore(self.path).append([make_sample('A', 'X', 1.0)])
+        self.assertEqual(len(self.read_lines()), 2)
+
+    def test_aggregate(self):
+        store = TensileResultsStore(self.path)
+        store.append([make_sample('A1', 'steel', 800.0), make_sample('A2', 'steel', 820.0),
+                      make_sample('A3', 'steel', 790.0), make_sample('B1', 'PMMA', 80.0)])
+
+        stats = store.aggregate('Tensile_Strength')
+
+        self.assertEqual(sorted(stats), ['PMMA', 'steel'])
+        self.assertEqual(stats['steel']['count'], 3)
+        self.assertAlmostEqual(stats['steel']['mean'], np.mean([800, 820, 790]))
+        self.assertAlmostEqual(stats['steel']['std'], np.std([800, 820, 790], ddof=1))
+        self.assertTrue(np.isnan(stats['PMMA']['std']))
+
+
+if __name__ == '__main__':
+    unittest.main()
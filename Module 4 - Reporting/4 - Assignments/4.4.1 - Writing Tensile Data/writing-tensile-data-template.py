@@ -68,6 +68,9 @@ if __name__ == "__main__":
     # get path to data/ folder
     path_to_tensile_folder = "../../../data/tensile/"
 
+    # once your functions work, run tensile_batch.py to analyze the samples in parallel, reuse the
+    # results of unchanged samples, and update tensile_data.csv in place rather than writing it again
+
     # list to hold all sample results
     results = []
 
@@ -1,3 +1,4 @@
+import io
 import math
 
 import numpy as np
@@ -50,6 +51,62 @@ def parse_tensile_file(path_to_file):
     return gage_diameter, np.asarray(time), np.asarray(displacement), np.asarray(force), np.asarray(strain)
 
 
+def read_tensile_file(path_to_file):
+    """
+    Faster version of parse_tensile_file(). Only the metadata at the top of the file is read
+    line by line; everything after the "(s)" units row is handed to np.loadtxt in one call,
+    with the quotes stripped from the whole block at once.
+    :param path_to_file: Path to an MTS tensile export (CSV)
+    :return:
+    metadata: dictionary of every metadata row (numbers converted to float), plus 'columns' and 'units'
+    time (s), displacement (mm), force (kN), strain (mm/mm): contiguous arrays
+    """
+    with open(path_to_file, 'rb') as file:
+        raw = file.read()
+
+    metadata = dict()
+    header = list()
+
+    # walk the metadata rows until the units row that starts the data
+    position = 0
+    while position < len(raw):
+        end = raw.find(b'\n', position)
+        if end == -1:
+            end = len(raw)
+
+        splits = raw[position:end].decode().strip().split(",")
+        position = end + 1
+
+        if splits[0] == "(s)":
+            metadata['columns'] = header
+            metadata['units'] = splits
+            break
+
+        # the row before the units row holds the column names
+        header = splits
+
+        # metadata rows are name, units, "value"
+        if len(splits) >= 3 and splits[0] != '' and splits[2].startswith('"'):
+            value = ",".join(splits[2:]).replace('\"', '')
+            try:
+                value = float(value)
+            except ValueError:
+                pass
+            metadata[splits[0]] = value
+
+    # gage diameter is required; keep the same default as parse_tensile_file()
+    metadata.setdefault("Gage Diameter", -1)
+
+    # strip every quote in one pass and load all rows at once
+    body = raw[position:].replace(b'"', b'')
+    data = np.loadtxt(io.BytesIO(body), delimiter=',', ndmin=2, usecols=(0, 1, 2, 3))
+
+    # one contiguous array per column
+    time, displacement, force, strain = np.ascontiguousarray(data.T)
+
+    return metadata, time, displacement, force, strain
+
+
 def calculate_stress(force, sample_diameter):
     """
     Calculate the stress (MPa) experienced by the test given a series of forces/loads (kN) and
@@ -78,9 +135,9 @@ def calculate_max_strength_strain(strain, stress):
     Fracture Strain: the maximum strain experienced before fracture
     """
 
-    ultimate_tensile_stress = max(stress)
+    ultimate_tensile_stress = np.max(stress)
 
-    fracture_strain = max(strain)
+    fracture_strain = np.max(strain)
 
     return ultimate_tensile_stress, fracture_strain
 
@@ -99,7 +156,7 @@ def calculate_elastic_modulus(strain, stress):
 
     # Step 3a: find the point that is 40% of peak strain
     # use from 0 to that value to create a linear plot
-    secant_strain = max(stress) * 0.40
+    secant_strain = np.max(stress) * 0.40
 
     # Step 3b: find the index closes to that
     # take the diff of the whole array and argmin
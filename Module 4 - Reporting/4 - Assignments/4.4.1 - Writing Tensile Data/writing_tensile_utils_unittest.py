@@ -0,0 +1,37 @@
+import glob
+import os
+import unittest
+import numpy as np
+from writing_tensile_utils import parse_tensile_file, read_tensile_file
+
+# path to tensile folder
+path_to_tensile_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../data/tensile/")
+
+
+class TestReadTensileFile(unittest.TestCase):
+    def setUp(self):
+        self.paths = sorted(glob.glob(os.path.join(path_to_tensile_folder, "*", "*.csv")))
+
+    def test_matches_parse_tensile_file(self):
+        self.assertGreater(len(self.paths), 0)
+
+        for path in self.paths:
+            gage_diameter, *columns = parse_tensile_file(path)
+            metadata, *arrays = read_tensile_file(path)
+
+            self.assertEqual(metadata["Gage Diameter"], gage_diameter)
+            for expected, actual in zip(columns, arrays):
+                np.testing.assert_array_equal(actual, expected)
+                self.assertTrue(actual.flags.c_contiguous)
+
+    def test_metadata(self):
+        metadata, time, displacement, force, strain = read_tensile_file(self.paths[0])
+
+        self.assertEqual(metadata['units'][0], "(s)")
+        self.assertEqual(len(metadata['columns']), len(metadata['units']))
+        self.assertNotIn("Time", metadata)
+        self.assertIsInstance(metadata["Maximum Force"], float)
+
+
+if __name__ == '__main__':
+    unittest.main()
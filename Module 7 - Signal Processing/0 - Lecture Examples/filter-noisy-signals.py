@@ -2,7 +2,8 @@ import numpy as np
 import matplotlib.pyplot as plt
 import math
 from scipy import signal
-from filter_utilities import plot_digital_filter_response, plot_fft_response
+from filter_utilities import plot_digital_filter_response, plot_fft_response, design_butter, design_firwin, \
+    fir_filter
 
 """
 Source Signal
@@ -74,7 +75,7 @@ filter_order = 6
 f_c = 50
 
 # generate magic coefficients for butterworth filter
-b, a = signal.butter(filter_order, f_c, btype='lowpass', fs=sample_frequency)
+b, a = design_butter(filter_order, f_c, sample_frequency, btype='lowpass')
 
 plot_digital_filter_response(b, a, sample_frequency)
 
@@ -104,7 +105,7 @@ N = 20
 f_s = sample_frequency
 f_c = 50
 
-b = signal.firwin(numtaps=N, cutoff=f_c, fs=f_s)
+b = design_firwin(N, f_c, f_s)
 
 w, h = signal.freqz(b)
 
@@ -123,8 +124,8 @@ plt.grid(which='both', linestyle='-', color='grey')
 plt.show()
 
 
-# filter signal with convolve
-filtered = np.convolve(real_signal, b)
+# filter signal with convolve; fir_filter switches to FFT convolution for long filters
+filtered = fir_filter(b, real_signal)
 
 # replot the original and filtered signals
 plt.plot(time, source, label='Original Signal')
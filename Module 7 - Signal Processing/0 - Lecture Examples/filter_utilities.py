@@ -1,7 +1,50 @@
+import os
+import sys
 from scipy import signal
 import numpy as np
 import matplotlib.pyplot as plt
-from numpy.fft import fft
+
+# filter design, FIR filtering, and FFT plots come from the shared folder of this module, so
+# the lectures and the Pan-Tompkins assignment use one implementation
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../shared"))
+import filter_bank
+import fir_engine
+import spectrum_tools
+
+
+def design_butter(filter_order, f_c, f_s, btype='lowpass'):
+    """
+    Generate butterworth b, a coefficients. The same filter is only ever designed once.
+    :param filter_order: Filter order
+    :param f_c: Cutoff frequency (Hertz); a pair of frequencies for band pass
+    :param f_s: Sampling frequency (Hertz)
+    :param btype: 'lowpass', 'highpass', 'bandpass', or 'bandstop'
+    :return: b, a coefficients
+    """
+    return filter_bank.design_butter(filter_order, f_c, f_s, btype, output='ba')
+
+
+def design_firwin(numtaps, f_c, f_s):
+    """
+    Generate low pass FIR taps with firwin. The same filter is only ever designed once.
+    :param numtaps: Number of taps
+    :param f_c: Cutoff frequency (Hertz)
+    :param f_s: Sampling frequency (Hertz)
+    :return: Array of filter taps
+    """
+    return filter_bank.design_fir(numtaps, f_c, f_s)
+
+
+def fir_filter(taps, x):
+    """
+    Apply FIR taps to a signal (full convolution, the same as np.convolve). Short filters are
+    convolved directly; long ones use overlap-add FFT convolution, which is much faster once
+    there are more than a couple of hundred taps (see fir_engine.py).
+    :param taps: Array of filter taps, e.g. from design_firwin
+    :param x: An array of samples
+    :return: The filtered signal, len(x) + len(taps) - 1 samples long
+    """
+    return fir_engine.fir_filter(taps, x)
 
 
 def plot_digital_filter_response(b, a, f_s):
@@ -21,15 +64,14 @@ def plot_digital_filter_response(b, a, f_s):
     plt.show()
 
 
-def plot_fft_response(signal, f_s):
-    N = len(signal) // 2
-    X = fft(signal)[:N]
-    sample_intervals = np.arange(N)
-    T = N / f_s
-    freq = sample_intervals / T / 2
-
-    plt.stem(freq, np.abs(X), 'b', markerfmt=" ", basefmt="-b")
-    plt.xlabel('Freq (Hz)')
-    plt.ylabel('FFT Amplitude |X(freq)|')
-    plt.title('One-Sided FFT of Signal')
-    plt.show()
+def plot_fft_response(signal, f_s, max_points=spectrum_tools.default_max_points):
+    """
+    Plot the one-sided FFT of a signal. rfft only calculates the non-negative frequencies.
+    Long spectra are drawn as a line through the min and max of each block of points rather
+    than as a stem plot, which is far too slow for hundreds of thousands of points.
+    :param signal: An array of samples
+    :param f_s: Sampling frequency (Hertz)
+    :param max_points: Spectra longer than this are decimated before plotting
+    :return: None
+    """
+    spectrum_tools.plot_fft_response(signal, f_s, max_points)
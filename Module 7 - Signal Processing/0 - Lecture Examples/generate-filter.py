@@ -1,6 +1,7 @@
 from scipy import signal
 import matplotlib.pyplot as plt
 import numpy as np
+from filter_utilities import design_butter, design_firwin
 
 """
 Example Butterworth filter from: https://docs.scipy.org/doc/scipy/reference/generated/scipy.signal.butter.html
@@ -15,7 +16,7 @@ filter_order = 4
 # cutoff frequency (Hertz)
 f_c = 50
 
-b, a = signal.butter(filter_order, f_c, btype='lowpass', fs=sample_frequency)
+b, a = design_butter(filter_order, f_c, sample_frequency, btype='lowpass')
 
 """
 Plot the butterworth filter response
@@ -47,7 +48,7 @@ N = 6
 f_s = sample_frequency
 f_c = 50
 
-b = signal.firwin(numtaps=N, cutoff=f_c, fs=f_s)
+b = design_firwin(N, f_c, f_s)
 
 w, h = signal.freqz(b)
 
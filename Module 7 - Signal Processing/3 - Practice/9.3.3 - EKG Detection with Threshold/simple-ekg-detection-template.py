@@ -1,29 +1,41 @@
+import os
+import sys
+
 import numpy as np
 import matplotlib.pyplot as plt
 from scipy.signal import find_peaks
+from threshold_detection import detect_threshold_crossings
+
+# processed_records.py lives in the Pan-Tompkins assignment folder
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "../../4 - Assignments/9.4.1 - Pan-Tompkins Algorithm"))
+import processed_records
 
 """
 Step 1: Load pre-processed data that has already been filtered through the Pan Tompkins process
 """
-#@TODO: fix import names
-# list of available pre-processed datasets in the data/ekg folder
-available_datasets = ["mitdb_201", "mitdb213", "mitdb219", "nstdb_118e00", "qtdb_118e06"]
+# list of available pre-processed datasets: the one shipped in the data/ekg folder, plus every
+# record processed_records.py has written to data/ekg/pipeline/ (run it to process the rest)
+available_datasets = ["qtdb_sel104"] + sorted(set(processed_records.read_manifest()) - {"qtdb_sel104"})
 
 # select a data set from the enumerated list above
 dataset = available_datasets[0]
 
-# load saved data from numpy array
-filepath = '../../../data/ekg/processed_'+dataset+'.npy'
-
-# once loaded, place in an array called signal
-signal = np.load(filepath)
+# load the record from the pipeline folder; memory-mapped so long records load instantly. The
+# pipeline uses its own front end, so the threshold below will need retuning for its records
+try:
+    signal = processed_records.load_processed(dataset)
+except OSError:
+    # not processed yet; fall back to the copy shipped in the data/ekg folder
+    print("No processed copy of", dataset, "in data/ekg/pipeline/, using processed_qtdb_sel104.npy")
+    signal = np.load(os.path.join(processed_records.default_path_to_folder, 'processed_qtdb_sel104.npy'), mmap_mode='r')
 
 """
 Step 2: Determine how much data to use...
 """
 # If you wish to only run on ~10s of data uncomment the line below
 # if you wish to run on all data, comment out this line
-signal = signal[0:12000]
+#signal = signal[0:12000]
 
 
 """
@@ -37,30 +49,14 @@ detection_threshold = 1.5
 # set a heart beat time out (YOUR VALUE BELOW)
 detection_time_out = 100
 
-# track the last time we found a beat
-last_detected_index = -1
-
-# keep not of where we are in the data
-current_index = 0
-
-# store indices of all found beats
-beats_detected = list()
-
 """
-Step 4: Manually iterate through the signal and apply the threshold with timeout
+Step 4: Apply the threshold with timeout. Only samples above the threshold are checked against
+the time out, so this runs quickly on the full record. Returns the INDICES of the beats.
 """
 
-# loop through signal finding beats
-for value in signal:
-    ## Use a conditional statement to see if the signal is above a threshold...
-    if value > detection_threshold and current_index - last_detected_index >= detection_time_out:
-        ## Once an index is found, place the index in the beats_detected list
-        beats_detected.append(value)
-        last_detected_index = current_index
-    current_index += 1
-print("Within the sample we found ", len(beats_detected), " heart beats with manual search!")
+beats_detected = detect_threshold_crossings(signal, detection_threshold, detection_time_out)
 
-beats_detected = np.asarray(beats_detected)
+print("Within the sample we found ", len(beats_detected), " heart beats with manual search!")
 
 """
 Step 5: Plot the results
@@ -70,5 +66,5 @@ Step 5: Plot the results
 plt.plot(signal)
 plt.title('Filtered ECG Signal with Beat Annotations')
 
-#plt.plot(beats_detected, signal[beats_detected], 'X')
+plt.plot(beats_detected, signal[beats_detected], 'X')
 plt.show()
@@ -0,0 +1,29 @@
+import numpy as np
+
+
+def detect_threshold_crossings(signal, threshold, time_out, last_detected_index=-1):
+    """
+    Detect beats with a simple threshold and time out. A sample is a beat if it is above the
+    threshold and at least time_out samples have passed since the last beat. Gives the same
+    result as checking every sample in a loop, but only looks at samples above the threshold.
+    :param signal: An array of processed EKG data
+    :param threshold: Detection threshold
+    :param time_out: Minimum number of samples between beats
+    :param last_detected_index: Index of a beat before the start of the signal; -1 if none
+    :return: An array of the indices of all detected beats
+    """
+    signal = np.asarray(signal)
+
+    # every sample above the threshold is a candidate; this is usually far fewer than the signal
+    candidates = np.flatnonzero(signal > threshold)
+
+    beats = list()
+
+    # jump straight to the first candidate that is past the time out
+    position = np.searchsorted(candidates, last_detected_index + time_out)
+    while position < len(candidates):
+        beat = candidates[position]
+        beats.append(beat)
+        position += np.searchsorted(candidates[position:], beat + time_out)
+
+    return np.asarray(beats, dtype=int)
@@ -0,0 +1,35 @@
+import unittest
+import numpy as np
+from threshold_detection import detect_threshold_crossings
+
+
+def loop_detection(signal, threshold, time_out):
+    # the original sample-by-sample loop from the practice template
+    last_detected_index = -1
+    beats_detected = list()
+    for current_index, value in enumerate(signal):
+        if value > threshold and current_index - last_detected_index >= time_out:
+            beats_detected.append(current_index)
+            last_detected_index = current_index
+    return beats_detected
+
+
+class TestThresholdDetection(unittest.TestCase):
+    def test_matches_loop(self):
+        signal = np.abs(np.random.default_rng(5).standard_normal(20000)) * 2
+
+        for threshold, time_out in [(1.5, 100), (0.5, 1), (3, 250), (0.0, 7)]:
+            expected = loop_detection(signal, threshold, time_out)
+            self.assertEqual(detect_threshold_crossings(signal, threshold, time_out).tolist(), expected)
+
+    def test_returns_indices(self):
+        signal = np.asarray([0, 5, 0, 0, 5, 5, 0, 0, 0, 5])
+
+        self.assertEqual(detect_threshold_crossings(signal, 1, 2).tolist(), [1, 4, 9])
+
+    def test_no_beats(self):
+        self.assertEqual(len(detect_threshold_crossings(np.zeros(100), 1, 10)), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,22 +1,33 @@
+import os
+import sys
+
 import numpy as np
 import matplotlib.pyplot as plt
 from scipy.signal import find_peaks
 
+# processed_records.py lives in the Pan-Tompkins assignment folder
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             "../../4 - Assignments/9.4.1 - Pan-Tompkins Algorithm"))
+import processed_records
+
 """
 Step 1: Load pre-processed data that has already been filtered through the PT process
 """
-#@TODO: fix import names
-# list of available pre-processed datasets in the data/ekg folder
-available_datasets = ["mitdb_201", "mitdb_213", "mitdb_219", "nstdb_118e00", "qtdb_118e06"]
+# list of available pre-processed datasets: the one shipped in the data/ekg folder, plus every
+# record processed_records.py has written to data/ekg/pipeline/ (run it to process the rest)
+available_datasets = ["qtdb_sel104"] + sorted(set(processed_records.read_manifest()) - {"qtdb_sel104"})
 
 # select a data set from the enumerated list above
 dataset = available_datasets[0]
 
-# load saved data from numpy array
-filepath = '../../../data/ekg/processed_'+dataset+'.npy'
-
-# once loaded, place in an array called filtered
-signal = np.load(filepath)
+# load the record from the pipeline folder; memory-mapped so long records load instantly. The
+# pipeline uses its own front end, so the threshold below will need retuning for its records
+try:
+    signal = processed_records.load_processed(dataset)
+except OSError:
+    # not processed yet; fall back to the copy shipped in the data/ekg folder
+    print("No processed copy of", dataset, "in data/ekg/pipeline/, using processed_qtdb_sel104.npy")
+    signal = np.load(os.path.join(processed_records.default_path_to_folder, 'processed_qtdb_sel104.npy'), mmap_mode='r')
 
 """
 Step 2: Determine how much data to use...
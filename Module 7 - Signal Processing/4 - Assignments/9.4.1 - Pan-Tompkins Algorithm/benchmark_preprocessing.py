@@ -0,0 +1,83 @@
+import os
+import time
+
+import numpy as np
+import scipy.signal as sp
+
+from pan_tompkins_utils import preprocess, detection_threshold
+
+# path to ekg folder
+path_to_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../data/ekg/")
+
+
+def legacy_preprocess(signal, f_s, low_fc=5, high_fc=123, filter_order=4, window=20, z=1.4, H=0.35):
+    """
+    The original detect_heartbeats() processing: two separate filtfilt passes, moving window,
+    and outlier clipping with a python loop
+    :return: The envelope and the detection height
+    """
+    b, a = sp.butter(filter_order, high_fc, fs=f_s, btype='lowpass', output='ba')
+    signal = sp.filtfilt(b, a, signal)
+
+    b, a = sp.butter(filter_order, low_fc, fs=f_s, btype='highpass', output='ba')
+    signal = sp.filtfilt(b, a, signal)
+
+    signal = np.asarray(signal)
+    signal = np.diff(signal)
+    signal = np.square(signal)
+    signal = np.convolve(signal, ([1]*window))
+
+    avg = np.average(signal)
+    std = np.std(signal)
+    signal_copy = np.copy(signal)
+    for j, sig in enumerate(signal):
+        if sig >= avg + (z * std):
+            signal_copy[j] = avg + (z * std)
+
+    height = max(signal_copy) * H
+
+    return signal, height
+
+
+def fused_preprocess(signal, f_s, low_fc=5, high_fc=123, filter_order=4, window=20, z=1.4, H=0.35):
+    """
+    The vectorized processing from pan_tompkins_utils
+    :return: The envelope and the detection height
+    """
+    envelope = preprocess(signal, f_s, low_fc, high_fc, filter_order, window)
+
+    return envelope, detection_threshold(envelope, z, H)
+
+
+def time_function(function, *args, repeats=3):
+    """
+    Best wall time of several calls to a function
+    """
+    best = float('inf')
+    for i in range(repeats):
+        start = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+if __name__ == "__main__":
+
+    records = ['mitdb_100', 'mitdb_102', 'mitdb_103', 'mitdb_104', 'mitdb_107', 'mitdb_201', 'mitdb_213']
+
+    print("Database|\tLegacy (s)|\tFused (s)|\tSpeedup")
+    for database_name in records:
+        signal_filepath = path_to_folder + database_name + ".csv"
+        if not os.path.exists(signal_filepath):
+            print(database_name, "|\tmissing")
+            continue
+
+        data = np.loadtxt(signal_filepath, delimiter=',', skiprows=2)
+        f_s = np.average(np.diff(data[:, 0])) ** -1
+        signal = data[:, 1]
+
+        legacy = time_function(legacy_preprocess, signal, f_s)
+        fused = time_function(fused_preprocess, signal, f_s)
+
+        print(database_name, "|\t", round(legacy, 3), "|\t", round(fused, 3), "|\t", round(legacy / fused, 1), "x")
@@ -0,0 +1,190 @@
+import csv
+import importlib.util
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from ekg_testbench import EKGTestBench
+
+# folder holding this file, used to find the detector
+this_folder = os.path.dirname(os.path.abspath(__file__))
+
+# default path to ekg folder
+default_path_to_folder = os.path.join(this_folder, "../../../data/ekg/")
+
+# default detector to evaluate
+default_detector_path = os.path.join(this_folder, "pan-tompkins-template.py")
+
+# columns written to the CSV report
+report_columns = ['database', 'true_positive', 'false_positive', 'false_negative', 'f1', 'seconds', 'error']
+
+# detectors already loaded in this process, keyed by (path, function name)
+_loaded_detectors = dict()
+
+
+def load_detector(detector_path, detector_name):
+    """
+    Load a detector function from a python file. The file name does not need to be a valid
+    module name (e.g. pan-tompkins-template.py). Each process only loads a file once.
+    :param detector_path: Path to the python file
+    :param detector_name: Name of the function within the file
+    :return: The detector function
+    """
+    key = (detector_path, detector_name)
+
+    if key not in _loaded_detectors:
+        spec = importlib.util.spec_from_file_location("detector_module", detector_path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _loaded_detectors[key] = getattr(module, detector_name)
+
+    return _loaded_detectors[key]
+
+
+def find_record(database_name, path_to_folder=default_path_to_folder):
+    """
+    Find the folder that holds a record. Records may be in the ekg folder or its challenge folder.
+    :param database_name: Name of the record, e.g. mitdb_100
+    :param path_to_folder: Path to the ekg folder
+    :return: Path to the record without an extension, e.g. .../mitdb_100
+    """
+    for folder in [path_to_folder, os.path.join(path_to_folder, "challenge")]:
+        base_path = os.path.join(folder, database_name)
+        if os.path.exists(base_path + "_annotations.txt"):
+            return base_path
+
+    return os.path.join(path_to_folder, database_name)
+
+
+def evaluate_record(database_name, path_to_folder=default_path_to_folder, detector_path=default_detector_path,
+                    detector_name='detect_heartbeats'):
+    """
+    Run a detector on one record and score it against the annotations
+    :param database_name: Name of the record, e.g. mitdb_100
+    :param path_to_folder: Path to the ekg folder
+    :param detector_path: Path to the python file holding the detector
+    :param detector_name: Name of the detector function, which must return (signal, beats)
+    :return: A dictionary of TP, FP, FN, F1 (NaN if there is nothing to score), and wall time for the record
+    """
+    start = time.perf_counter()
+
+    result = {'database': database_name, 'true_positive': 0, 'false_positive': 0, 'false_negative': 0,
+              'f1': float('nan'), 'seconds': 0.0, 'error': ''}
+
+    try:
+        detector = load_detector(detector_path, detector_name)
+        base_path = find_record(database_name, path_to_folder)
+
+        (signal, peaks) = detector(base_path + ".csv")
+
+        tb = EKGTestBench(base_path + "_annotations.txt")
+        (matched, unmatched, remaining) = tb.generate_stats(list(peaks))
+
+        true_positive = len(matched)
+        false_positive = len(unmatched)
+        false_negative = len(remaining)
+
+        result['true_positive'] = true_positive
+        result['false_positive'] = false_positive
+        result['false_negative'] = false_negative
+
+        # a record with no annotations and no beats has nothing to score; its F1 stays NaN
+        scored = true_positive + 0.5 * (false_positive + false_negative)
+        if scored > 0:
+            result['f1'] = true_positive / scored
+    except Exception as e:
+        # keep going with the other records; the report will show what failed
+        result['error'] = type(e).__name__ + ": " + str(e)
+
+    result['seconds'] = time.perf_counter() - start
+
+    return result
+
+
+def run_benchmark(database_names, workers=None, path_to_folder=default_path_to_folder,
+                  detector_path=default_detector_path, detector_name='detect_heartbeats'):
+    """
+    Evaluate a detector on many records at once, one record per worker process
+    :param database_names: List of record names, e.g. ['mitdb_100', 'mitdb_102']
+    :param workers: Number of worker processes. None uses one per CPU core; 1 runs serially.
+    :param path_to_folder: Path to the ekg folder
+    :param detector_path: Path to the python file holding the detector
+    :param detector_name: Name of the detector function, which must return (signal, beats)
+    :return: A list of per-record result dictionaries, in the same order as database_names
+    """
+    if workers == 1:
+        return [evaluate_record(name, path_to_folder, detector_path, detector_name) for name in database_names]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(evaluate_record, name, path_to_folder, detector_path, detector_name)
+                   for name in database_names]
+        results = [f.result() for f in futures]
+
+    return results
+
+
+def summarize(results):
+    """
+    Combine per-record results into suite-wide numbers
+    :param results: List of result dictionaries from run_benchmark()
+    :return: A dictionary with the mean F1 (of the records that have one), total counts, and total wall time
+    """
+    scored = [r for r in results if r['error'] == '']
+
+    summary = {'records': len(results), 'failed': len(results) - len(scored),
+               'true_positive': sum(r['true_positive'] for r in scored),
+               'false_positive': sum(r['false_positive'] for r in scored),
+               'false_negative': sum(r['false_negative'] for r in scored),
+               'mean_f1': float('nan'), 'seconds': sum(r['seconds'] for r in results)}
+
+    # records with nothing to score have a NaN F1
+    f1 = [r['f1'] for r in scored if not math.isnan(r['f1'])]
+    if len(f1) > 0:
+        summary['mean_f1'] = sum(f1) / len(f1)
+
+    return summary
+
+
+def write_report(results, csv_path=None, json_path=None):
+    """
+    Write per-record results to a CSV file and/or results plus summary to a JSON file
+    :param results: List of result dictionaries from run_benchmark()
+    :param csv_path: Path of the CSV file to write, or None to skip
+    :param json_path: Path of the JSON file to write, or None to skip
+    :return: True once the files are written
+    """
+    if csv_path is not None:
+        with open(csv_path, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=report_columns)
+            writer.writeheader()
+            writer.writerows(results)
+
+    if json_path is not None:
+        with open(json_path, 'w') as file:
+            json.dump({'summary': summarize(results), 'records': results}, file, indent=2)
+
+    return True
+
+
+if __name__ == "__main__":
+
+    files = ['mitdb_100', 'mitdb_102', 'mitdb_103', 'mitdb_104', 'mitdb_107', 'mitdb_201', 'mitdb_210',
+             'mitdb_213', 'mitdb_217', 'mitdb_219', 'mitdb_220', 'mitdb_232', 'nstdb_118e00', 'nstdb_118e06',
+             'nstdb_118e24', 'nstdb_119e24', 'qtdb_sel104', 'qtdb_sel232']
+
+    # number of worker processes; None will use every core
+    workers = None
+
+    results = run_benchmark(files, workers)
+
+    print("Database|\t\tTP|\t\tFP|\t\tFN|\t\tF1|\t\tTime (s)")
+    for r in results:
+        print(r['database'], "|\t", r['true_positive'], "|\t", r['false_positive'], "|\t", r['false_negative'],
+              "|\t", round(r['f1'], 3), "|\t", round(r['seconds'], 2), r['error'])
+
+    summary = summarize(results)
+    print("Average F1: ", round(summary['mean_f1'], 3))
+
+    write_report(results, "benchmark_results.csv", "benchmark_results.json")
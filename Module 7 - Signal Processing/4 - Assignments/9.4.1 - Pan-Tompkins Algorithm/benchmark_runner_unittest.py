@@ -0,0 +1,76 @@
+import math
+import os
+import shutil
+import tempfile
+import unittest
+from benchmark_runner import run_benchmark, summarize
+from processed_records_unittest import write_record, write_annotations
+from streaming_pan_tompkins_unittest import synthetic_ekg
+
+
+class TestBenchmarkRunner(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.folder, "challenge"))
+
+        # one record in the ekg folder and one in its challenge folder
+        self.f_s = 360
+        records = [('mitdb_900', self.folder, 0), ('mitdb_901', os.path.join(self.folder, "challenge"), 1)]
+        for name, folder, seed in records:
+            signal, beats = synthetic_ekg(self.f_s, duration=30, seed=seed)
+            write_record(os.path.join(folder, name + ".csv"), signal, self.f_s)
+            write_annotations(os.path.join(folder, name + "_annotations.txt"), beats, self.f_s)
+
+        self.names = ['mitdb_900', 'mitdb_901', 'mitdb_999']
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_workers_do_not_change_results(self):
+        serial = run_benchmark(self.names, workers=1, path_to_folder=self.folder)
+        parallel = run_benchmark(self.names, workers=2, path_to_folder=self.folder)
+
+        # everything but the wall time must match, in the order the records were given
+        for results in [serial, parallel]:
+            for r in results:
+                del r['seconds']
+        self.assertEqual(serial[:2], parallel[:2])
+
+        self.assertEqual([r['database'] for r in parallel], self.names)
+        self.assertEqual([r['error'] for r in serial[:2]], ['', ''])
+        self.assertGreater(serial[0]['true_positive'], 0)
+
+        # a missing record is reported rather than stopping the run; its F1 is NaN, so only
+        # the error is compared
+        self.assertNotEqual(serial[2]['error'], '')
+        self.assertEqual(serial[2]['error'], parallel[2]['error'])
+
+    def test_summarize(self):
+        results = run_benchmark(self.names, workers=1, path_to_folder=self.folder)
+        summary = summarize(results)
+
+        self.assertEqual((summary['records'], summary['failed']), (3, 1))
+        self.assertEqual(summary['true_positive'], results[0]['true_positive'] + results[1]['true_positive'])
+        self.assertAlmostEqual(summary['mean_f1'], (results[0]['f1'] + results[1]['f1']) / 2)
+
+    def test_nothing_to_score(self):
+        # a record with no annotations, run through a detector that finds no beats
+        open(os.path.join(self.folder, "mitdb_902_annotations.txt"), 'w').close()
+        detector_path = os.path.join(self.folder, "no_beats.py")
+        with open(detector_path, 'w') as file:
+            file.write("def detect_heartbeats(filepath):\n    return [], []\n")
+
+        results = run_benchmark(['mitdb_902'], workers=1, path_to_folder=self.folder, detector_path=detector_path)
+        summary = summarize(results + run_benchmark(self.names[:1], workers=1, path_to_folder=self.folder))
+
+        self.assertEqual(results[0]['error'], '')
+        self.assertEqual(results[0]['true_positive'] + results[0]['false_positive'] + results[0]['false_negative'], 0)
+        self.assertTrue(math.isnan(results[0]['f1']))
+
+        # it is not a failure, and does not make the mean F1 NaN
+        self.assertEqual(summary['failed'], 0)
+        self.assertGreater(summary['mean_f1'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
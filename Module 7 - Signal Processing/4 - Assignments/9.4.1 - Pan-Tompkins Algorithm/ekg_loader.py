@@ -0,0 +1,112 @@
+import json
+import os
+
+import numpy as np
+
+
+def sidecar_paths(filepath):
+    """
+    Paths of the binary copy of a record and its metadata
+    :param filepath: Path to an EKG CSV file, e.g. .../mitdb_100.csv
+    :return: Paths to the .npy data file and .json metadata file
+    """
+    base_path = os.path.splitext(filepath)[0]
+
+    return base_path + ".npy", base_path + ".json"
+
+
+def convert_record(filepath):
+    """
+    Convert an EKG CSV file into a float32 .npy file holding (time, lead 1, lead 2) and a
+    .json file holding the column names, units, sampling rate, and number of samples
+    :param filepath: Path to an EKG CSV file
+    :return: The data array and metadata dictionary
+    """
+    npy_path, json_path = sidecar_paths(filepath)
+
+    with open(filepath) as file:
+        # first row holds column names and second row holds units
+        columns = [c.strip().strip("'\"") for c in file.readline().split(",")]
+        units = [u.strip().strip("'\"") for u in file.readline().split(",")]
+
+        # load data in matrix from the rest of the file
+        data = np.loadtxt(file, delimiter=',', ndmin=2)
+
+    # calculate sampling rate at full precision, before the data is stored as float32
+    f_s = np.average(np.diff(data[:, 0])) ** -1 if len(data) > 1 else float('nan')
+
+    metadata = {'columns': columns, 'units': units, 'f_s': float(f_s), 'samples': len(data),
+                'source': os.path.basename(filepath)}
+
+    data = data.astype(np.float32)
+
+    # write to temporary files first so an interrupted run never leaves a torn copy behind. The
+    # metadata goes last, so a .json file newer than the CSV always has its .npy file complete
+    temporary_path = npy_path + ".tmp.npy"
+    np.save(temporary_path, data)
+    os.replace(temporary_path, npy_path)
+
+    temporary_path = json_path + ".tmp"
+    with open(temporary_path, 'w') as file:
+        json.dump(metadata, file, indent=2)
+    os.replace(temporary_path, json_path)
+
+    return data, metadata
+
+
+def read_sidecars(filepath, mmap=True):
+    """
+    Open the binary copy of a record written by convert_record()
+    :param filepath: Path to an EKG CSV file
+    :param mmap: Memory-map the .npy file instead of reading it into memory
+    :return: The data array and metadata dictionary; None if the copy is missing, older than
+    the CSV file, or damaged (e.g. a file cut short by an interrupted conversion)
+    """
+    npy_path, json_path = sidecar_paths(filepath)
+
+    try:
+        if min(os.path.getmtime(npy_path), os.path.getmtime(json_path)) < os.path.getmtime(filepath):
+            return None
+
+        with open(json_path) as file:
+            metadata = json.load(file)
+
+        data = np.load(npy_path, mmap_mode='r' if mmap else None)
+    except (OSError, ValueError, EOFError):
+        return None
+
+    # the array must be the one the metadata describes
+    if not isinstance(metadata, dict) or data.ndim != 2 or len(data) != metadata.get('samples'):
+        return None
+
+    return data, metadata
+
+
+def load_ekg_record(filepath, mmap=True):
+    """
+    Load an EKG record. The CSV file is only parsed when there is no usable binary copy yet or
+    the CSV file is newer than it; otherwise the .npy file is opened directly.
+    :param filepath: Path to an EKG CSV file
+    :param mmap: Memory-map the .npy file instead of reading it into memory
+    :return:
+    data: (n, 3) float32 array of time, lead 1, and lead 2
+    metadata: dictionary with columns, units, f_s (Hertz), and samples
+    """
+    # only convert when the binary copy is missing, out of date, or damaged
+    record = read_sidecars(filepath, mmap)
+
+    if record is None:
+        try:
+            data, metadata = convert_record(filepath)
+        except OSError:
+            # folder may be read only; fall back to parsing the CSV every time
+            data = np.loadtxt(filepath, delimiter=',', skiprows=2, ndmin=2)
+            f_s = np.average(np.diff(data[:, 0])) ** -1
+            return data.astype(np.float32), {'f_s': float(f_s), 'samples': len(data)}
+
+        if mmap:
+            data = np.load(sidecar_paths(filepath)[0], mmap_mode='r')
+
+        return data, metadata
+
+    return record
@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from ekg_loader import convert_record, load_ekg_record, read_sidecars, sidecar_paths
+from processed_records_unittest import write_record
+
+
+class TestEKGLoader(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "mitdb_900.csv")
+
+        self.f_s = 360
+        self.signal = np.sin(np.arange(1000) / 10)
+        write_record(self.path, self.signal, self.f_s)
+
+        self.npy_path, self.json_path = sidecar_paths(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def touch_csv(self, seconds):
+        # move the CSV file's modification time relative to the binary copy
+        mtime = os.path.getmtime(self.npy_path) + seconds
+        os.utime(self.path, (mtime, mtime))
+
+    def test_convert(self):
+        data, metadata = convert_record(self.path)
+
+        self.assertEqual(data.dtype, np.float32)
+        self.assertEqual(data.shape, (1000, 3))
+        self.assertEqual(metadata['columns'], ['Elapsed time', 'MLII', 'V5'])
+        self.assertEqual(metadata['units'], ['seconds', 'mV', 'mV'])
+        self.assertAlmostEqual(metadata['f_s'], self.f_s, places=6)
+        np.testing.assert_allclose(data[:, 1], self.signal, atol=1e-6)
+
+        # no temporary files are left behind
+        self.assertEqual(sorted(os.listdir(self.folder)), ['mitdb_900.csv', 'mitdb_900.json', 'mitdb_900.npy'])
+
+    def test_load_uses_copy(self):
+        load_ekg_record(self.path)
+        self.touch_csv(-10)
+
+        data, metadata = load_ekg_record(self.path)
+        self.assertIsInstance(data, np.memmap)
+        self.assertEqual(metadata['samples'], 1000)
+
+    def test_stale_copy(self):
+        load_ekg_record(self.path)
+
+        # a shorter record written after the binary copy
+        write_record(self.path, self.signal[:500], self.f_s)
+        self.touch_csv(10)
+        self.assertIsNone(read_sidecars(self.path))
+
+        data, metadata = load_ekg_record(self.path)
+        self.assertEqual(len(data), 500)
+        self.assertEqual(metadata['samples'], 500)
+
+    def test_torn_copy(self):
+        load_ekg_record(self.path)
+
+        # cut the binary copy short, as an interrupted np.save would
+        size = os.path.getsize(self.npy_path)
+        with open(self.npy_path, 'r+b') as file:
+            file.truncate(size // 2)
+        self.touch_csv(-10)
+
+        self.assertIsNone(read_sidecars(self.path))
+        self.assertIsNone(read_sidecars(self.path, mmap=False))
+
+        data, metadata = load_ekg_record(self.path)
+        self.assertEqual(data.shape, (1000, 3))
+        np.testing.assert_allclose(data[:, 1], self.signal, atol=1e-6)
+
+    def test_torn_metadata(self):
+        load_ekg_record(self.path)
+
+        with open(self.json_path, 'w') as file:
+            file.write('{"columns": ')
+        self.touch_csv(-10)
+
+        data, metadata = load_ekg_record(self.path)
+        self.assertEqual(metadata['samples'], 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
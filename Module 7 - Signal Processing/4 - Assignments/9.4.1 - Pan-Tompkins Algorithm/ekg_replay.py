@@ -0,0 +1,226 @@
+import asyncio
+
+import numpy as np
+
+from benchmark_runner import default_path_to_folder, find_record
+from ekg_loader import load_ekg_record
+from ekg_testbench import EKGTestBench
+from streaming_pan_tompkins import StreamingPanTompkins
+
+
+class ReplaySource:
+    """
+    Plays a record back in real time, the way samples arrive from a bedside monitor. Frames of
+    frame_size samples are put on a queue as soon as the last sample in the frame would have
+    been recorded. The source never waits for the consumer: if the queue is full the frame is
+    dropped and counted, just like a device with a fixed size buffer.
+    """
+
+    def __init__(self, signal, f_s, frame_size=36, speed=1.0):
+        """
+        Create a new replay source
+        :param signal: An array of raw EKG samples
+        :param f_s: Sampling rate of the record (Hertz)
+        :param frame_size: Number of samples sent at a time
+        :param speed: Playback speed; 1 is the native sampling rate, 10 is ten times faster
+        """
+        self.signal = np.asarray(signal, dtype=float)
+        self.f_s = f_s
+        self.frame_size = frame_size
+        self.speed = speed
+
+        # loop time when the first sample was recorded; set when run() starts
+        self.start_time = None
+
+        self.frames_sent = 0
+        self.frames_dropped = 0
+
+    def sample_time(self, index):
+        """
+        Loop time at which a sample was recorded
+        :param index: Index of the sample in the record
+        :return: Time in the same clock as asyncio's loop.time()
+        """
+        return self.start_time + (index + 1) / (self.f_s * self.speed)
+
+    async def run(self, queue):
+        """
+        Send the whole record. Each item on the queue is (first sample index, samples); None marks the end.
+        :param queue: An asyncio.Queue, normally created with a maxsize
+        :return: None
+        """
+        loop = asyncio.get_running_loop()
+        self.start_time = loop.time()
+
+        for start in range(0, len(self.signal), self.frame_size):
+            frame = self.signal[start:start + self.frame_size]
+
+            # wait until the last sample of the frame has been recorded; if we are running
+            # late, send straight away and let the schedule catch up
+            delay = self.sample_time(start + len(frame) - 1) - loop.time()
+            await asyncio.sleep(max(delay, 0))
+
+            try:
+                queue.put_nowait((start, frame))
+                self.frames_sent += 1
+            except asyncio.QueueFull:
+                self.frames_dropped += 1
+
+        # the end marker must get through, so this is the one place the source waits
+        await queue.put(None)
+
+
+class ReplayConsumer:
+    """
+    Online detector fed from a ReplaySource queue. Runs the StreamingPanTompkins stages on each
+    frame as it arrives and records how long after its QRS complex each beat was reported.
+
+    Beats are envelope indices, in the same coordinates as detect_heartbeats(). Envelope value k
+    sums the squared slope of raw samples k + 1 - window to k + 1, so the QRS complex it marks was
+    recorded about half a window earlier than sample k; latency is measured from that centre.
+    """
+
+    def __init__(self, f_s, **params):
+        """
+        Create a new consumer
+        :param f_s: Sampling rate of the record (Hertz)
+        :param params: Any keyword arguments accepted by StreamingPanTompkins
+        """
+        self.detector = StreamingPanTompkins(f_s, **params)
+
+        self.beats = list()
+        self.latencies = list()
+
+        # raw samples between an envelope index and the centre of the window it sums
+        self.delay = self.detector.window / 2 - 1
+
+        # number of frames seen and gaps left by dropped frames
+        self.frames = 0
+        self.gaps = 0
+
+    def _report(self, beats, source, now):
+        for beat in beats:
+            self.beats.append(int(beat))
+            self.latencies.append(now - source.sample_time(int(beat) - self.delay))
+
+    async def run(self, queue, source):
+        """
+        Consume frames until the end marker
+        :param queue: The queue the source writes to
+        :param source: The ReplaySource, used for the time each sample was recorded
+        :return: None
+        """
+        loop = asyncio.get_running_loop()
+
+        # next expected sample, and the last sample received
+        expected = 0
+        last = None
+
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+
+            start, frame = item
+            self.frames += 1
+
+            if start != expected:
+                # frames were dropped. Restarting the detector would throw away its filter state and
+                # thresholds and bring back the startup transient, so bridge the gap with a straight
+                # line to the new frame instead; the envelope stays flat across it and beat indices
+                # stay in record coordinates
+                first = last if last is not None else frame[0]
+                bridge = np.linspace(first, frame[0], start - expected + 2)[1:-1]
+                self._report(self.detector.process(bridge), source, loop.time())
+                self.gaps += 1
+
+            expected = start + len(frame)
+            last = frame[-1]
+
+            beats = self.detector.process(frame)
+            self._report(beats, source, loop.time())
+
+        self._report(self.detector.flush(), source, loop.time())
+
+
+def latency_percentiles(latencies, percentiles=(50, 90, 95, 99)):
+    """
+    Summarize detection latency
+    :param latencies: Latency of each beat (seconds)
+    :param percentiles: Which percentiles to report
+    :return: Dictionary of 'p50', 'p90', ... and 'max' in milliseconds; NaN if there are no beats
+    """
+    latencies = np.asarray(latencies, dtype=float) * 1000
+
+    if latencies.size == 0:
+        return {**{'p' + str(p): float('nan') for p in percentiles}, 'max': float('nan')}
+
+    values = np.percentile(latencies, percentiles)
+
+    return {**{'p' + str(p): float(v) for p, v in zip(percentiles, values)}, 'max': float(np.max(latencies))}
+
+
+async def replay(signal, f_s, speed=1.0, frame_size=36, queue_size=64, **params):
+    """
+    Stream a signal from a ReplaySource to a ReplayConsumer over a bounded queue
+    :param signal: An array of raw EKG samples
+    :param f_s: Sampling rate of the record (Hertz)
+    :param speed: Playback speed; 1 is the native sampling rate
+    :param frame_size: Number of samples sent at a time
+    :param queue_size: Number of frames the queue can hold before frames are dropped
+    :param params: Any keyword arguments accepted by StreamingPanTompkins
+    :return: Dictionary of beats, latencies (seconds), and frame counts
+    """
+    queue = asyncio.Queue(maxsize=queue_size)
+    source = ReplaySource(signal, f_s, frame_size, speed)
+    consumer = ReplayConsumer(f_s, **params)
+
+    await asyncio.gather(source.run(queue), consumer.run(queue, source))
+
+    return {'beats': np.asarray(consumer.beats, dtype=int), 'latencies': np.asarray(consumer.latencies),
+            'frames_sent': source.frames_sent, 'frames_dropped': source.frames_dropped, 'gaps': consumer.gaps}
+
+
+def replay_record(database_name, speed=1.0, frame_size=36, queue_size=64, column=1, tolerance=None,
+                  path_to_folder=default_path_to_folder, **params):
+    """
+    Replay a record from the ekg folder and score the online detector against its annotations
+    :param database_name: Name of the record, e.g. mitdb_100
+    :param speed: Playback speed; 1 is the native sampling rate
+    :param frame_size: Number of samples sent at a time
+    :param queue_size: Number of frames the queue can hold before frames are dropped
+    :param column: Which lead to replay (1 or 2)
+    :param tolerance: Acceptable distance between a beat and an annotation (milliseconds); None uses the
+    testbench default
+    :param path_to_folder: Path to the ekg folder
+    :param params: Any keyword arguments accepted by StreamingPanTompkins
+    :return: Dictionary of replay results, F1 (NaN if there is nothing to score), and latency percentiles
+    """
+    base_path = find_record(database_name, path_to_folder)
+    data, metadata = load_ekg_record(base_path + ".csv")
+
+    result = asyncio.run(replay(data[:, column], metadata['f_s'], speed, frame_size, queue_size, **params))
+
+    testbench = EKGTestBench(base_path + "_annotations.txt", f_s=metadata['f_s'], tolerance=tolerance)
+    true_positive, false_positive, false_negative = testbench.count_stats(result['beats'])
+
+    scored = true_positive + 0.5 * (false_positive + false_negative)
+    result['f1'] = true_positive / scored if scored > 0 else float('nan')
+    result['latency'] = latency_percentiles(result['latencies'])
+
+    return result
+
+
+if __name__ == "__main__":
+
+    database_name = 'mitdb_100'
+
+    # 1 plays back in real time; the 30 minute record takes 3 minutes at 10x
+    speed = 10
+
+    result = replay_record(database_name, speed)
+
+    print("Record: ", database_name, "at", speed, "x")
+    print("Beats: ", len(result['beats']), "\tF1: ", round(result['f1'], 3))
+    print("Frames sent: ", result['frames_sent'], "\tdropped: ", result['frames_dropped'])
+    print("Latency (ms, wall clock): ", {k: round(v, 1) for k, v in result['latency'].items()})
@@ -0,0 +1,135 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from ekg_replay import ReplaySource, ReplayConsumer, replay, replay_record, latency_percentiles
+from streaming_pan_tompkins import detect_heartbeats_causal
+from streaming_pan_tompkins_unittest import synthetic_ekg
+
+
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        self.f_s = 360
+        self.signal, self.beats = synthetic_ekg(self.f_s, duration=10)
+
+    def test_same_beats_as_batch(self):
+        result = asyncio.run(replay(self.signal, self.f_s, speed=50, queue_size=len(self.signal)))
+
+        self.assertEqual(result['frames_dropped'], 0)
+        np.testing.assert_array_equal(result['beats'], detect_heartbeats_causal(self.signal, self.f_s))
+
+        # every beat is reported after its peak was recorded, and within the refractory wait
+        # plus a frame (with room for a slow machine)
+        wait = (150 + 36) / (self.f_s * 50)
+        self.assertEqual(len(result['latencies']), len(result['beats']))
+        self.assertTrue(np.all(result['latencies'] > 0))
+        self.assertLess(np.median(result['latencies']), 5 * wait)
+
+    def test_dropped_frames(self):
+        async def send_without_consumer():
+            queue = asyncio.Queue(maxsize=2)
+            source = ReplaySource(self.signal[:3600], self.f_s, frame_size=360, speed=1000)
+            sender = asyncio.create_task(source.run(queue))
+
+            # give the source time to fill the queue, then drain it so the end marker gets through
+            await asyncio.sleep(0.05)
+            items = [await queue.get(), await queue.get()]
+            items.append(await queue.get())
+            await sender
+
+            return source, items
+
+        source, items = asyncio.run(send_without_consumer())
+
+        self.assertEqual(source.frames_sent, 2)
+        self.assertEqual(source.frames_dropped, 8)
+        self.assertEqual(items[0][0], 0)
+        self.assertIsNone(items[-1])
+
+    def test_gap_is_bridged(self):
+        async def consume_with_gap(**params):
+            source = ReplaySource(self.signal, self.f_s)
+            source.start_time = 0.0
+
+            # one frame at a time, so a put only returns once the previous frame was processed
+            queue = asyncio.Queue(maxsize=1)
+            consumer = ReplayConsumer(self.f_s, **params)
+            task = asyncio.create_task(consumer.run(queue, source))
+
+            # the frame holding the third second of the record never arrives; note the sample
+            # that had been sent when each beat was reported
+            reported_at = list()
+            for start in range(0, len(self.signal), self.f_s):
+                if start != 2 * self.f_s:
+                    await queue.put((start, self.signal[start:start + self.f_s]))
+                    reported_at.extend([start] * (len(consumer.beats) - len(reported_at)))
+            await queue.put(None)
+            await task
+            reported_at.extend([len(self.signal)] * (len(consumer.beats) - len(reported_at)))
+
+            return consumer, np.asarray(reported_at)
+
+        # the detector keeps its state across the gap, as if a straight line had been recorded
+        bridged = self.signal.copy()
+        bridged[2 * self.f_s:3 * self.f_s] = np.linspace(self.signal[2 * self.f_s - 1], self.signal[3 * self.f_s],
+                                                         self.f_s + 2)[1:-1]
+
+        for adaptive in [False, True]:
+            consumer, reported_at = asyncio.run(consume_with_gap(adaptive=adaptive))
+            beats = np.asarray(consumer.beats)
+
+            self.assertEqual(consumer.gaps, 1)
+            np.testing.assert_array_equal(beats, detect_heartbeats_causal(bridged, self.f_s, adaptive=adaptive))
+
+            # beats after the gap are reported in record coordinates, and within a frame plus the
+            # refractory period rather than after the thresholds have been learned again
+            late_beats = self.beats[self.beats > 4 * self.f_s]
+            distances = np.min(np.abs(late_beats[:, None] - beats[None, :]), axis=1)
+            self.assertTrue(np.all(distances < 90))
+
+            after_gap = beats > 3 * self.f_s
+            self.assertTrue(np.all(reported_at[after_gap] - beats[after_gap] < 2 * self.f_s))
+
+    def test_latency_from_qrs(self):
+        source = ReplaySource(self.signal, self.f_s)
+        source.start_time = 0.0
+        consumer = ReplayConsumer(self.f_s, window=20)
+
+        # envelope value 100 is complete once raw sample 101 arrives; the QRS complex it marks is
+        # at the centre of its window, half a window earlier
+        consumer._report([100], source, source.sample_time(101))
+
+        self.assertEqual(consumer.beats, [100])
+        self.assertAlmostEqual(consumer.latencies[0], 10 / self.f_s)
+
+    def test_replay_record_tolerance(self):
+        from processed_records_unittest import write_record, write_annotations
+
+        folder = tempfile.mkdtemp()
+        try:
+            write_record(os.path.join(folder, "mitdb_900.csv"), self.signal, self.f_s)
+            write_annotations(os.path.join(folder, "mitdb_900_annotations.txt"), self.beats, self.f_s)
+
+            scores = [replay_record('mitdb_900', speed=100, queue_size=len(self.signal), tolerance=tolerance,
+                                    path_to_folder=folder)['f1'] for tolerance in [None, 250, 1]]
+        finally:
+            shutil.rmtree(folder)
+
+        # the default is the testbench's 90 samples (250 ms at 360 Hz); a 1 ms tolerance is less
+        # than a sample, which the envelope peaks are not that close to
+        self.assertAlmostEqual(scores[0], 1.0)
+        self.assertEqual(scores[1], scores[0])
+        self.assertLess(scores[2], 0.5)
+
+    def test_latency_percentiles(self):
+        summary = latency_percentiles([0.1, 0.2, 0.3, 0.4], percentiles=(50,))
+
+        self.assertAlmostEqual(summary['p50'], 250)
+        self.assertAlmostEqual(summary['max'], 400)
+        self.assertTrue(np.isnan(latency_percentiles([])['p99']))
+
+
+if __name__ == '__main__':
+    unittest.main()
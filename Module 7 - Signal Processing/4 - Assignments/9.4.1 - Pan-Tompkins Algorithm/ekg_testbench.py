@@ -1,7 +1,27 @@
+import json
 import os
+import tempfile
+
+import numpy as np
+
+
+# layout of one parsed annotation line
+ANNOTATION_DTYPE = np.dtype([('time', 'f8'), ('sample', 'i8'), ('annotation', 'U2'), ('channel', 'i4'),
+                             ('number', 'i4'), ('extra', 'U8'), ('rhythm_annotation', 'U8')])
+
+# annotation codes that mark a beat. Everything else marks something that is not a QRS complex,
+# e.g. a rhythm change (+), noise (~), a non-conducted P wave (x), or a comment (")
+BEAT_CODES = ('N', 'L', 'R', 'B', 'A', 'a', 'J', 'S', 'V', 'r', 'F', 'e', 'j', 'n', 'E', '/', 'f', 'Q', '?')
+
+# bumped whenever parsing changes, so annotation caches written by older code are rebuilt
+CACHE_VERSION = 2
+
+# acceptable distance between a response and an annotation when no tolerance is given (samples)
+default_delta = 90
 
 
 class EKGAnnotation:
+    __slots__ = ('time', 'sample', 'annotation', 'channel', 'number', 'extra', 'rhythm_annotation')
 
     def __init__(self, _time, _sample, _annotation, _ch, _num, _db_extra, _rhythm_annotation=''):
         self.time = self.__convert_to_seconds__(_time)
@@ -15,23 +35,216 @@ class EKGAnnotation:
         return
 
     def __convert_to_seconds__(self, time):
-        # find all the colons
-        elements = time.split(":")
-
-        # convert into seconds
-        if len(elements) == 2:
-            minutes = float(elements[0]) * 60
-            seconds = float(elements[1])
-
-            return minutes * 60 + seconds
-
-        # default handler
-        return time
+        # already converted (e.g. loaded from the cache)
+        if not isinstance(time, str):
+            return float(time)
+
+        return convert_to_seconds(time)
+
+
+def convert_to_seconds(time):
+    # find all the colons
+    elements = time.split(":")
+
+    # convert into seconds
+    if len(elements) == 2:
+        minutes = float(elements[0]) * 60
+        seconds = float(elements[1])
+
+        return minutes + seconds
+
+    # default handler
+    return time
+
+
+def parse_annotation_file(filepath):
+    """
+    Parse an annotation text file into a structured array with one row per line
+    :param filepath: Path to a *_annotations.txt file
+    :return: A structured array with ANNOTATION_DTYPE fields
+    """
+    rows = list()
+
+    # open path to annotation file
+    file = open(filepath)
+
+    # parse each line individually
+    for line in file:
+        values = line.split()
+
+        # check to see if an optional rhythm is present
+        rhythm = ''
+        if len(values) == 7:
+            rhythm = values[6]
+
+        # convert time the same way EKGAnnotation does; keep NaN if it is not min:sec
+        time = convert_to_seconds(values[0])
+        if isinstance(time, str):
+            time = np.nan
+
+        rows.append((time, int(values[1]), values[2], int(values[3]), int(values[4]), values[5], rhythm))
+
+    file.close()
+
+    return np.array(rows, dtype=ANNOTATION_DTYPE)
+
+
+def load_annotations(filepath, use_cache=True):
+    """
+    Load a parsed annotation file. The first time a file is loaded, the parsed result is saved
+    next to it as a .npy file (plus a small .json file describing the source). Later loads
+    memory-map the .npy file instead of parsing the text again, as long as the source file
+    has the same size and modification time.
+    :param filepath: Path to a *_annotations.txt file
+    :param use_cache: Set to False to always parse the text file
+    :return: A structured array with ANNOTATION_DTYPE fields
+    """
+    if not use_cache:
+        return parse_annotation_file(filepath)
+
+    base_path = os.path.splitext(filepath)[0]
+    cache_path = base_path + ".npy"
+    info_path = base_path + ".json"
+
+    stats = os.stat(filepath)
+    source = {"size": stats.st_size, "mtime_ns": stats.st_mtime_ns, "version": CACHE_VERSION}
+
+    # use the cache if it was built from this exact file
+    try:
+        with open(info_path) as file:
+            cached_source = json.load(file)
+        if cached_source == source:
+            records = np.load(cache_path, mmap_mode='r')
+            if records.dtype == ANNOTATION_DTYPE:
+                return records
+    except (OSError, ValueError):
+        pass
+
+    records = parse_annotation_file(filepath)
+
+    # saving is best effort; the folder may be read only. Each file is written under a unique
+    # name and moved into place, so a reader (or another process building the same cache) never
+    # sees a half written file, and a memory-mapped old cache is left intact
+    try:
+        _replace_file(cache_path, lambda file: np.save(file, records))
+        _replace_file(info_path, lambda file: file.write(json.dumps(source).encode()))
+    except OSError:
+        pass
+
+    return records
+
+
+def _replace_file(path, write):
+    """
+    Write a file next to path and move it over path in one step; removes the partial file on failure
+    """
+    descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path) or None,
+                                                  prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            write(file)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+
+
+class EKGAnnotationView:
+    """
+    A read-only view of a single row in an EKGAnnotations store. Has the same attributes as
+    EKGAnnotation without copying any data out of the store.
+    """
+    __slots__ = ('_store', '_index')
+
+    def __init__(self, store, index):
+        self._store = store
+        self._index = index
+
+    @property
+    def time(self):
+        return float(self._store.time[self._index])
+
+    @property
+    def sample(self):
+        return int(self._store.sample[self._index])
+
+    @property
+    def annotation(self):
+        return str(self._store.annotation[self._index])
+
+    @property
+    def channel(self):
+        return int(self._store.channel[self._index])
+
+    @property
+    def number(self):
+        return int(self._store.number[self._index])
+
+    @property
+    def extra(self):
+        return str(self._store.extra[self._index])
+
+    @property
+    def rhythm_annotation(self):
+        return str(self._store.rhythm_annotation[self._index])
+
+
+class EKGAnnotations:
+    """
+    Columnar storage for a list of annotations. Each field is kept as its own NumPy array
+    rather than as one Python object per beat. Indexing with an integer returns an
+    EKGAnnotationView; indexing with a slice, mask, or index array returns a new store.
+    """
+
+    def __init__(self, records):
+        """
+        :param records: A structured array with ANNOTATION_DTYPE fields
+        """
+        self.time = records['time']
+        self.sample = np.ascontiguousarray(records['sample'])
+        self.annotation = records['annotation']
+        self.channel = records['channel']
+        self.number = records['number']
+        self.extra = records['extra']
+        self.rhythm_annotation = records['rhythm_annotation']
+
+        # True for every annotation that is a beat, worked out once for the whole store
+        self.is_beat = np.isin(self.annotation, BEAT_CODES)
+
+        self.records = records
+
+    def __len__(self):
+        return len(self.sample)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            if index < 0:
+                index += len(self)
+            if index < 0 or index >= len(self):
+                raise IndexError("annotation index out of range")
+            return EKGAnnotationView(self, index)
+
+        return EKGAnnotations(self.records[index])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield EKGAnnotationView(self, i)
+
+    def copy(self):
+        return EKGAnnotations(np.array(self.records))
 
 
 class EKGTestBench:
 
-    def __init__(self, filepath):
+    def __init__(self, filepath, use_cache=True, f_s=None, tolerance=None):
+        """
+        Load the annotations for a record
+        :param filepath: Path to a *_annotations.txt file
+        :param use_cache: Set to False to always parse the text file
+        :param f_s: Sampling rate of the record (Hertz). Estimated from the annotation times if not given.
+        :param tolerance: Default acceptable distance between a response and an annotation (milliseconds).
+        If not given, the original 90 sample window is used.
+        """
 
         file_exists = os.path.exists(filepath)
 
@@ -43,77 +256,360 @@ class EKGTestBench:
         # store the path to file
         self.file_path = filepath
 
-        # store annotations list
-        self.annotations = list()
-
-        # store annotation indices as this is useful
-        self.annotation_indices = list()
-
-        # open path to annotation file
-        file = open(filepath)
-
-        # parse each line individually
-        for line in file:
-            line = line.replace("\t", " ")
-            elements = line.rstrip().split(" ")
+        # load parsed annotations, from the cache if possible, and store them by column
+        self.annotations = EKGAnnotations(load_annotations(filepath, use_cache))
+
+        self.f_s = f_s if f_s is not None else estimate_sampling_rate(self.annotations)
+        self.tolerance = tolerance
+
+    @property
+    def annotation_indices(self):
+        # sample locations of each annotation; kept as a property as this is useful
+        return self.annotations.sample
+
+    @property
+    def beat_annotations(self):
+        # only the annotations that are beats; selected once and then reused
+        if not hasattr(self, '_beat_annotations'):
+            self._beat_annotations = self.annotations[self.annotations.is_beat]
+        return self._beat_annotations
+
+    def scored_annotations(self, beats_only=False):
+        """
+        The annotations that detector responses are scored against
+        :param beats_only: Leave out annotations that are not beats (rhythm changes, noise, etc.)
+        :return: An EKGAnnotations store
+        """
+        return self.beat_annotations if beats_only else self.annotations
+
+    def tolerance_samples(self, tolerance=None):
+        """
+        Acceptable distance between a response and an annotation in samples of this record
+        :param tolerance: Tolerance (milliseconds); None uses the tolerance the testbench was created with
+        :return: Distance in samples (may be fractional)
+        """
+        if tolerance is None:
+            tolerance = self.tolerance
+
+        if tolerance is None:
+            return default_delta
+
+        # rounded so a tolerance that is a whole number of samples is exactly that number
+        return round(tolerance / 1000 * self.f_s, 9)
+
+    def generate_stats(self, detector_responses, beats_only=False, tolerance=None):
 
-            values = list()
-            for e in elements:
-                if e == '':
-                    continue
-                else:
-                    values.append(e)
-
-            # check to see if an optional rhythm is present
-            rhythm = ''
-            if len(values) == 7:
-                rhythm = values[6]
-
-            # create an annotation object
-            ann = EKGAnnotation(values[0], values[1], values[2], values[3], values[4], values[5], rhythm)
-
-            # store object in own list and indices in another
-            self.annotations.append(ann)
-            self.annotation_indices.append(ann.sample)
-
-        file.close()
+        # double check that responses are sorted; do not assume
+        detector_responses = np.sort(np.asarray(detector_responses, dtype=int))
 
-    def generate_stats(self, detector_responses):
+        # acceptable solutions are within the tolerance of the annotation
+        delta = self.tolerance_samples(tolerance)
 
-        # double check that responses are sorted; do not assume
-        detector_responses.sort()
+        # sample locations of each annotation, in file order
+        scored = self.scored_annotations(beats_only)
+        annotation_samples = np.asarray(scored.sample, dtype=int)
 
-        # acceptable solutions are within 5% of the annotation
-        delta = 90
+        # walk both sorted lists once
+        response_indices, annotation_indices, unmatched_indices = match_responses(annotation_samples,
+                                                                                  detector_responses, delta)
 
         # pair of responses and annotations that have been acceptable matched
-        matched = list()
+        matched = [(int(detector_responses[r]), int(annotation_samples[a]))
+                   for r, a in zip(response_indices, annotation_indices)]
 
         # responses that were unmatched to an annotation
-        unmatched = list()
+        unmatched = detector_responses[unmatched_indices].tolist()
 
-        # create copy of annotations list so we can modify
-        annotations = self.annotations.copy()
-
-        # go through the response list
-        for r in detector_responses:
-            annotation_to_be_removed = None
-
-            # for this response, search through annotations for a match within delta
-            for a in annotations:
-
-                # this is matched positive event
-                if abs(r - a.sample) < delta:
-                    annotation_to_be_removed = a
-                    matched.append((r, a.sample))
-                    break
-
-                # event is unmatched in list, stop scanning
-                if a.sample > r + delta:
-                    unmatched.append(r)
-                    break
-
-            if annotation_to_be_removed is not None:
-                annotations.remove(annotation_to_be_removed)
+        # whatever annotations were not used remain
+        is_remaining = np.ones(len(scored), dtype=bool)
+        is_remaining[annotation_indices] = False
+        annotations = scored[is_remaining]
 
         return matched, unmatched, annotations
+
+    def count_stats(self, detector_responses, beats_only=False, tolerance=None):
+        """
+        Faster version of generate_stats() for when only the counts are needed
+        :param detector_responses: Indices of detected heartbeats
+        :param beats_only: Leave out annotations that are not beats (rhythm changes, noise, etc.)
+        :param tolerance: Acceptable distance to an annotation (milliseconds); None uses the testbench default
+        :return: Number of true positives, false positives, and false negatives
+        """
+        detector_responses = np.sort(np.asarray(detector_responses, dtype=int))
+        annotation_samples = np.asarray(self.scored_annotations(beats_only).sample, dtype=int)
+
+        return count_matches(annotation_samples, detector_responses, self.tolerance_samples(tolerance))
+
+    def tolerance_sweep(self, detector_responses, tolerances=np.arange(10, 160, 10), beats_only=True):
+        """
+        Score detector responses at many tolerances at once, e.g. for a tolerance-sensitivity curve
+        :param detector_responses: Indices of detected heartbeats
+        :param tolerances: Tolerances to score at (milliseconds)
+        :param beats_only: Leave out annotations that are not beats (rhythm changes, noise, etc.). On by
+        default, as rhythm annotations often share a sample with a beat, which makes sweep_matches() fall
+        back to scoring each tolerance separately
+        :return: Dictionary of arrays: tolerance, true_positive, false_positive, false_negative, and f1
+        """
+        detector_responses = np.sort(np.asarray(detector_responses, dtype=int))
+        annotation_samples = np.asarray(self.scored_annotations(beats_only).sample, dtype=int)
+
+        tolerances = np.asarray(tolerances, dtype=float)
+        deltas = np.round(tolerances / 1000 * self.f_s, 9)
+        true_positive, false_positive, false_negative = sweep_matches(annotation_samples, detector_responses, deltas)
+
+        scored = true_positive + 0.5 * (false_positive + false_negative)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            f1 = np.where(scored > 0, true_positive / scored, np.nan)
+
+        return {'tolerance': tolerances, 'true_positive': true_positive, 'false_positive': false_positive,
+                'false_negative': false_negative, 'f1': f1}
+
+    def class_stats(self, detector_responses, beats_only=True, tolerance=None):
+        """
+        Score detector responses once and break the result down by annotation code. The detector
+        does not label its beats, so a false positive can not be blamed on a class: sensitivity
+        is given per class, and PPV for all responses together.
+        :param detector_responses: Indices of detected heartbeats
+        :param beats_only: Leave out annotations that are not beats (rhythm changes, noise, etc.)
+        :param tolerance: Acceptable distance to an annotation (milliseconds); None uses the testbench default
+        :return:
+        per_class: dictionary of annotation code to its count, true_positive, false_negative, and sensitivity
+        overall: dictionary of true_positive, false_positive, false_negative, sensitivity, and ppv
+        """
+        detector_responses = np.sort(np.asarray(detector_responses, dtype=int))
+
+        scored = self.scored_annotations(beats_only)
+        annotation_samples = np.asarray(scored.sample, dtype=int)
+
+        delta = self.tolerance_samples(tolerance)
+        is_matched, is_unmatched, matched_annotations = match_flags(annotation_samples, detector_responses, delta)
+
+        # count annotations and matches of each code with one bincount each
+        codes, classes = np.unique(np.asarray(scored.annotation), return_inverse=True)
+        classes = classes.ravel()
+        totals = np.bincount(classes, minlength=len(codes))
+        detected = np.bincount(classes[matched_annotations], minlength=len(codes))
+
+        per_class = dict()
+        for code, total, true_positive in zip(codes.tolist(), totals.tolist(), detected.tolist()):
+            per_class[code] = {'count': total, 'true_positive': true_positive,
+                               'false_negative': total - true_positive, 'sensitivity': true_positive / total}
+
+        true_positive = int(np.count_nonzero(is_matched))
+        false_positive = int(np.count_nonzero(is_unmatched))
+        false_negative = len(scored) - true_positive
+
+        overall = {'true_positive': true_positive, 'false_positive': false_positive,
+                   'false_negative': false_negative,
+                   'sensitivity': true_positive / len(scored) if len(scored) > 0 else float('nan'),
+                   'ppv': true_positive / (true_positive + false_positive) if true_positive + false_positive > 0
+                   else float('nan')}
+
+        return per_class, overall
+
+
+def estimate_sampling_rate(annotations):
+    """
+    Work out a record's sampling rate from the time and sample number of its annotations
+    :param annotations: An EKGAnnotations store
+    :return: Sampling rate (Hertz), or NaN if there are not enough annotations with a time
+    """
+    has_time = np.isfinite(annotations.time)
+    times = annotations.time[has_time]
+    samples = annotations.sample[has_time]
+
+    if len(times) < 2 or times[-1] == times[0]:
+        return float('nan')
+
+    # times are only given to the millisecond, so anything past the second decimal place is noise
+    return round(float((samples[-1] - samples[0]) / (times[-1] - times[0])), 2)
+
+
+def match_responses(annotation_samples, responses, delta):
+    """
+    Match sorted detector responses to sorted annotations with a single merge-style pass.
+    Each response is paired with the earliest unused annotation that is strictly within delta.
+    A response that is not paired is unmatched if there is a later annotation beyond its window;
+    responses after the last annotation are neither matched nor unmatched.
+    :param annotation_samples: A sorted array of annotation sample indices
+    :param responses: A sorted array of detector responses (sample indices)
+    :param delta: Acceptable distance between a response and annotation (samples)
+    :return:
+    response_indices: index of each matched response
+    annotation_indices: index of the annotation each of those responses was matched to
+    unmatched_indices: index of each unmatched response
+    """
+    n_annotations = len(annotation_samples)
+    last_annotation = annotation_samples[-1] if n_annotations > 0 else None
+
+    response_indices = list()
+    annotation_indices = list()
+    unmatched_indices = list()
+
+    # the earliest annotation that could still be matched
+    a = 0
+
+    for r, response in enumerate(responses.tolist()):
+        # annotations this far behind can never be matched by this or any later response
+        while a < n_annotations and annotation_samples[a] <= response - delta:
+            a += 1
+
+        # out of annotations; response is not counted
+        if a == n_annotations:
+            continue
+
+        if annotation_samples[a] < response + delta:
+            response_indices.append(r)
+            annotation_indices.append(a)
+            a += 1
+        elif last_annotation > response + delta:
+            unmatched_indices.append(r)
+
+    return (np.asarray(response_indices, dtype=int), np.asarray(annotation_indices, dtype=int),
+            np.asarray(unmatched_indices, dtype=int))
+
+
+def count_matches(annotation_samples, responses, delta):
+    """
+    Vectorized version of match_responses() that only counts the results. Gives the same counts
+    as match_responses() but avoids a Python loop, so many candidate sets can be scored quickly.
+    :param annotation_samples: A sorted array of annotation sample indices
+    :param responses: A sorted array of detector responses (sample indices)
+    :param delta: Acceptable distance between a response and annotation (samples)
+    :return: Number of true positives, false positives, and false negatives
+    """
+    is_matched, is_unmatched, matched_annotations = match_flags(annotation_samples, responses, delta)
+
+    true_positive = int(np.count_nonzero(is_matched))
+    false_positive = int(np.count_nonzero(is_unmatched))
+    false_negative = len(annotation_samples) - true_positive
+
+    return true_positive, false_positive, false_negative
+
+
+def match_flags(annotation_samples, responses, delta):
+    """
+    Vectorized matching used by count_matches(). Same pairing as match_responses().
+    :param annotation_samples: A sorted array of annotation sample indices
+    :param responses: A sorted array of detector responses (sample indices)
+    :param delta: Acceptable distance between a response and annotation (samples)
+    :return:
+    is_matched: True for each response that matched an annotation
+    is_unmatched: True for each response that counts as a false positive
+    matched_annotations: index of the annotation matched by each matched response
+    """
+    annotation_samples = np.asarray(annotation_samples)
+    responses = np.asarray(responses)
+    n_annotations = len(annotation_samples)
+
+    if n_annotations == 0 or len(responses) == 0:
+        is_matched = np.zeros(len(responses), dtype=bool)
+        return is_matched, is_matched.copy(), np.zeros(0, dtype=int)
+
+    # the earliest annotation each response could match if nothing were used yet
+    earliest = np.searchsorted(annotation_samples, responses - delta, side='right')
+
+    # a response can not use an annotation an earlier response matched. Each pass fixes the
+    # next response in every chain of conflicts; usually only one or two passes are needed
+    pointer = earliest
+    while True:
+        safe = np.minimum(pointer, n_annotations - 1)
+        is_matched = (pointer < n_annotations) & (annotation_samples[safe] < responses + delta)
+
+        # one past the last annotation matched by any earlier response
+        used = np.where(is_matched, pointer + 1, 0)
+        used = np.concatenate(([0], np.maximum.accumulate(used)[:-1]))
+
+        updated = np.maximum(earliest, used)
+        if np.array_equal(updated, pointer):
+            break
+        pointer = updated
+
+    is_unmatched = ~is_matched & (pointer < n_annotations) & (annotation_samples[-1] > responses + delta)
+
+    return is_matched, is_unmatched, pointer[is_matched]
+
+
+def sweep_matches(annotation_samples, responses, deltas):
+    """
+    Count matches for many tolerances in one pass. Each response is paired with its nearest
+    annotation when that annotation's nearest response is the same response (mutual nearest
+    neighbours). Sorting the pair distances gives a cumulative histogram, so the matches at
+    every tolerance are a single searchsorted. This equals count_matches() as long as every
+    response is within delta of at most one annotation and the other way round, i.e. while delta
+    is no more than the distance from any response (annotation) to its second nearest annotation
+    (response). Only the pairs a detector actually produces limit this, so for beat annotations
+    and responses a refractory period apart it holds for any sensible tolerance. Wider deltas
+    (e.g. with a rhythm annotation on the same sample as a beat) are counted with count_matches()
+    instead, so the result always matches it.
+    :param annotation_samples: A sorted array of annotation sample indices
+    :param responses: A sorted array of detector responses (sample indices)
+    :param deltas: Array of acceptable distances between a response and annotation (samples)
+    :return: Arrays of the number of true positives, false positives, and false negatives at each delta
+    """
+    annotation_samples = np.asarray(annotation_samples, dtype=float)
+    responses = np.asarray(responses, dtype=float)
+    deltas = np.asarray(deltas, dtype=float)
+    n_annotations = len(annotation_samples)
+
+    if n_annotations == 0 or len(responses) == 0:
+        zeros = np.zeros(len(deltas), dtype=int)
+        return zeros, zeros.copy(), np.full(len(deltas), n_annotations)
+
+    nearest_annotation = _nearest(annotation_samples, responses)
+    nearest_response = _nearest(responses, annotation_samples)
+
+    # pairs where each is the other's nearest neighbour, and their distances sorted
+    is_pair = nearest_response[nearest_annotation] == np.arange(len(responses))
+    distances = np.abs(responses - annotation_samples[nearest_annotation])
+    distances[~is_pair] = np.inf
+    sorted_distances = np.sort(distances)
+
+    # matches are strictly within delta
+    true_positive = np.searchsorted(sorted_distances, deltas, side='left')
+
+    # unmatched responses only count while there is an annotation beyond their window, i.e.
+    # while delta < (last annotation - response)
+    room = annotation_samples[-1] - responses
+    eligible = len(responses) - np.searchsorted(np.sort(room), deltas, side='right')
+
+    # matched responses near the end that are not eligible must not be taken off twice
+    tail = room <= np.max(deltas)
+    matched_in_tail = np.sum((distances[tail, None] < deltas) & (room[tail, None] <= deltas), axis=0)
+
+    false_positive = eligible - (true_positive - matched_in_tail)
+    false_negative = n_annotations - true_positive
+
+    # the closest second neighbour either way limits the deltas the pairs above are exact for
+    limit = min(np.min(_second_nearest_distance(annotation_samples, responses, nearest_annotation), initial=np.inf),
+                np.min(_second_nearest_distance(responses, annotation_samples, nearest_response), initial=np.inf))
+    for i in np.flatnonzero(deltas > limit):
+        true_positive[i], false_positive[i], false_negative[i] = count_matches(annotation_samples, responses,
+                                                                               deltas[i])
+
+    return true_positive, false_positive, false_negative
+
+
+def _nearest(sorted_values, queries):
+    """
+    Index of the nearest value in a sorted array for each query; ties go to the earlier value
+    """
+    right = np.clip(np.searchsorted(sorted_values, queries), 1, len(sorted_values) - 1)
+    left = right - 1
+
+    if len(sorted_values) == 1:
+        return np.zeros(len(queries), dtype=int)
+
+    use_left = np.abs(queries - sorted_values[left]) <= np.abs(sorted_values[right] - queries)
+
+    return np.where(use_left, left, right)
+
+
+def _second_nearest_distance(sorted_values, queries, nearest):
+    """
+    Distance from each query to its second nearest value, given the index of its nearest; the
+    second nearest is always a neighbour of the nearest. Infinite if there is only one value.
+    """
+    padded = np.concatenate(([-np.inf], sorted_values, [np.inf]))
+
+    return np.minimum(np.abs(queries - padded[nearest]), np.abs(padded[nearest + 2] - queries))
@@ -0,0 +1,314 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+from ekg_testbench import EKGTestBench, match_responses, count_matches, load_annotations, parse_annotation_file, \
+    sweep_matches
+
+# path to ekg folder
+path_to_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../data/ekg/")
+
+
+def legacy_generate_stats(annotation_samples, detector_responses, delta=90):
+    """
+    The original list based matcher from EKGTestBench.generate_stats, kept to check the new one against
+    """
+    detector_responses = sorted(detector_responses)
+    matched = list()
+    unmatched = list()
+    annotations = list(annotation_samples)
+
+    for r in detector_responses:
+        annotation_to_be_removed = None
+        for a in annotations:
+            if abs(r - a) < delta:
+                annotation_to_be_removed = a
+                matched.append((r, a))
+                break
+            if a > r + delta:
+                unmatched.append(r)
+                break
+        if annotation_to_be_removed is not None:
+            annotations.remove(annotation_to_be_removed)
+
+    return matched, unmatched, annotations
+
+
+class TestMatcher(unittest.TestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(1)
+
+    def random_case(self):
+        # closely spaced annotations and responses so that conflicts actually happen
+        annotations = np.unique(np.cumsum(self.rng.integers(20, 400, size=200)))
+        responses = np.unique(np.concatenate((annotations + self.rng.integers(-120, 120, size=len(annotations)),
+                                              self.rng.integers(0, annotations[-1] + 500, size=40))))
+        return annotations, responses
+
+    def test_matches_legacy(self):
+        for _ in range(50):
+            annotations, responses = self.random_case()
+
+            legacy_matched, legacy_unmatched, legacy_remaining = legacy_generate_stats(annotations, responses.tolist())
+            r, a, u = match_responses(annotations, responses, 90)
+
+            self.assertEqual(legacy_matched, list(zip(responses[r].tolist(), annotations[a].tolist())))
+            self.assertEqual(legacy_unmatched, responses[u].tolist())
+            self.assertEqual(len(legacy_remaining), len(annotations) - len(a))
+
+    def test_count_matches(self):
+        for _ in range(50):
+            annotations, responses = self.random_case()
+
+            r, a, u = match_responses(annotations, responses, 90)
+            expected = (len(r), len(u), len(annotations) - len(a))
+
+            self.assertEqual(count_matches(annotations, responses, 90), expected)
+
+    def test_empty(self):
+        self.assertEqual(count_matches(np.asarray([100, 500]), np.asarray([], dtype=int), 90), (0, 0, 2))
+
+
+class TestEKGTestBench(unittest.TestCase):
+    def setUp(self):
+        self.tb = EKGTestBench(path_to_folder + "mitdb_100_annotations.txt")
+
+    def test_generate_stats(self):
+        samples = np.asarray(self.tb.annotation_indices)
+
+        # perfect detector with a few extra responses
+        responses = np.sort(np.concatenate((samples[10:] + 5, [samples[20] + 200, samples[30] + 200])))
+        matched, unmatched, remaining = self.tb.generate_stats(responses.tolist())
+
+        legacy_matched, legacy_unmatched, legacy_remaining = legacy_generate_stats(samples, responses.tolist())
+
+        self.assertEqual(matched, legacy_matched)
+        self.assertEqual(unmatched, legacy_unmatched)
+        self.assertEqual([fn.sample for fn in remaining], legacy_remaining)
+
+    def test_annotation_store(self):
+        first = self.tb.annotations[0]
+        self.assertEqual((first.time, first.sample, first.annotation, first.rhythm_annotation), (0.05, 18, '+', '(N'))
+        self.assertEqual(self.tb.annotations[-1].sample, self.tb.annotation_indices[-1])
+
+        subset = self.tb.annotations[10:20]
+        self.assertEqual(len(subset), 10)
+        self.assertEqual([a.sample for a in subset], self.tb.annotation_indices[10:20].tolist())
+
+        with self.assertRaises(IndexError):
+            self.tb.annotations[len(self.tb.annotations)]
+
+    def test_sampling_rate(self):
+        # 30:05.531 is the time of the last annotation
+        self.assertAlmostEqual(self.tb.annotations[-1].time, 30 * 60 + 5.531)
+        self.assertEqual(self.tb.f_s, 360)
+
+        qtdb = EKGTestBench(path_to_folder + "qtdb_sel104_annotations.txt")
+        self.assertEqual(qtdb.f_s, 250)
+        self.assertEqual(qtdb.tolerance_samples(150), 37.5)
+
+    def test_tolerance(self):
+        offsets = np.random.default_rng(2).integers(-30, 31, len(self.tb.annotations))
+        responses = np.sort(self.tb.annotation_indices + offsets)
+
+        # 250 ms is 90 samples at 360 Hz
+        self.assertEqual(self.tb.count_stats(responses, tolerance=250), self.tb.count_stats(responses))
+        self.assertEqual(self.tb.count_stats(responses, tolerance=50),
+                         count_matches(self.tb.annotation_indices, responses, 18))
+
+        tb = EKGTestBench(path_to_folder + "mitdb_100_annotations.txt", tolerance=50)
+        self.assertEqual(tb.count_stats(responses), count_matches(self.tb.annotation_indices, responses, 18))
+
+    def test_tolerance_sweep(self):
+        beats = self.tb.beat_annotations.sample
+        rng = np.random.default_rng(3)
+
+        # jittered beats with a few misses and some extra responses, including at the very end
+        keep = rng.random(len(beats)) > 0.05
+        responses = np.sort(np.concatenate((beats[keep] + rng.integers(-40, 41, np.count_nonzero(keep)),
+                                            rng.integers(0, beats[-1], 100), [beats[-1] - 30, beats[-1] + 10])))
+
+        tolerances = np.arange(10, 160, 5)
+        sweep = self.tb.tolerance_sweep(responses, tolerances, beats_only=True)
+
+        for i, tolerance in enumerate(tolerances):
+            expected = self.tb.count_stats(responses, beats_only=True, tolerance=tolerance)
+            counts = (sweep['true_positive'][i], sweep['false_positive'][i], sweep['false_negative'][i])
+            self.assertEqual(counts, expected)
+
+        self.assertTrue(np.all(np.diff(sweep['true_positive']) >= 0))
+
+    def test_tolerance_sweep_all_annotations(self):
+        # mitdb_219 has rhythm and noise annotations close to beats; with every annotation scored
+        # the mutual nearest pairs alone disagree with count_stats() above 100 ms
+        tb = EKGTestBench(path_to_folder + "mitdb_219_annotations.txt")
+        beats = tb.beat_annotations.sample
+        rng = np.random.default_rng(0)
+
+        responses = np.sort(np.concatenate((beats + rng.integers(-30, 31, len(beats)),
+                                            rng.integers(0, beats[-1], 200))))
+
+        tolerances = np.arange(10, 160, 10)
+        sweep = tb.tolerance_sweep(responses, tolerances, beats_only=False)
+
+        for i, tolerance in enumerate(tolerances):
+            counts = (sweep['true_positive'][i], sweep['false_positive'][i], sweep['false_negative'][i])
+            self.assertEqual(counts, tb.count_stats(responses, tolerance=tolerance))
+
+    def test_tolerance_sweep_fast_path(self):
+        # a detector's responses are a refractory period apart, so scored against the beats of a
+        # real record every tolerance comes from the one pass, without falling back
+        beats = self.tb.beat_annotations.sample
+        rng = np.random.default_rng(4)
+
+        keep = rng.random(len(beats)) > 0.02
+        responses = beats[keep] + rng.integers(-20, 21, np.count_nonzero(keep))
+
+        with mock.patch('ekg_testbench.count_matches', wraps=count_matches) as counter:
+            sweep = self.tb.tolerance_sweep(responses, np.arange(10, 160, 10))
+
+        self.assertEqual(counter.call_count, 0)
+        self.assertEqual(sweep['false_negative'][-1], np.count_nonzero(~keep))
+
+    def test_sweep_close_annotations(self):
+        # 110 is nearest to 112, but the matcher pairs it with 100 and leaves 112 for 125
+        annotations = [100, 112, 1000]
+        responses = [110, 125]
+
+        true_positive, false_positive, false_negative = sweep_matches(annotations, responses, [5, 20])
+
+        for i, delta in enumerate([5, 20]):
+            self.assertEqual((true_positive[i], false_positive[i], false_negative[i]),
+                             count_matches(annotations, responses, delta))
+
+    def test_sweep_empty(self):
+        true_positive, false_positive, false_negative = sweep_matches([10, 20], [], [5, 10])
+
+        np.testing.assert_array_equal(true_positive, [0, 0])
+        np.testing.assert_array_equal(false_negative, [2, 2])
+
+    def test_beats_only(self):
+        annotations = self.tb.annotations
+        self.assertFalse(annotations.is_beat[0])
+        self.assertEqual(np.count_nonzero(~annotations.is_beat), 1)
+
+        # a detector that finds exactly the beats misses only the rhythm marker
+        beats = self.tb.beat_annotations.sample
+        self.assertEqual(self.tb.count_stats(beats), (len(beats), 0, 1))
+        self.assertEqual(self.tb.count_stats(beats, beats_only=True), (len(beats), 0, 0))
+
+        matched, unmatched, remaining = self.tb.generate_stats(beats, beats_only=True)
+        self.assertEqual((len(matched), len(unmatched), len(remaining)), (len(beats), 0, 0))
+
+    def test_class_stats(self):
+        beats = self.tb.beat_annotations
+
+        # miss every atrial premature beat and add one extra response
+        responses = np.concatenate((beats.sample[beats.annotation != 'A'], [beats.sample[100] + 150]))
+        per_class, overall = self.tb.class_stats(responses)
+
+        self.assertEqual(sorted(per_class), ['A', 'N', 'V'])
+        self.assertEqual(per_class['A']['sensitivity'], 0)
+        self.assertEqual(per_class['A']['false_negative'], 33)
+        self.assertEqual(per_class['N']['sensitivity'], 1)
+        self.assertEqual(per_class['V']['count'], 1)
+
+        counts = self.tb.count_stats(responses, beats_only=True)
+        self.assertEqual((overall['true_positive'], overall['false_positive'], overall['false_negative']), counts)
+        self.assertAlmostEqual(overall['ppv'], counts[0] / (counts[0] + counts[1]))
+
+
+class TestAnnotationCache(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "mitdb_100_annotations.txt")
+        shutil.copy(path_to_folder + "mitdb_100_annotations.txt", self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_cache_matches_parse(self):
+        parsed = parse_annotation_file(self.path)
+        first = load_annotations(self.path)
+        self.assertTrue(os.path.exists(os.path.join(self.folder, "mitdb_100_annotations.npy")))
+
+        second = load_annotations(self.path)
+        self.assertIsInstance(second, np.memmap)
+        np.testing.assert_array_equal(first, parsed)
+        np.testing.assert_array_equal(second, parsed)
+
+    def test_cache_invalidated(self):
+        load_annotations(self.path)
+
+        # drop the last line from the source file
+        with open(self.path) as file:
+            lines = file.readlines()
+        with open(self.path, 'w') as file:
+            file.writelines(lines[:-1])
+
+        self.assertEqual(len(load_annotations(self.path)), len(lines) - 1)
+
+    def test_rebuild_leaves_mapped_cache_intact(self):
+        first = load_annotations(self.path)
+        self.assertIsInstance(load_annotations(self.path), np.memmap)
+        mapped = load_annotations(self.path)
+
+        # same size, new contents and time: the first beat becomes a PVC
+        with open(self.path) as file:
+            text = file.read()
+        index = text.index("     N    ")
+        with open(self.path, 'w') as file:
+            file.write(text[:index] + "     V    " + text[index + 10:])
+        stats = os.stat(self.path)
+        os.utime(self.path, ns=(stats.st_atime_ns, stats.st_mtime_ns + 10 ** 9))
+
+        rebuilt = load_annotations(self.path)
+        self.assertEqual(np.count_nonzero(rebuilt['annotation'] != first['annotation']), 1)
+
+        # the cache was replaced rather than rewritten, so the old mapping still reads the old file
+        np.testing.assert_array_equal(mapped, first)
+        np.testing.assert_array_equal(load_annotations(self.path), rebuilt)
+
+    def test_failed_save_keeps_cache(self):
+        first = load_annotations(self.path)
+
+        # repeat the last line so the cache is out of date
+        with open(self.path) as file:
+            lines = file.readlines()
+        with open(self.path, 'a') as file:
+            file.write(lines[-1])
+
+        def partial_save(file, array):
+            file.write(b"partial")
+            raise OSError("disk full")
+
+        with mock.patch('ekg_testbench.np.save', partial_save):
+            records = load_annotations(self.path)
+
+        # the parsed records are still returned, and nothing half written is left behind
+        self.assertEqual(len(records), len(first) + 1)
+        self.assertEqual(sorted(os.listdir(self.folder)), ["mitdb_100_annotations.json", "mitdb_100_annotations.npy",
+                                                           "mitdb_100_annotations.txt"])
+        np.testing.assert_array_equal(np.load(os.path.join(self.folder, "mitdb_100_annotations.npy")), first)
+
+    def test_old_cache_rebuilt(self):
+        load_annotations(self.path)
+
+        # caches written before the time conversion was fixed have no version
+        info_path = os.path.join(self.folder, "mitdb_100_annotations.json")
+        with open(info_path) as file:
+            info = json.load(file)
+        del info['version']
+        with open(info_path, 'w') as file:
+            json.dump(info, file)
+
+        records = load_annotations(self.path)
+        self.assertNotIsInstance(records, np.memmap)
+        self.assertAlmostEqual(records['time'][-1], 1805.531)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import unittest
+import numpy as np
+import scipy.signal as sp
+from ekg_testbench import EKGTestBench
+from hrv_analysis import rr_intervals, time_domain, rolling_time_domain, frequency_domain, analyze_hrv, lomb_scargle
+
+# path to ekg folder
+path_to_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../data/ekg/")
+
+
+def modulated_beats(f_s, duration, frequency, amplitude=0.05, seed=0):
+    """
+    Beat indices whose RR intervals swing around 0.8 s at a single frequency, plus a little noise
+    """
+    rng = np.random.default_rng(seed)
+    beats = [0.0]
+    while beats[-1] < duration:
+        rr = 0.8 + amplitude * np.sin(2 * np.pi * frequency * beats[-1]) + 0.002 * rng.standard_normal()
+        beats.append(beats[-1] + rr)
+
+    return np.round(np.asarray(beats) * f_s).astype(int)
+
+
+class TestHRV(unittest.TestCase):
+    def setUp(self):
+        self.f_s = 360
+
+    def test_time_domain(self):
+        metrics = time_domain([0.8, 0.9, 0.8, 0.7])
+
+        self.assertAlmostEqual(metrics['mean_rr'], 0.8)
+        self.assertAlmostEqual(metrics['sdnn'], np.std([800, 900, 800, 700], ddof=1))
+        self.assertAlmostEqual(metrics['rmssd'], 100)
+        self.assertAlmostEqual(metrics['pnn50'], 100)
+        self.assertAlmostEqual(metrics['heart_rate'], 75)
+
+    def test_rolling_matches_direct(self):
+        times, rr = rr_intervals(modulated_beats(self.f_s, 600, 0.1), self.f_s)
+        rolling = rolling_time_domain(times, rr, window=60)
+
+        for i in [5, 100, 400, len(rr) - 1]:
+            in_window = (times > times[i] - 60) & (times <= times[i])
+            direct = time_domain(rr[in_window])
+
+            self.assertEqual(rolling['count'][i], np.sum(in_window))
+            self.assertAlmostEqual(rolling['mean_rr'][i], direct['mean_rr'])
+            self.assertAlmostEqual(rolling['sdnn'][i], direct['sdnn'], places=6)
+            self.assertAlmostEqual(rolling['rmssd'][i], direct['rmssd'], places=6)
+            self.assertAlmostEqual(rolling['pnn50'][i], direct['pnn50'])
+
+    def test_drops_missed_beats(self):
+        beats = np.asarray([0, 300, 600, 1600, 1900])
+        times, rr = rr_intervals(beats, self.f_s)
+
+        np.testing.assert_allclose(rr, [300 / 360, 300 / 360, 300 / 360])
+
+    def test_lomb_scargle_matches_scipy(self):
+        rng = np.random.default_rng(2)
+        times = np.cumsum(rng.uniform(0.6, 1.0, 500))
+        values = rng.standard_normal(500)
+        values -= np.mean(values)
+        frequencies = np.arange(0.001, 0.5, 0.001)
+
+        expected = sp.lombscargle(times, values, 2 * np.pi * frequencies)
+        np.testing.assert_allclose(lomb_scargle(times, values, frequencies), expected, rtol=1e-9, atol=1e-9)
+
+    def test_frequency_bands(self):
+        # a 0.1 Hz swing in heart rate belongs in the LF band
+        times, rr = rr_intervals(modulated_beats(self.f_s, 600, 0.1), self.f_s)
+        bands = frequency_domain(times, rr)
+
+        self.assertGreater(bands['lf_hf'], 10)
+
+        # a sinusoid of amplitude 50 ms has a variance of 1250 ms^2
+        self.assertAlmostEqual(bands['lf'] / 1250, 1, delta=0.2)
+
+        times, rr = rr_intervals(modulated_beats(self.f_s, 600, 0.25), self.f_s)
+        self.assertLess(frequency_domain(times, rr)['lf_hf'], 0.1)
+
+    def test_testbench_input(self):
+        tb = EKGTestBench(path_to_folder + "mitdb_100_annotations.txt")
+        report = analyze_hrv(tb, 360)
+
+        self.assertAlmostEqual(report['time_domain']['heart_rate'], 76, delta=3)
+        self.assertEqual(len(report['rolling']), len(rr_intervals(tb, 360)[1]))
+
+    def test_testbench_beats_only(self):
+        # mitdb_104 has many noise and rhythm markers between beats
+        tb = EKGTestBench(path_to_folder + "mitdb_104_annotations.txt")
+        annotations = tb.annotations
+
+        beats = annotations.sample[annotations.is_beat]
+        self.assertLess(len(beats), len(annotations))
+
+        # reference worked out directly from the beat annotations
+        rr = np.diff(beats) / 360
+        rr = rr[(rr >= 0.3) & (rr <= 2.0)]
+        sdnn = np.std(rr, ddof=1) * 1000
+        rmssd = np.sqrt(np.mean(np.square(np.diff(rr)))) * 1000
+
+        result = analyze_hrv(tb, 360)['time_domain']
+        self.assertAlmostEqual(result['sdnn'], sdnn, places=6)
+        self.assertAlmostEqual(result['rmssd'], rmssd, places=6)
+
+
+if __name__ == '__main__':
+    unittest.main()
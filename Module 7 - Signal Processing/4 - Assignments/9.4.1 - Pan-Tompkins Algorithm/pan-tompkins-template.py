@@ -1,47 +1,37 @@
 import numpy as np
 from ekg_testbench import EKGTestBench
+from ekg_loader import load_ekg_record
+from pan_tompkins_utils import preprocess, preprocess_leads, fuse_envelopes, detection_threshold
+from pan_tompkins_decision import detect_beats_adaptive
+from spectrum import plot_fft_response
 import scipy.signal as sp
-from scipy.fft import fft
 import matplotlib.pyplot as plt
 
 
-def plot_fft_response(signal, f_s):
-    N = len(signal) // 2
-    X = fft(signal)[:N]
-    sample_intervals = np.arange(N)
-    T = N / f_s
-    freq = sample_intervals / T / 2
-
-    plt.stem(freq, np.abs(X), 'b', markerfmt=" ", basefmt="-b")
-    plt.xlabel('Freq (Hz)')
-    plt.ylabel('FFT Amplitude |X(freq)|')
-    plt.title('One-Sided FFT of Signal')
-    plt.show()
-
-
-def detect_heartbeats(filepath):
+def detect_heartbeats(filepath, adaptive=False, multilead=False):
     """
     Perform analysis to detect location of heartbeats
     :param filepath: A valid path to a CSV file of heart beats
+    :param adaptive: Use the single-pass Pan-Tompkins SPKI/NPKI thresholds with search-back
+    instead of a fixed height from the whole signal
+    :param multilead: Process both leads together and fuse their envelopes before finding peaks
     :return: signal: a signal that will be plotted
     beats: the indices of detected heartbeats
     """
     if filepath == '':
         return list()
 
-    # import the CSV file using numpy
-    path = filepath
-
-    # load data in matrix from CSV file; skip first two rows
-    data = np.loadtxt(filepath, delimiter=',', skiprows=2)
+    # load data in matrix from CSV file; the CSV is converted to a binary file
+    # the first time and memory-mapped after that
+    data, metadata = load_ekg_record(filepath)
 
     # save each vector as own variable
     time = data[:,0]
-    v1 = data[:,1]
-    v2 = data[:, 2]
+    v1 = np.asarray(data[:,1], dtype=float)
+    v2 = np.asarray(data[:, 2], dtype=float)
 
-    # calculate sampling rate
-    f_s = np.average(np.diff(time)) ** -1
+    # sampling rate was calculated when the file was converted
+    f_s = metadata['f_s']
 
     # identify one column to process. Call that column signal
     signal = v1
@@ -51,39 +41,29 @@ def detect_heartbeats(filepath):
 
     low_fc = 5
     high_fc = 123
-
-    # pass data through LOW PASS FILTER (OPTIONAL)
     filter_order = 4
-    b, a = sp.butter(filter_order, high_fc, fs=f_s, btype='lowpass', output='ba')
-    signal = sp.filtfilt(b, a, signal)
-
-    # pass data through HIGH PASS FILTER (OPTIONAL) to create BAND PASS result
-    b, a = sp.butter(filter_order, low_fc, fs=f_s, btype='highpass', output='ba')
-    signal = sp.filtfilt(b, a, signal)
+    window = 20
 
-    # pass data through differentiator
-    signal = np.asarray(signal)
-    signal = np.diff(signal)
+    if multilead:
+        # run both columns through the filter chain as one array, then fuse the envelopes
+        envelopes = preprocess_leads(data[:, 1:3], f_s, low_fc, high_fc, filter_order, window)
+        signal = fuse_envelopes(envelopes)
+    else:
+        # band pass (low pass + high pass in one zero-phase pass), differentiate, square,
+        # and moving window
+        signal = preprocess(signal, f_s, low_fc, high_fc, filter_order, window)
 
-    # pass data through square function
-    signal = np.square(signal)
+    if adaptive:
+        # running signal/noise levels decide each peak as it is reached; no global max needed
+        beats = detect_beats_adaptive(signal, f_s)
 
-    # pass through moving average window
-    window = 20
-    signal = np.convolve(signal, ([1]*window))
+        # do not modify this line
+        return signal, beats
 
-    # find and remove outliers from the signal
-    avg = np.average(signal)
-    std = np.std(signal)
-    signal_copy = np.copy(signal)
+    # clip outliers at avg plus z stds, then calculate what height to create the threshold
     z = 1.4
-    for j, sig in enumerate(signal):
-        if sig >= avg + (z * std): # avg plus z stds
-            signal_copy[j] = avg + (z * std)
-
-    # calculate what height to create the threshold
     H = 0.35
-    height = max(signal_copy) * H
+    height = detection_threshold(signal, z, H)
 
     # use find_peaks to identify peaks within averaged/filtered data
     # save the peaks result and return as part of testbench result
@@ -189,6 +169,7 @@ def test_(database_name):
     return round(f1, 3)
 
 if __name__ == "__main__":
+    from benchmark_runner import run_benchmark, summarize, write_report
 
     #test_('nstdb_119e24')
     #test_('mitdb_232')
@@ -200,14 +181,15 @@ if __name__ == "__main__":
              'mitdb_217','mitdb_219','mitdb_220','mitdb_232','nstdb_118e24','nstdb_119e24', 'qtdb_sel232']
 
     # remove dupes cuz too lazy to do by hand
-    files = list(set(files))
+    files = sorted(set(files))
     #print(len(files))
 
-    tot_fp = 0
+    # run every record in its own process; None uses every core
+    results = run_benchmark(files, workers=None)
+
+    for r in results:
+        print(f"{r['database']}: {round(r['f1'], 3)} ({round(r['seconds'], 2)}s) {r['error']}")
 
-    for i in range(len(files)):
-        f1 = test_(files[i])
-        tot_fp += f1
-        print(f"{files[i]}: {f1}")
+    print(f"average F1: {summarize(results)['mean_f1']}")
 
-    print(f"average FP: {tot_fp / len(files)}")
\ No newline at end of file
+    write_report(results, "benchmark_results.csv", "benchmark_results.json")
@@ -0,0 +1,326 @@
+from collections import deque
+
+import numpy as np
+from scipy.ndimage import maximum_filter1d
+
+
+class AdaptiveThresholdDetector:
+    """
+    The decision stage from the original Pan-Tompkins paper, run online over the energy
+    envelope (the output of the moving window). Running estimates of the signal peak level
+    (SPKI) and noise peak level (NPKI) set two thresholds:
+
+        THRESHOLD1 = NPKI + 0.25 * (SPKI - NPKI)
+        THRESHOLD2 = 0.5 * THRESHOLD1
+
+    As in the paper, a peak is only the largest local maximum within the refractory period
+    either side of it, so ripple on a noisy envelope is not classified peak by peak. A peak
+    above THRESHOLD1 is a beat unless it falls in the refractory period after the previous
+    beat. If no beat is found for 166% of the average RR interval, the largest noise peak since
+    the last beat that is above THRESHOLD2 is taken as a beat (search-back).
+
+    The envelope is consumed in blocks of any size; each sample is looked at once and only the
+    peaks since the last beat are kept, so a whole record is processed in a single O(n) pass.
+    A peak is decided once the refractory period after it has arrived, so beats are confirmed
+    that much later than the envelope.
+    """
+
+    def __init__(self, f_s, refractory=0.2, learning_time=2.0, search_back=1.66, max_rr=2.0):
+        """
+        Create a new decision stage
+        :param f_s: Sampling rate of the envelope (Hertz)
+        :param refractory: Time after a beat where no other beat can occur (seconds)
+        :param learning_time: Time at the start of the record used to set the initial levels (seconds)
+        :param search_back: Multiple of the average RR interval after which search-back is used
+        :param max_rr: Longest average RR interval used to size the search-back window (seconds), so a
+        single long gap (e.g. a noisy lead-in) can't make the detector hold on to noise peaks forever
+        """
+        self.f_s = f_s
+        self.refractory = int(round(refractory * f_s))
+        self.learning_samples = max(int(round(learning_time * f_s)), 1)
+        self.search_back = search_back
+        self.max_rr = int(round(max_rr * f_s))
+
+        self.reset()
+
+    def reset(self):
+        """
+        Clear all carried state so a new record can be processed
+        :return: None
+        """
+        # number of envelope samples seen so far
+        self.count = 0
+
+        # envelope values needed to decide the next peaks: the refractory period before the
+        # first undecided sample onwards
+        self.tail = np.zeros(0)
+
+        # first sample not yet decided as a peak or not; the very first sample never is one
+        self.decided = 1
+
+        # learning phase: max and sum of the envelope, plus peaks found before the levels are set
+        self.learning_max = 0.0
+        self.learning_sum = 0.0
+        self.learning_count = 0
+        self.learning_peaks = list()
+
+        # running signal and noise peak levels and thresholds
+        self.spki = None
+        self.npki = None
+        self.threshold1 = None
+        self.threshold2 = None
+
+        # last eight RR intervals, and last eight that were within the regular limits
+        self.rr_recent = deque(maxlen=8)
+        self.rr_regular = deque(maxlen=8)
+
+        # index of the last beat and the noise peaks seen since then (for search-back); only
+        # peaks inside the search-back window are kept
+        self.last_beat = None
+        self.noise_peaks = deque()
+
+        # beats confirmed during the current call to process()
+        self.beats = list()
+
+        return
+
+    def process(self, envelope):
+        """
+        Run the next block of the envelope through the decision stage
+        :param envelope: Envelope values that directly follow the previous block
+        :return: An array of beat indices confirmed by this block
+        """
+        envelope = np.asarray(envelope, dtype=float)
+        self.beats = list()
+
+        if envelope.size == 0:
+            return np.zeros(0, dtype=int)
+
+        start = self.count
+        self.count += envelope.size
+
+        # peaks need the refractory period on each side, so prepend the end of the previous block
+        history = np.concatenate((self.tail, envelope))
+        peaks = self._find_peaks(history, start - self.tail.size, self.count - 1 - self._peak_radius())
+
+        if self.spki is None:
+            # still learning; keep track of the levels and hold on to the peaks
+            learning = envelope[:max(self.learning_samples - self.learning_count, 0)]
+            if learning.size > 0:
+                self.learning_max = max(self.learning_max, float(np.max(learning)))
+                self.learning_sum += float(np.sum(learning))
+                self.learning_count += learning.size
+
+            self.learning_peaks.extend(peaks)
+
+            # every peak in the learning time must be decided before the levels are set
+            if self.decided < self.learning_samples:
+                return np.zeros(0, dtype=int)
+
+            self._initialize()
+            peaks = self.learning_peaks
+            self.learning_peaks = list()
+
+        for index, value in peaks:
+            self._peak(index, value)
+
+        # a beat may be overdue even if no new peaks arrived; only look as far as peaks are decided
+        self._search_back(self.decided - 1)
+
+        return np.asarray(self.beats, dtype=int)
+
+    def flush(self):
+        """
+        Signal the end of the record, deciding the peaks in its last refractory period
+        :return: An array of any beats that were still waiting on later samples or the learning phase
+        """
+        self.beats = list()
+
+        peaks = self._find_peaks(self.tail, self.count - self.tail.size, self.count - 2)
+
+        if self.spki is None:
+            if self.learning_count == 0:
+                return np.zeros(0, dtype=int)
+
+            self._initialize()
+            peaks = self.learning_peaks + peaks
+            self.learning_peaks = list()
+
+        for index, value in peaks:
+            self._peak(index, value)
+        self._search_back(self.count - 1)
+
+        return np.asarray(self.beats, dtype=int)
+
+    def _peak_radius(self):
+        """
+        Samples either side of a peak that must be lower than it
+        """
+        return max(self.refractory, 1)
+
+    def _find_peaks(self, history, history_start, last):
+        """
+        Find the peaks from the first undecided sample up to last: local maxima that are the
+        largest value within the refractory period either side. Samples past the end of history
+        count as lower, so last must leave a full refractory period after it except at the end
+        of the record.
+        :param history: Envelope values, starting at least a refractory period before the first undecided sample
+        :param history_start: Index of history[0] within the record
+        :param last: Index of the last sample to decide
+        :return: List of (index, value) of each peak
+        """
+        radius = self._peak_radius()
+        first = self.decided
+
+        peaks = list()
+        if last >= first:
+            # largest value within the radius of each sample; outside the record counts as lower
+            nearby = maximum_filter1d(history, 2 * radius + 1, mode='constant', cval=-np.inf)
+
+            positions = np.arange(first, last + 1) - history_start
+            values = history[positions]
+            is_peak = (values > history[positions - 1]) & (values >= history[positions + 1]) & \
+                      (values >= nearby[positions])
+
+            positions = positions[is_peak]
+            peaks = list(zip((history_start + positions).tolist(), history[positions].tolist()))
+
+            self.decided = last + 1
+
+        # keep what is needed to decide the next sample
+        self.tail = history[max(self.decided - radius - 1 - history_start, 0):]
+
+        return peaks
+
+    def _initialize(self):
+        """
+        Set the starting signal and noise levels from the learning phase. The largest peak is
+        taken as a beat and the typical (median) peak as noise; on a noisy record these are much
+        closer to the real levels than fractions of the envelope's max and mean, which start the
+        thresholds low enough to let noise through and shorten the RR average.
+        """
+        values = [value for index, value in self.learning_peaks if index < self.learning_samples]
+
+        if len(values) > 0:
+            self.spki = max(values)
+            self.npki = float(np.median(values))
+        else:
+            self.spki = self.learning_max / 3
+            self.npki = self.learning_sum / self.learning_count / 2
+        self._update_thresholds()
+
+    def _update_thresholds(self):
+        self.threshold1 = self.npki + 0.25 * (self.spki - self.npki)
+        self.threshold2 = 0.5 * self.threshold1
+
+    def _rr_average(self):
+        """
+        Average of the regular RR intervals, or of all recent RR intervals if none are regular yet
+        """
+        if len(self.rr_regular) > 0:
+            return sum(self.rr_regular) / len(self.rr_regular)
+        if len(self.rr_recent) > 0:
+            return sum(self.rr_recent) / len(self.rr_recent)
+
+        return None
+
+    def _peak(self, index, value):
+        """
+        Classify one peak of the envelope as a beat or noise
+        """
+        # check whether a beat was missed before this peak
+        self._search_back(index)
+
+        # nothing can be a beat this soon after the last one
+        if self.last_beat is not None and index - self.last_beat < self.refractory:
+            return
+
+        if value > self.threshold1:
+            self._beat(index, value, 0.125)
+        else:
+            self.npki = 0.125 * value + 0.875 * self.npki
+            self._update_thresholds()
+            self._add_noise_peak(index, value)
+
+    def _search_window(self):
+        """
+        How far back search-back looks, or None before there is an RR average
+        """
+        average = self._rr_average()
+        if average is None:
+            return None
+
+        return self.search_back * min(average, self.max_rr)
+
+    def _add_noise_peak(self, index, value):
+        """
+        Keep a noise peak for search-back, dropping any that are now too old to be used
+        """
+        # the beat that first gives an RR average drops every earlier noise peak, so peaks seen
+        # before then could never be used
+        window = self._search_window()
+        if window is None:
+            return
+
+        self.noise_peaks.append((index, value))
+
+        # search-back has already run up to this index, so older peaks can't be picked any more
+        while index - self.noise_peaks[0][0] > window:
+            self.noise_peaks.popleft()
+
+    def _beat(self, index, value, weight):
+        """
+        Record a beat and update the signal level and RR averages
+        """
+        self.spki = weight * value + (1 - weight) * self.spki
+        self._update_thresholds()
+
+        if self.last_beat is not None:
+            rr = index - self.last_beat
+            average = self._rr_average()
+
+            # regular intervals are within 92% to 116% of the regular average
+            if average is None or 0.92 * average < rr < 1.16 * average:
+                self.rr_regular.append(rr)
+            self.rr_recent.append(rr)
+
+        self.last_beat = index
+        self.beats.append(index)
+
+        # only noise peaks after this beat are still eligible for search-back
+        self.noise_peaks = deque(p for p in self.noise_peaks if p[0] > index)
+
+    def _search_back(self, now):
+        """
+        If no beat has been found for too long, take the largest noise peak above THRESHOLD2
+        """
+        if self.last_beat is None or self._rr_average() is None:
+            return
+
+        while now - self.last_beat > self._search_window():
+            eligible = [p for p in self.noise_peaks
+                        if p[0] - self.last_beat >= self.refractory and p[1] > self.threshold2]
+
+            if len(eligible) == 0:
+                # nothing to recover; forget peaks that are too old to be searched again
+                self.noise_peaks = deque(p for p in self.noise_peaks if now - p[0] <= self._search_window())
+                return
+
+            index, value = max(eligible, key=lambda p: p[1])
+            self._beat(index, value, 0.25)
+
+
+def detect_beats_adaptive(envelope, f_s, **params):
+    """
+    Run the adaptive Pan-Tompkins decision stage over a whole envelope
+    :param envelope: Output of the moving window, e.g. from pan_tompkins_utils.preprocess()
+    :param f_s: Sampling rate (Hertz)
+    :param params: Any keyword arguments accepted by AdaptiveThresholdDetector
+    :return: An array of beat indices
+    """
+    detector = AdaptiveThresholdDetector(f_s, **params)
+
+    beats = detector.process(envelope)
+    remaining = detector.flush()
+
+    return np.concatenate((beats, remaining))
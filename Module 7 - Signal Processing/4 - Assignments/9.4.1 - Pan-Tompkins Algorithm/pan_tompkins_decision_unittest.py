@@ -0,0 +1,104 @@
+import unittest
+import numpy as np
+import scipy.signal as sp
+from pan_tompkins_utils import preprocess
+from pan_tompkins_decision import AdaptiveThresholdDetector, detect_beats_adaptive
+from streaming_pan_tompkins import StreamingPanTompkins
+from streaming_pan_tompkins_unittest import synthetic_ekg
+from ekg_testbench import count_matches
+
+
+class TestAdaptiveThresholdDetector(unittest.TestCase):
+    def setUp(self):
+        self.f_s = 360
+        self.signal, self.beats = synthetic_ekg(self.f_s)
+        self.envelope = preprocess(self.signal, self.f_s)
+
+    def test_finds_every_beat(self):
+        detected = detect_beats_adaptive(self.envelope, self.f_s)
+
+        self.assertEqual(count_matches(self.beats, detected, 90), (len(self.beats), 0, 0))
+
+    def test_block_size_does_not_change_beats(self):
+        batch = detect_beats_adaptive(self.envelope, self.f_s)
+
+        for block_size in [1, 13, 500, 5000]:
+            detector = AdaptiveThresholdDetector(self.f_s)
+            streamed = list()
+            for start in range(0, len(self.envelope), block_size):
+                streamed.extend(detector.process(self.envelope[start:start + block_size]))
+            streamed.extend(detector.flush())
+
+            np.testing.assert_array_equal(np.asarray(streamed), batch, "Block size " + str(block_size))
+
+    def test_search_back(self):
+        # shrink one beat so it falls between the two thresholds
+        signal = np.copy(self.signal)
+        k = self.beats[30]
+        window = np.arange(k - 20, k + 20)
+        signal[window] -= 0.6 * np.exp(-0.5 * ((window - k) / (0.008 * self.f_s)) ** 2)
+        envelope = preprocess(signal, self.f_s)
+
+        without = detect_beats_adaptive(envelope, self.f_s, search_back=100)
+        self.assertEqual(count_matches(self.beats, without, 90), (len(self.beats) - 1, 0, 1))
+
+        recovered = detect_beats_adaptive(envelope, self.f_s)
+        self.assertEqual(count_matches(self.beats, recovered, 90), (len(self.beats), 0, 0))
+
+    def test_noisy_record(self):
+        signal, beats = synthetic_ekg(self.f_s, duration=120)
+        noisy = signal + 0.05 * np.random.default_rng(1).standard_normal(len(signal))
+        envelope = preprocess(noisy, self.f_s)
+
+        # ripple between beats must not be taken for beats, or pull the thresholds down
+        detected = detect_beats_adaptive(envelope, self.f_s)
+        matched, false_positive, false_negative = count_matches(beats, detected, 90)
+        self.assertEqual(matched, len(beats))
+        self.assertLessEqual(false_positive, 2)
+
+        # a single global threshold, as in the template, does worse
+        clipped_max = min(np.max(envelope), np.average(envelope) + 1.4 * np.std(envelope))
+        reference, _ = sp.find_peaks(envelope, height=0.35 * clipped_max, distance=150)
+        self.assertLess(false_positive, count_matches(beats, reference, 90)[1])
+
+        # the same through the streaming front end
+        streamed = StreamingPanTompkins(self.f_s, adaptive=True)
+        detected = np.concatenate((streamed.process(noisy), streamed.flush()))
+        self.assertLessEqual(count_matches(beats, detected, 90)[1], 2)
+
+    def test_noise_peaks_bounded(self):
+        rng = np.random.default_rng(4)
+        lead_in = 600 * self.f_s
+
+        # ten minutes of low level noise, full of local maxima, before the record starts
+        noise = 0.05 * np.max(self.envelope) * rng.random(lead_in)
+        noise[self.f_s] = np.max(self.envelope)
+        envelope = np.concatenate((noise, self.envelope, noise))
+
+        detector = AdaptiveThresholdDetector(self.f_s)
+        longest = 0
+        detected = list()
+        for start in range(0, len(envelope), 1000):
+            detected.extend(detector.process(envelope[start:start + 1000]))
+            longest = max(longest, len(detector.noise_peaks))
+        detected.extend(detector.flush())
+
+        # never more than the peaks in one search-back window, even though the lead-in makes
+        # the first RR interval ten minutes long
+        self.assertLess(longest, 2 * self.f_s)
+
+        matched, false_positive, false_negative = count_matches(self.beats + lead_in, np.asarray(detected), 90)
+        self.assertEqual(matched, len(self.beats))
+
+    def test_streaming_front_end(self):
+        detector = StreamingPanTompkins(self.f_s, adaptive=True)
+        detected = list()
+        for start in range(0, len(self.signal), 1000):
+            detected.extend(detector.process(self.signal[start:start + 1000]))
+        detected.extend(detector.flush())
+
+        self.assertEqual(count_matches(self.beats, np.asarray(detected), 90), (len(self.beats), 0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
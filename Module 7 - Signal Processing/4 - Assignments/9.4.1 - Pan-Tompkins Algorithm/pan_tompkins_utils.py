@@ -0,0 +1,129 @@
+import os
+import sys
+
+import numpy as np
+import scipy.signal as sp
+
+# filter design and FIR filtering are shared with the lecture examples
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../shared"))
+from filter_bank import design_cascade, design_cascade_zi
+from fir_engine import fir_filter
+
+
+def bandpass_sos(f_s, low_fc=5, high_fc=123, filter_order=4):
+    """
+    Design the Pan-Tompkins band pass as a low pass followed by a high pass, stacked into a
+    single set of second-order sections
+    :param f_s: Sampling rate (Hertz)
+    :param low_fc: Cutoff of the high pass filter (Hertz)
+    :param high_fc: Cutoff of the low pass filter (Hertz)
+    :param filter_order: Order of each butterworth filter
+    :return: Second-order sections of the combined filter.
+    """
+    return design_cascade((filter_order, high_fc, f_s, 'lowpass'), (filter_order, low_fc, f_s, 'highpass'))
+
+
+def bandpass_zi(f_s, low_fc=5, high_fc=123, filter_order=4):
+    """
+    Steady-state initial conditions of bandpass_sos() for sosfilt. Multiply by the first sample
+    of a record to start filtering without a step transient.
+    :param f_s: Sampling rate (Hertz)
+    :param low_fc: Cutoff of the high pass filter (Hertz)
+    :param high_fc: Cutoff of the low pass filter (Hertz)
+    :param filter_order: Order of each butterworth filter
+    :return: Array of initial conditions with shape (n_sections, 2)
+    """
+    return design_cascade_zi((filter_order, high_fc, f_s, 'lowpass'), (filter_order, low_fc, f_s, 'highpass'))
+
+
+def preprocess(signal, f_s, low_fc=5, high_fc=123, filter_order=4, window=20):
+    """
+    Run the Pan-Tompkins front end: zero-phase band pass, differentiate, square, and
+    moving window
+    :param signal: An array of raw EKG samples
+    :param f_s: Sampling rate (Hertz)
+    :param low_fc: Cutoff of the high pass filter (Hertz)
+    :param high_fc: Cutoff of the low pass filter (Hertz)
+    :param filter_order: Order of each butterworth filter
+    :param window: Length of the moving window (samples)
+    :return: The energy envelope of the signal
+    """
+    # one forward-backward pass through both filters
+    sos = bandpass_sos(f_s, low_fc, high_fc, filter_order)
+    filtered = sp.sosfiltfilt(sos, signal)
+
+    # differentiate and square
+    squared = np.square(np.diff(filtered))
+
+    # moving window; a short window is a direct convolution, a long one uses FFTs
+    envelope = fir_filter(np.ones(window), squared)
+
+    return envelope
+
+
+def preprocess_leads(leads, f_s, low_fc=5, high_fc=123, filter_order=4, window=20):
+    """
+    Run the Pan-Tompkins front end on several leads at once. Every stage works on the
+    whole (samples, leads) array, so both leads go through one sosfiltfilt call.
+    :param leads: A (samples, leads) array of raw EKG samples
+    :param f_s: Sampling rate (Hertz)
+    :param low_fc: Cutoff of the high pass filter (Hertz)
+    :param high_fc: Cutoff of the low pass filter (Hertz)
+    :param filter_order: Order of each butterworth filter
+    :param window: Length of the moving window (samples)
+    :return: A (samples + window - 2, leads) array holding the energy envelope of each lead
+    """
+    sos = bandpass_sos(f_s, low_fc, high_fc, filter_order)
+    filtered = sp.sosfiltfilt(sos, np.asarray(leads, dtype=float), axis=0)
+
+    # differentiate and square each lead
+    squared = np.square(np.diff(filtered, axis=0))
+
+    # moving window down each column as a difference of running sums; same length as
+    # np.convolve(..., mode='full'). Clamp the tiny negatives left by rounding.
+    padding = np.zeros((window - 1, squared.shape[1]))
+    sums = np.cumsum(np.concatenate((np.zeros((1, squared.shape[1])), padding, squared, padding)), axis=0)
+    envelopes = np.maximum(sums[window:] - sums[:-window], 0)
+
+    return envelopes
+
+
+def fuse_envelopes(envelopes, z=1.4):
+    """
+    Combine the envelopes of several leads into one. Each lead is first scaled by its own
+    clipped maximum (the same value detection_threshold() uses), so a lead with a lot of
+    noise energy does not drown out a clean one.
+    :param envelopes: A (samples, leads) array from preprocess_leads()
+    :param z: Number of standard deviations above the mean to clip at
+    :return: The fused envelope
+    """
+    limit = np.average(envelopes, axis=0) + z * np.std(envelopes, axis=0)
+    scale = np.minimum(np.max(envelopes, axis=0), limit)
+
+    # a flat lead has nothing to contribute
+    scale[scale <= 0] = np.inf
+
+    return np.mean(envelopes / scale, axis=1)
+
+
+def clip_outliers(signal, z=1.4):
+    """
+    Limit values more than z standard deviations above the mean
+    :param signal: An array of values
+    :param z: Number of standard deviations above the mean to clip at
+    :return: A clipped copy of the signal
+    """
+    limit = np.average(signal) + z * np.std(signal)
+
+    return np.minimum(signal, limit)
+
+
+def detection_threshold(envelope, z=1.4, H=0.35):
+    """
+    Detection height used by detect_heartbeats(): a fraction of the largest value once outliers are clipped
+    :param envelope: Output of preprocess()
+    :param z: Number of standard deviations above the mean to clip at
+    :param H: Fraction of the clipped maximum
+    :return: The detection height
+    """
+    return np.max(clip_outliers(envelope, z)) * H
@@ -0,0 +1,59 @@
+import unittest
+import numpy as np
+import scipy.signal as sp
+from pan_tompkins_utils import preprocess, preprocess_leads, fuse_envelopes, clip_outliers, detection_threshold
+from benchmark_preprocessing import legacy_preprocess
+from streaming_pan_tompkins_unittest import synthetic_ekg
+
+
+class TestPreprocess(unittest.TestCase):
+    def setUp(self):
+        self.f_s = 360
+        self.signal, self.beats = synthetic_ekg(self.f_s, duration=30)
+
+    def test_matches_legacy_envelope(self):
+        legacy, legacy_height = legacy_preprocess(self.signal, self.f_s)
+        envelope = preprocess(self.signal, self.f_s)
+
+        self.assertEqual(len(envelope), len(legacy))
+
+        # only the padding at each end of the record is handled differently
+        edge = self.f_s
+        scale = np.max(legacy)
+        np.testing.assert_allclose(envelope[edge:-edge] / scale, legacy[edge:-edge] / scale, atol=1e-9)
+
+        self.assertAlmostEqual(detection_threshold(envelope) / legacy_height, 1, places=6)
+
+    def test_same_beats_as_legacy(self):
+        legacy, legacy_height = legacy_preprocess(self.signal, self.f_s)
+        legacy_beats, _ = sp.find_peaks(legacy, height=legacy_height, distance=150)
+
+        envelope = preprocess(self.signal, self.f_s)
+        beats, _ = sp.find_peaks(envelope, height=detection_threshold(envelope), distance=150)
+
+        np.testing.assert_array_equal(beats, legacy_beats)
+
+    def test_leads_match_single_lead(self):
+        second = 0.5 * self.signal + 0.01 * np.random.default_rng(4).standard_normal(len(self.signal))
+        envelopes = preprocess_leads(np.column_stack((self.signal, second)), self.f_s)
+
+        for column, lead in enumerate([self.signal, second]):
+            single = preprocess(lead, self.f_s)
+            self.assertEqual(envelopes.shape[0], len(single))
+            np.testing.assert_allclose(envelopes[:, column] / np.max(single), single / np.max(single), atol=1e-9)
+
+    def test_fuse_identical_leads(self):
+        envelope = preprocess(self.signal, self.f_s)
+        fused = fuse_envelopes(np.column_stack((envelope, 3 * envelope)))
+
+        np.testing.assert_allclose(fused, envelope / np.max(clip_outliers(envelope)))
+
+    def test_clip_outliers(self):
+        values = np.asarray([0.0, 1, 2, 3, 100])
+        limit = np.average(values) + 1.4 * np.std(values)
+
+        np.testing.assert_array_equal(clip_outliers(values), [0, 1, 2, 3, limit])
+
+
+if __name__ == '__main__':
+    unittest.main()
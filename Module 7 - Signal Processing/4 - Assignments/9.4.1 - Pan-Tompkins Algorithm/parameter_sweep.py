@@ -0,0 +1,227 @@
+import csv
+import itertools
+
+import numpy as np
+import scipy.signal as sp
+
+from benchmark_runner import find_record, default_path_to_folder
+from ekg_loader import load_ekg_record
+from ekg_testbench import EKGTestBench, count_matches
+from pan_tompkins_utils import bandpass_sos
+
+# parameters that can be swept, in the order the processing stages use them
+sweep_parameters = ['low_fc', 'high_fc', 'filter_order', 'window', 'z', 'H', 'distance']
+
+# values used by detect_heartbeats()
+default_grid = {'low_fc': [5], 'high_fc': [123], 'filter_order': [4], 'window': [20], 'z': [1.4], 'H': [0.35],
+                'distance': [150]}
+
+
+def select_by_distance(peaks, heights, distance):
+    """
+    Keep the highest peaks so that no two are closer than distance. Gives the same result
+    as the distance argument of find_peaks.
+    :param peaks: Sorted array of peak indices
+    :param heights: Height of each peak
+    :param distance: Minimum distance between kept peaks (samples)
+    :return: Boolean array marking the peaks to keep
+    """
+    distance = np.ceil(distance)
+    n = len(peaks)
+    keep = np.ones(n, dtype=bool)
+
+    # visit peaks from highest to lowest, removing smaller neighbours that are too close
+    for j in np.argsort(heights)[::-1].tolist():
+        if not keep[j]:
+            continue
+
+        k = j - 1
+        while k >= 0 and peaks[j] - peaks[k] < distance:
+            keep[k] = False
+            k -= 1
+
+        k = j + 1
+        while k < n and peaks[k] - peaks[j] < distance:
+            keep[k] = False
+            k += 1
+
+    return keep
+
+
+class RecordStages:
+    """
+    One record with the output of each processing stage cached by the parameters that stage
+    depends on. Changing H or distance reuses the envelope; changing the window reuses the
+    filtered signal; only a new filter setting re-filters the signal.
+    """
+
+    def __init__(self, database_name, path_to_folder=default_path_to_folder, tolerance=None):
+        """
+        Load a record and its annotations
+        :param database_name: Name of the record, e.g. mitdb_100
+        :param path_to_folder: Path to the ekg folder
+        :param tolerance: Acceptable distance between a beat and an annotation (milliseconds);
+        None uses the testbench default of 90 samples
+        """
+        base_path = find_record(database_name, path_to_folder)
+
+        data, metadata = load_ekg_record(base_path + ".csv")
+
+        self.name = database_name
+        self.signal = np.asarray(data[:, 1], dtype=float)
+        self.f_s = metadata['f_s']
+
+        testbench = EKGTestBench(base_path + "_annotations.txt", f_s=self.f_s, tolerance=tolerance)
+        self.annotations = np.asarray(testbench.annotation_indices)
+        self.delta = testbench.tolerance_samples()
+
+        self._filtered = dict()
+        self._envelopes = dict()
+        self._clipped_max = dict()
+        self._local_maxima = dict()
+
+    def filtered(self, low_fc, high_fc, filter_order):
+        key = (low_fc, high_fc, filter_order)
+        if key not in self._filtered:
+            sos = bandpass_sos(self.f_s, low_fc, high_fc, filter_order)
+            self._filtered[key] = sp.sosfiltfilt(sos, self.signal)
+
+        return self._filtered[key]
+
+    def envelope(self, low_fc, high_fc, filter_order, window):
+        key = (low_fc, high_fc, filter_order, window)
+        if key not in self._envelopes:
+            squared = np.square(np.diff(self.filtered(low_fc, high_fc, filter_order)))
+            self._envelopes[key] = np.convolve(squared, np.ones(window))
+
+        return self._envelopes[key]
+
+    def clipped_max(self, low_fc, high_fc, filter_order, window, z):
+        key = (low_fc, high_fc, filter_order, window, z)
+        if key not in self._clipped_max:
+            envelope = self.envelope(low_fc, high_fc, filter_order, window)
+            limit = np.average(envelope) + z * np.std(envelope)
+            self._clipped_max[key] = min(np.max(envelope), limit)
+
+        return self._clipped_max[key]
+
+    def local_maxima(self, low_fc, high_fc, filter_order, window):
+        key = (low_fc, high_fc, filter_order, window)
+        if key not in self._local_maxima:
+            envelope = self.envelope(low_fc, high_fc, filter_order, window)
+            peaks, _ = sp.find_peaks(envelope)
+            self._local_maxima[key] = (peaks, envelope[peaks])
+
+        return self._local_maxima[key]
+
+    def beats(self, low_fc, high_fc, filter_order, window, z, H, distance):
+        """
+        Same beats as find_peaks(envelope, height=H * clipped max, distance=distance)
+        """
+        height = self.clipped_max(low_fc, high_fc, filter_order, window, z) * H
+        peaks, heights = self.local_maxima(low_fc, high_fc, filter_order, window)
+
+        above = heights >= height
+        peaks = peaks[above]
+        heights = heights[above]
+
+        return peaks[select_by_distance(peaks, heights, distance)]
+
+    def f1(self, *params):
+        """
+        F1 score of the beats found with one set of parameters, in sweep_parameters order; NaN if
+        the record has no annotations and no beats were found
+        """
+        true_positive, false_positive, false_negative = count_matches(self.annotations, self.beats(*params),
+                                                                      self.delta)
+
+        scored = true_positive + 0.5 * (false_positive + false_negative)
+
+        return true_positive / scored if scored > 0 else float('nan')
+
+    def clear(self):
+        """
+        Forget every cached stage
+        """
+        self._filtered.clear()
+        self._envelopes.clear()
+        self._clipped_max.clear()
+        self._local_maxima.clear()
+
+
+def run_sweep(database_names, grid, path_to_folder=default_path_to_folder, tolerance=None):
+    """
+    Score every combination of parameters on every record. Each record is loaded once, and
+    the stages for that record are shared between all grid points before moving on.
+    :param database_names: List of record names, e.g. ['mitdb_100', 'mitdb_102']
+    :param grid: Dictionary of parameter name to a list of values. Missing parameters use default_grid.
+    :param path_to_folder: Path to the ekg folder
+    :param tolerance: Acceptable distance between a beat and an annotation (milliseconds), converted
+    with each record's sampling rate; None uses the testbench default of 90 samples
+    :return: List of result dictionaries (parameters, mean_f1, and per-record f1) ranked by mean F1
+    """
+    values = [grid.get(name, default_grid[name]) for name in sweep_parameters]
+    combinations = list(itertools.product(*values))
+
+    # f1 of every combination on every record
+    scores = np.zeros((len(combinations), len(database_names)))
+
+    for r, database_name in enumerate(database_names):
+        record = RecordStages(database_name, path_to_folder, tolerance)
+
+        # product() varies the last parameter fastest, so cached stages are reused immediately
+        for c, params in enumerate(combinations):
+            scores[c, r] = record.f1(*params)
+
+        record.clear()
+
+    results = list()
+    for c, params in enumerate(combinations):
+        # records with nothing to score are left out of the mean
+        scored = scores[c][~np.isnan(scores[c])]
+
+        result = dict(zip(sweep_parameters, params))
+        result['mean_f1'] = float(np.mean(scored)) if scored.size > 0 else float('nan')
+        for r, database_name in enumerate(database_names):
+            result[database_name] = float(scores[c, r])
+        results.append(result)
+
+    # NaN does not compare, so rank combinations without a mean F1 last
+    results.sort(key=lambda result: -np.inf if np.isnan(result['mean_f1']) else result['mean_f1'], reverse=True)
+
+    return results
+
+
+def write_sweep(results, csv_path):
+    """
+    Write ranked sweep results to a CSV file
+    :param results: List of result dictionaries from run_sweep()
+    :param csv_path: Path of the CSV file to write
+    :return: True once the file is written
+    """
+    if len(results) == 0:
+        return False
+
+    with open(csv_path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=list(results[0].keys()))
+        writer.writeheader()
+        writer.writerows(results)
+
+    return True
+
+
+if __name__ == "__main__":
+
+    files = ['mitdb_100', 'mitdb_102', 'mitdb_103', 'mitdb_104', 'mitdb_107', 'mitdb_201', 'mitdb_213',
+             'nstdb_118e00', 'nstdb_118e06', 'qtdb_sel104']
+
+    grid = {'low_fc': [5, 8], 'high_fc': [15, 30, 123], 'window': [10, 20, 30], 'z': [1.0, 1.4, 2.0],
+            'H': [0.25, 0.35, 0.45], 'distance': [100, 150, 200]}
+
+    results = run_sweep(files, grid)
+
+    print("Rank|\tMean F1|\tParameters")
+    for rank, result in enumerate(results[:10]):
+        print(rank + 1, "|\t", round(result['mean_f1'], 4), "|\t", {p: result[p] for p in sweep_parameters})
+
+    write_sweep(results, "sweep_results.csv")
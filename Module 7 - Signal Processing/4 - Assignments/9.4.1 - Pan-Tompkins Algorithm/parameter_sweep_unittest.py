@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import scipy.signal as sp
+from pan_tompkins_utils import bandpass_sos
+from parameter_sweep import select_by_distance, RecordStages, run_sweep, default_grid, sweep_parameters
+from streaming_pan_tompkins_unittest import synthetic_ekg
+
+
+class TestSelectByDistance(unittest.TestCase):
+    def test_matches_find_peaks(self):
+        rng = np.random.default_rng(2)
+
+        for distance in [1, 5, 37.5, 150]:
+            signal = np.convolve(rng.standard_normal(5000), np.ones(5))
+            height = 0.5
+
+            expected, _ = sp.find_peaks(signal, height=height, distance=distance)
+
+            peaks, _ = sp.find_peaks(signal)
+            peaks = peaks[signal[peaks] >= height]
+            selected = peaks[select_by_distance(peaks, signal[peaks], distance)]
+
+            np.testing.assert_array_equal(selected, expected)
+
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        from processed_records_unittest import write_record, write_annotations
+
+        self.folder = tempfile.mkdtemp()
+        self.f_s = 360
+
+        for name, seed in [('mitdb_900', 0), ('mitdb_901', 1)]:
+            signal, beats = synthetic_ekg(self.f_s, duration=30, seed=seed)
+            write_record(os.path.join(self.folder, name + ".csv"), signal, self.f_s)
+            write_annotations(os.path.join(self.folder, name + "_annotations.txt"), beats, self.f_s)
+
+        self.defaults = [default_grid[name][0] for name in sweep_parameters]
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_beats_match_find_peaks(self):
+        record = RecordStages('mitdb_900', self.folder)
+        low_fc, high_fc, filter_order, window, z, H, distance = self.defaults
+
+        filtered = sp.sosfiltfilt(bandpass_sos(self.f_s, low_fc, high_fc, filter_order), record.signal)
+        envelope = np.convolve(np.square(np.diff(filtered)), np.ones(window))
+        height = H * min(np.max(envelope), np.average(envelope) + z * np.std(envelope))
+        expected, _ = sp.find_peaks(envelope, height=height, distance=distance)
+
+        np.testing.assert_array_equal(record.beats(*self.defaults), expected)
+
+    def test_stages_cached(self):
+        record = RecordStages('mitdb_900', self.folder)
+        low_fc, high_fc, filter_order, window, z, H, distance = self.defaults
+
+        for H in [0.25, 0.35, 0.45]:
+            record.beats(low_fc, high_fc, filter_order, window, z, H, distance)
+        self.assertEqual((len(record._filtered), len(record._envelopes)), (1, 1))
+
+        # a new window re-uses the filtered signal
+        record.beats(low_fc, high_fc, filter_order, 30, z, H, distance)
+        self.assertEqual((len(record._filtered), len(record._envelopes)), (1, 2))
+        self.assertIs(record.filtered(low_fc, high_fc, filter_order), record.filtered(low_fc, high_fc, filter_order))
+
+        record.clear()
+        self.assertEqual((len(record._filtered), len(record._envelopes), len(record._local_maxima)), (0, 0, 0))
+
+    def test_run_sweep(self):
+        results = run_sweep(['mitdb_900', 'mitdb_901'], {'H': [0.35, 0.99]}, self.folder)
+
+        self.assertEqual([result['H'] for result in results], [0.35, 0.99])
+        self.assertGreater(results[0]['mean_f1'], 0.95)
+        self.assertAlmostEqual(results[0]['mean_f1'], (results[0]['mitdb_900'] + results[0]['mitdb_901']) / 2)
+
+        # the envelope peak trails the R peak, so a 5 ms tolerance misses most beats
+        self.assertEqual(RecordStages('mitdb_900', self.folder).delta, 90)
+        self.assertAlmostEqual(RecordStages('mitdb_900', self.folder, tolerance=5).delta, 1.8)
+        strict = run_sweep(['mitdb_900', 'mitdb_901'], {}, self.folder, tolerance=5)
+        self.assertLess(strict[0]['mean_f1'], 0.5)
+
+    def test_nothing_to_score(self):
+        from processed_records_unittest import write_record, write_annotations
+
+        # a flat record with no annotations: no beats are found and there is nothing to match
+        write_record(os.path.join(self.folder, "mitdb_902.csv"), np.zeros(30 * self.f_s), self.f_s)
+        write_annotations(os.path.join(self.folder, "mitdb_902_annotations.txt"), [], self.f_s)
+
+        self.assertTrue(np.isnan(RecordStages('mitdb_902', self.folder).f1(*self.defaults)))
+
+        results = run_sweep(['mitdb_900', 'mitdb_902'], {}, self.folder)
+        self.assertTrue(np.isnan(results[0]['mitdb_902']))
+        self.assertEqual(results[0]['mean_f1'], results[0]['mitdb_900'])
+
+
+if __name__ == '__main__':
+    unittest.main()
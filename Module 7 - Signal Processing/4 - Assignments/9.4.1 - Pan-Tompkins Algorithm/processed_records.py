@@ -0,0 +1,224 @@
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from benchmark_runner import default_path_to_folder
+from ekg_loader import load_ekg_record
+from pan_tompkins_utils import preprocess
+
+# folder inside the ekg folder that processed records are written to. It is kept apart from the
+# processed_*.npy files shipped in data/ekg, which were made with a different front end and scale
+# and which the practice scripts' thresholds are tuned to
+output_folder_name = "pipeline"
+
+# name of the manifest written next to the processed records
+manifest_name = "processed_manifest.json"
+
+# front end settings used by detect_heartbeats()
+default_params = {'low_fc': 5, 'high_fc': 123, 'filter_order': 4, 'window': 20}
+
+
+def find_records(path_to_folder=default_path_to_folder):
+    """
+    Find every EKG record in the ekg folder and its challenge folder
+    :param path_to_folder: Path to the ekg folder
+    :return: Dictionary of record name (e.g. mitdb_100) to the path of its CSV file
+    """
+    records = dict()
+
+    for folder in [path_to_folder, os.path.join(path_to_folder, "challenge")]:
+        for csv_path in sorted(glob.glob(os.path.join(folder, "*.csv"))):
+            name = os.path.splitext(os.path.basename(csv_path))[0]
+
+            # a record in the main folder wins over a copy in the challenge folder
+            records.setdefault(name, csv_path)
+
+    return records
+
+
+def output_folder(path_to_folder=default_path_to_folder):
+    """
+    Folder the processed records and their manifest are written to
+    :param path_to_folder: Path to the ekg folder
+    :return: Path to the pipeline folder inside the ekg folder
+    """
+    return os.path.join(path_to_folder, output_folder_name)
+
+
+def processed_path(database_name, path_to_folder=default_path_to_folder):
+    """
+    Path of the processed copy of a record. Every record, including the challenge records,
+    is written to the same pipeline folder so it can be found by name alone.
+    :param database_name: Name of the record, e.g. mitdb_100
+    :param path_to_folder: Path to the ekg folder
+    :return: Path to pipeline/processed_<database_name>.npy
+    """
+    return os.path.join(output_folder(path_to_folder), "processed_" + database_name + ".npy")
+
+
+def source_info(csv_path):
+    """
+    Size and modification time of a record, used to tell when its processed copy is out of date
+    """
+    stats = os.stat(csv_path)
+
+    return {'size': stats.st_size, 'mtime_ns': stats.st_mtime_ns}
+
+
+def process_record(database_name, csv_path, output_path, params):
+    """
+    Run the Pan-Tompkins front end over lead 1 of a record and save the envelope as float32
+    :param database_name: Name of the record, e.g. mitdb_100
+    :param csv_path: Path to the record's CSV file
+    :param output_path: Path of the .npy file to write
+    :param params: Keyword arguments for pan_tompkins_utils.preprocess()
+    :return: The manifest entry for the record
+    """
+    start = time.perf_counter()
+
+    # taken before loading, so a change made while processing is picked up by the next run
+    source = source_info(csv_path)
+
+    data, metadata = load_ekg_record(csv_path)
+    envelope = preprocess(np.asarray(data[:, 1], dtype=float), metadata['f_s'], **params)
+
+    # write to a temporary file first so a reader never memory-maps a half written file
+    temporary_path = output_path + ".tmp.npy"
+    np.save(temporary_path, envelope.astype(np.float32))
+    os.replace(temporary_path, output_path)
+
+    return {'source': os.path.abspath(csv_path), 'output': os.path.basename(output_path), **source,
+            'params': dict(params), 'f_s': float(metadata['f_s']), 'samples': len(envelope), 'dtype': 'float32',
+            'seconds': time.perf_counter() - start}
+
+
+def is_up_to_date(entry, csv_path, output_path, params):
+    """
+    Check whether a processed record was made from the current CSV file with the same settings
+    :param entry: The record's manifest entry, or None if it has none
+    :param csv_path: Path to the record's CSV file
+    :param output_path: Path of the processed .npy file
+    :param params: Front end settings that would be used now
+    :return: True if the record does not need to be processed again
+    """
+    if entry is None or not os.path.exists(output_path):
+        return False
+
+    source = source_info(csv_path)
+
+    return (entry.get('source') == os.path.abspath(csv_path) and entry.get('size') == source['size'] and
+            entry.get('mtime_ns') == source['mtime_ns'] and entry.get('params') == params)
+
+
+def read_manifest(path_to_folder=default_path_to_folder):
+    """
+    Read the manifest of processed records
+    :param path_to_folder: Path to the ekg folder
+    :return: Dictionary of record name to manifest entry; empty if there is no manifest yet
+    """
+    try:
+        with open(os.path.join(output_folder(path_to_folder), manifest_name)) as file:
+            return json.load(file)['records']
+    except (OSError, ValueError, KeyError):
+        return dict()
+
+
+def write_manifest(records, path_to_folder=default_path_to_folder):
+    """
+    Replace the manifest of processed records in one step
+    :param records: Dictionary of record name to manifest entry
+    :param path_to_folder: Path to the ekg folder
+    :return: Path of the manifest
+    """
+    manifest_path = os.path.join(output_folder(path_to_folder), manifest_name)
+    temporary_path = manifest_path + ".tmp"
+
+    with open(temporary_path, 'w') as file:
+        json.dump({'records': records}, file, indent=2, sort_keys=True)
+    os.replace(temporary_path, manifest_path)
+
+    return manifest_path
+
+
+def run_pipeline(path_to_folder=default_path_to_folder, workers=None, force=False, **params):
+    """
+    Process every record in the ekg folder and its challenge folder, one record per worker
+    process. Records whose processed copy is up to date are skipped.
+    :param path_to_folder: Path to the ekg folder
+    :param workers: Number of worker processes. None uses one per CPU core; 1 runs serially.
+    :param force: Process every record even if it is up to date
+    :param params: Front end settings (low_fc, high_fc, filter_order, window); missing ones use default_params
+    :return: Dictionary with the names of the records that were 'processed', 'skipped', and 'failed'
+    """
+    params = {**default_params, **params}
+
+    records = find_records(path_to_folder)
+    manifest = read_manifest(path_to_folder)
+
+    os.makedirs(output_folder(path_to_folder), exist_ok=True)
+
+    # drop entries for records that no longer exist
+    manifest = {name: entry for name, entry in manifest.items() if name in records}
+
+    stale = [name for name, csv_path in records.items()
+             if force or not is_up_to_date(manifest.get(name), csv_path, processed_path(name, path_to_folder), params)]
+
+    status = {'processed': list(), 'skipped': [name for name in records if name not in stale], 'failed': dict()}
+
+    jobs = [(name, records[name], processed_path(name, path_to_folder), params) for name in stale]
+
+    if workers == 1:
+        outcomes = list()
+        for job in jobs:
+            try:
+                outcomes.append(process_record(*job))
+            except Exception as e:
+                outcomes.append(e)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(process_record, *job) for job in jobs]
+            outcomes = [f.exception() or f.result() for f in futures]
+
+    for name, outcome in zip(stale, outcomes):
+        if isinstance(outcome, Exception):
+            # keep going with the other records; the old entry no longer describes the output
+            status['failed'][name] = type(outcome).__name__ + ": " + str(outcome)
+            manifest.pop(name, None)
+        else:
+            status['processed'].append(name)
+            manifest[name] = outcome
+
+    write_manifest(manifest, path_to_folder)
+
+    return status
+
+
+def load_processed(database_name, path_to_folder=default_path_to_folder, mmap=True):
+    """
+    Load the processed envelope of a record written by run_pipeline()
+    :param database_name: Name of the record, e.g. mitdb_100
+    :param path_to_folder: Path to the ekg folder
+    :param mmap: Memory-map the .npy file instead of reading it into memory
+    :return: float32 array holding the energy envelope of lead 1
+    """
+    return np.load(processed_path(database_name, path_to_folder), mmap_mode='r' if mmap else None)
+
+
+if __name__ == "__main__":
+
+    # number of worker processes; None will use every core
+    workers = None
+
+    start = time.perf_counter()
+    status = run_pipeline(workers=workers)
+
+    print("Processed: ", len(status['processed']), status['processed'])
+    print("Up to date:", len(status['skipped']), status['skipped'])
+    for name, error in status['failed'].items():
+        print("Failed:    ", name, error)
+
+    print("Total time (s): ", round(time.perf_counter() - start, 2))
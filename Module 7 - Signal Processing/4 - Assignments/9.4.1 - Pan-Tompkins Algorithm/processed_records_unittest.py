@@ -0,0 +1,100 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from pan_tompkins_utils import preprocess
+from processed_records import run_pipeline, read_manifest, load_processed, processed_path
+from streaming_pan_tompkins_unittest import synthetic_ekg
+
+
+def write_record(path, signal, f_s):
+    """
+    Write a signal in the same CSV layout as the records in data/ekg
+    """
+    time = np.arange(len(signal)) / f_s
+    data = np.column_stack((time, signal, 0.5 * signal))
+    np.savetxt(path, data, delimiter=',', header="'Elapsed time','MLII','V5'\n'seconds','mV','mV'", comments='')
+
+
+def write_annotations(path, beats, f_s):
+    """
+    Write beat locations in the same layout as the *_annotations.txt files in data/ekg
+    """
+    with open(path, 'w') as file:
+        for beat in beats:
+            minutes, seconds = divmod(beat / f_s, 60)
+            file.write("%6d:%06.3f %8d     N    0    0    0\n" % (minutes, seconds, beat))
+
+
+class TestProcessedRecords(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.folder, "challenge"))
+
+        self.f_s = 360
+        self.signal, _ = synthetic_ekg(self.f_s, duration=20)
+        write_record(os.path.join(self.folder, "mitdb_900.csv"), self.signal, self.f_s)
+        write_record(os.path.join(self.folder, "challenge", "mitdb_901.csv"), self.signal[::-1], self.f_s)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_outputs(self):
+        status = run_pipeline(self.folder, workers=1)
+        self.assertEqual(sorted(status['processed']), ['mitdb_900', 'mitdb_901'])
+
+        # challenge records are written to the same pipeline folder
+        self.assertTrue(os.path.exists(processed_path('mitdb_901', self.folder)))
+        self.assertEqual(os.path.dirname(processed_path('mitdb_901', self.folder)),
+                         os.path.join(self.folder, "pipeline"))
+
+        envelope = load_processed('mitdb_900', self.folder)
+        self.assertIsInstance(envelope, np.memmap)
+        self.assertEqual(envelope.dtype, np.float32)
+
+        expected = preprocess(self.signal, self.f_s)
+        np.testing.assert_allclose(envelope / np.max(expected), expected / np.max(expected), atol=1e-5)
+
+        manifest = read_manifest(self.folder)
+        self.assertEqual(manifest['mitdb_900']['samples'], len(expected))
+        self.assertEqual(manifest['mitdb_900']['params']['window'], 20)
+
+    def test_skips_up_to_date(self):
+        run_pipeline(self.folder, workers=1)
+
+        status = run_pipeline(self.folder, workers=1)
+        self.assertEqual(status['processed'], [])
+        self.assertEqual(sorted(status['skipped']), ['mitdb_900', 'mitdb_901'])
+
+        # a changed record or changed settings are processed again
+        path = os.path.join(self.folder, "mitdb_900.csv")
+        write_record(path, 2 * self.signal, self.f_s)
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10 ** 9))
+
+        self.assertEqual(run_pipeline(self.folder, workers=1)['processed'], ['mitdb_900'])
+        self.assertEqual(len(run_pipeline(self.folder, workers=1, window=30)['processed']), 2)
+
+    def test_shipped_files_untouched(self):
+        # processed files shipped in the ekg folder are left alone
+        shipped = os.path.join(self.folder, "processed_mitdb_900.npy")
+        np.save(shipped, np.arange(10.0))
+
+        run_pipeline(self.folder, workers=1)
+
+        np.testing.assert_array_equal(np.load(shipped), np.arange(10.0))
+        self.assertNotEqual(processed_path('mitdb_900', self.folder), shipped)
+
+    def test_failed_record(self):
+        with open(os.path.join(self.folder, "mitdb_902.csv"), 'w') as file:
+            file.write("'Elapsed time','MLII','V5'\n'seconds','mV','mV'\nnot,a,number\n")
+
+        status = run_pipeline(self.folder, workers=1)
+
+        self.assertIn('mitdb_902', status['failed'])
+        self.assertNotIn('mitdb_902', read_manifest(self.folder))
+        self.assertEqual(len(status['processed']), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
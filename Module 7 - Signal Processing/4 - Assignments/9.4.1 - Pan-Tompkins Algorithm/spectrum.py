@@ -0,0 +1,63 @@
+import os
+import sys
+from collections import OrderedDict
+
+from ekg_loader import load_ekg_record
+
+# fft_spectrum() and the plotting helpers are shared with the lecture examples
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../shared"))
+from spectrum_tools import fft_spectrum, welch_spectrum, decimate_for_plot, plot_spectrum, plot_fft_response, \
+    default_max_points
+
+# spectra already calculated, keyed by (record path, modification time, channel, method, params),
+# least recently used first
+_spectra = OrderedDict()
+
+# most spectra kept at once; an FFT of a 30 minute record is about 5 MB, and every edit to a
+# record file adds a new entry
+max_cached_spectra = 16
+
+
+def record_spectrum(filepath, channel=1, method='welch', **params):
+    """
+    Spectrum of one lead of an EKG record. The last max_cached_spectra (record, channel,
+    method, params) are kept, so asking again is free; editing the record file calculates it again.
+    :param filepath: Path to an EKG CSV file
+    :param channel: Which column of the record to use (1 or 2)
+    :param method: 'welch' for welch_spectrum() or 'fft' for fft_spectrum()
+    :param params: Keyword arguments for welch_spectrum()
+    :return: Read-only arrays of frequency and amplitude (fft) or power spectral density (welch)
+    """
+    key = (os.path.abspath(filepath), os.stat(filepath).st_mtime_ns, channel, method,
+           tuple(sorted(params.items())))
+
+    if key in _spectra:
+        _spectra.move_to_end(key)
+    else:
+        data, metadata = load_ekg_record(filepath)
+        signal = data[:, channel]
+
+        if method == 'fft':
+            spectrum = fft_spectrum(signal, metadata['f_s'])
+        elif method == 'welch':
+            spectrum = welch_spectrum(signal, metadata['f_s'], **params)
+        else:
+            raise ValueError("method must be 'welch' or 'fft', not " + repr(method))
+
+        # shared between callers, so make sure nobody changes them
+        for array in spectrum:
+            array.setflags(write=False)
+
+        _spectra[key] = spectrum
+        while len(_spectra) > max_cached_spectra:
+            _spectra.popitem(last=False)
+
+    return _spectra[key]
+
+
+def clear_cache():
+    """
+    Forget every cached spectrum
+    :return: None
+    """
+    _spectra.clear()
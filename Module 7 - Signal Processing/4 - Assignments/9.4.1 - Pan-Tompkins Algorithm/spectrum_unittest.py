@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import spectrum
+from spectrum import record_spectrum, clear_cache
+from processed_records_unittest import write_record
+
+
+class TestRecordSpectrum(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "mitdb_900.csv")
+
+        self.f_s = 360
+        time = np.arange(20 * self.f_s) / self.f_s
+        write_record(self.path, np.sin(2 * np.pi * 5 * time), self.f_s)
+
+        clear_cache()
+
+    def tearDown(self):
+        clear_cache()
+        shutil.rmtree(self.folder)
+
+    def test_cached(self):
+        first = record_spectrum(self.path, segment_length=2)
+        second = record_spectrum(self.path, segment_length=2)
+
+        self.assertIs(first, second)
+        self.assertFalse(first[1].flags.writeable)
+        self.assertAlmostEqual(first[0][np.argmax(first[1])], 5)
+
+        # different channels or parameters are separate entries
+        self.assertIsNot(record_spectrum(self.path, channel=2, segment_length=2), first)
+        self.assertIsNot(record_spectrum(self.path, segment_length=4), first)
+
+        freq, amplitude = record_spectrum(self.path, method='fft')
+        self.assertEqual(len(freq), 20 * self.f_s // 2 + 1)
+
+    def test_cache_bounded(self):
+        first = record_spectrum(self.path, segment_length=1)
+
+        for segment_length in range(2, spectrum.max_cached_spectra + 1):
+            record_spectrum(self.path, segment_length=segment_length)
+
+        # using the first entry again keeps it; the next new entry pushes out the oldest other one
+        self.assertIs(record_spectrum(self.path, segment_length=1), first)
+        record_spectrum(self.path, method='fft')
+
+        self.assertEqual(len(spectrum._spectra), spectrum.max_cached_spectra)
+        self.assertIs(record_spectrum(self.path, segment_length=1), first)
+        self.assertNotIn(2, [dict(key[4]).get('segment_length') for key in spectrum._spectra])
+
+    def test_bad_method(self):
+        with self.assertRaises(ValueError):
+            record_spectrum(self.path, method='periodogram')
+
+
+if __name__ == '__main__':
+    unittest.main()
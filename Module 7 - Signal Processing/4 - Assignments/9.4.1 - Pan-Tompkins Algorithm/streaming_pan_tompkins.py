@@ -0,0 +1,277 @@
+from itertools import islice
+
+import numpy as np
+import scipy.signal as sp
+
+from pan_tompkins_decision import AdaptiveThresholdDetector
+from pan_tompkins_utils import bandpass_sos, bandpass_zi
+
+
+class StreamingPanTompkins:
+    """
+    A block-by-block version of the Pan-Tompkins detector in detect_heartbeats(). Each call
+    to process() consumes the next block of raw samples and returns the indices of any beats
+    that have been confirmed. All state needed to continue (filter state, differentiator and
+    moving window history, running statistics, and the pending peak) is carried between
+    blocks so memory use does not grow with the length of the record.
+
+    Because the data can not be run backwards, filtering is causal (sosfilt) rather than
+    zero-phase (filtfilt), and the global max threshold is replaced with a running max of the
+    clipped envelope. Beat indices are in the same coordinates as detect_heartbeats().
+    """
+
+    def __init__(self, f_s, low_fc=5, high_fc=123, filter_order=4, window=20, z=1.4, H=0.35, distance=150,
+                 adaptive=False):
+        """
+        Create a new streaming detector
+        :param f_s: Sampling rate of the record (Hertz)
+        :param low_fc: Cutoff of the high pass filter (Hertz)
+        :param high_fc: Cutoff of the low pass filter (Hertz)
+        :param filter_order: Order of each butterworth filter
+        :param window: Length of the moving window (samples)
+        :param z: Number of standard deviations above the mean before the envelope is clipped
+        :param H: Fraction of the clipped maximum used as the detection threshold
+        :param distance: Minimum distance between beats (samples)
+        :param adaptive: Use the dual-threshold Pan-Tompkins decision stage (AdaptiveThresholdDetector)
+        instead of the clipped running max, z, H, and distance
+        """
+        self.f_s = f_s
+        self.window = window
+        self.z = z
+        self.H = H
+        self.distance = distance
+
+        # low pass then high pass, same as detect_heartbeats(), as one cascade of sections
+        self.sos = bandpass_sos(f_s, low_fc, high_fc, filter_order)
+
+        # steady-state filter state for a signal of 1, scaled by the first sample of each record
+        self.unit_zi = bandpass_zi(f_s, low_fc, high_fc, filter_order)
+
+        # kernel for the moving window
+        self.kernel = np.ones(window)
+
+        # optional SPKI/NPKI decision stage
+        self.decision = AdaptiveThresholdDetector(f_s) if adaptive else None
+
+        self.reset()
+
+    def reset(self):
+        """
+        Clear all carried state so a new record can be processed
+        :return: None
+        """
+        # filter state for sosfilt; set from the first sample of the record by process()
+        self.zi = None
+
+        # last filtered sample, needed by the differentiator
+        self.last_filtered = None
+
+        # last (window - 1) squared samples, needed by the moving window
+        self.window_tail = np.zeros(self.window - 1)
+
+        # running sums of the envelope for the mean and standard deviation
+        self.count = 0
+        self.total = 0.0
+        self.total_squared = 0.0
+
+        # running max of the clipped envelope
+        self.running_max = 0.0
+
+        # last envelope values (and their thresholds) needed to find local maxima
+        self.tail_envelope = np.zeros(0)
+        self.tail_threshold = np.zeros(0)
+
+        # best peak found so far that is still within the refractory distance
+        self.pending = None
+
+        if self.decision is not None:
+            self.decision.reset()
+
+        return
+
+    def process(self, block):
+        """
+        Run the next block of raw samples through the detector
+        :param block: An array of raw EKG samples that directly follows the previous block
+        :return: An array of beat indices that were confirmed by this block
+        """
+        block = np.asarray(block, dtype=float)
+
+        if block.size == 0:
+            return np.zeros(0, dtype=int)
+
+        # start the filter as if the first sample had always been there. Starting from zero
+        # turns any DC offset into a step whose transient sets the running max far too high
+        if self.zi is None:
+            self.zi = self.unit_zi * block[0]
+
+        # band pass filter, carrying the filter state between blocks
+        filtered, self.zi = sp.sosfilt(self.sos, block, zi=self.zi)
+
+        # differentiate, using the last sample of the previous block
+        if self.last_filtered is not None:
+            filtered_with_history = np.concatenate(([self.last_filtered], filtered))
+        else:
+            filtered_with_history = filtered
+        self.last_filtered = filtered[-1]
+        derivative = np.diff(filtered_with_history)
+
+        # the very first sample of a record has nothing to differentiate against
+        if derivative.size == 0:
+            return np.zeros(0, dtype=int)
+
+        # square
+        squared = np.square(derivative)
+
+        # moving window, using the last (window - 1) squared samples of the previous block
+        extended = np.concatenate((self.window_tail, squared))
+        envelope = np.convolve(extended, self.kernel, mode='valid')
+        self.window_tail = extended[len(extended) - (self.window - 1):]
+
+        if self.decision is not None:
+            return self.decision.process(envelope)
+
+        return self._decide(envelope)
+
+    def flush(self):
+        """
+        Signal the end of the record and release any beat still waiting on the refractory distance
+        :return: An array holding the final beat index (if any)
+        """
+        if self.decision is not None:
+            return self.decision.flush()
+
+        beats = list()
+        if self.pending is not None:
+            beats.append(self.pending[0])
+            self.pending = None
+
+        return np.asarray(beats, dtype=int)
+
+    def _decide(self, envelope):
+        """
+        Apply the threshold and refractory distance to the next piece of the envelope
+        :param envelope: Output of the moving window for the current block
+        :return: An array of confirmed beat indices
+        """
+        n = envelope.size
+        if n == 0:
+            return np.zeros(0, dtype=int)
+
+        # running mean and standard deviation. Seeding cumsum with the carried totals keeps
+        # the sums identical no matter how the record is split into blocks
+        sums = np.cumsum(np.concatenate(([self.total], envelope)))[1:]
+        sums_squared = np.cumsum(np.concatenate(([self.total_squared], np.square(envelope))))[1:]
+        counts = self.count + np.arange(1, n + 1)
+        avg = sums / counts
+        std = np.sqrt(np.maximum(sums_squared / counts - np.square(avg), 0))
+
+        # clip outliers, then take the running max to set the threshold
+        clipped = np.minimum(envelope, avg + self.z * std)
+        running_max = np.maximum.accumulate(np.concatenate(([self.running_max], clipped)))[1:]
+        threshold = self.H * running_max
+
+        # index of the first value in this block
+        start = self.count
+
+        self.total = sums[-1]
+        self.total_squared = sums_squared[-1]
+        self.count += n
+        self.running_max = running_max[-1]
+
+        # local maxima need one value on each side, so prepend the end of the previous block
+        history = np.concatenate((self.tail_envelope, envelope))
+        history_threshold = np.concatenate((self.tail_threshold, threshold))
+        history_start = start - self.tail_envelope.size
+
+        middle = history[1:-1]
+        is_peak = (middle > history[:-2]) & (middle >= history[2:]) & (middle > history_threshold[1:-1])
+        candidates = np.flatnonzero(is_peak) + 1
+
+        self.tail_envelope = history[-2:]
+        self.tail_threshold = history_threshold[-2:]
+
+        # greedy refractory pass over the (much smaller) set of candidates
+        beats = list()
+        for p in candidates:
+            index = history_start + p
+            value = history[p]
+
+            if self.pending is None:
+                self.pending = (index, value)
+            elif index - self.pending[0] < self.distance:
+                # keep the larger of two peaks that are too close together
+                if value > self.pending[1]:
+                    self.pending = (index, value)
+            else:
+                beats.append(self.pending[0])
+                self.pending = (index, value)
+
+        # every future candidate is at least this far along, so the pending peak is final
+        if self.pending is not None and (self.count - 1) - self.pending[0] >= self.distance:
+            beats.append(self.pending[0])
+            self.pending = None
+
+        return np.asarray(beats, dtype=int)
+
+
+def detect_heartbeats_causal(signal, f_s, **params):
+    """
+    Batch version of StreamingPanTompkins. Produces exactly the same beats as streaming
+    the signal through the detector in any block size.
+    :param signal: An array of raw EKG samples
+    :param f_s: Sampling rate of the record (Hertz)
+    :param params: Any keyword arguments accepted by StreamingPanTompkins
+    :return: An array of beat indices
+    """
+    detector = StreamingPanTompkins(f_s, **params)
+
+    beats = detector.process(signal)
+    remaining = detector.flush()
+
+    return np.concatenate((beats, remaining))
+
+
+def read_ekg_blocks(filepath, block_size=65536):
+    """
+    Read an EKG CSV file a block of rows at a time so the whole file is never in memory
+    :param filepath: A valid path to a CSV file of heart beats
+    :param block_size: Number of rows to read at a time
+    :return: A generator of (block_size, 3) arrays of time, lead 1, and lead 2
+    """
+    with open(filepath) as file:
+        # skip the header and units rows
+        file.readline()
+        file.readline()
+
+        while True:
+            lines = list(islice(file, block_size))
+            if len(lines) == 0:
+                break
+
+            yield np.loadtxt(lines, delimiter=',', ndmin=2)
+
+
+def stream_heartbeats(filepath, block_size=65536, column=1, **params):
+    """
+    Detect heartbeats in an EKG CSV file one block at a time
+    :param filepath: A valid path to a CSV file of heart beats
+    :param block_size: Number of rows to process at a time
+    :param column: Which column of the file to process (1 or 2)
+    :param params: Any keyword arguments accepted by StreamingPanTompkins
+    :return: A generator of beat indices, produced as soon as each beat is confirmed
+    """
+    detector = None
+
+    for block in read_ekg_blocks(filepath, block_size):
+        # the sampling rate comes from the time column of the first block
+        if detector is None:
+            f_s = np.average(np.diff(block[:, 0])) ** -1
+            detector = StreamingPanTompkins(f_s, **params)
+
+        for beat in detector.process(block[:, column]):
+            yield int(beat)
+
+    if detector is not None:
+        for beat in detector.flush():
+            yield int(beat)
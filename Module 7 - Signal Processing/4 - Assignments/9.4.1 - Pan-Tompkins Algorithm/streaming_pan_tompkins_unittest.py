@@ -0,0 +1,115 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from benchmark_runner import load_detector, default_detector_path
+from streaming_pan_tompkins import StreamingPanTompkins, detect_heartbeats_causal
+
+
+def synthetic_ekg(f_s=360, duration=60, seed=0):
+    """
+    Build a simple EKG-like signal: narrow QRS spikes with broad T waves on top of
+    baseline wander and noise. Returns the signal and the true beat locations.
+    """
+    rng = np.random.default_rng(seed)
+    n = int(duration * f_s)
+    t = np.arange(n) / f_s
+
+    # beats roughly every 0.8s with some jitter
+    beats = list()
+    position = 0.5
+    while position < duration - 1:
+        beats.append(int(position * f_s))
+        position += 0.8 + rng.uniform(-0.1, 0.1)
+    beats = np.asarray(beats)
+
+    signal = 0.3 * np.sin(2 * np.pi * 0.3 * t) + 0.02 * rng.standard_normal(n)
+    for b in beats:
+        signal += np.exp(-0.5 * ((np.arange(n) - b) / (0.008 * f_s)) ** 2)
+        signal += 0.3 * np.exp(-0.5 * ((np.arange(n) - b - 0.25 * f_s) / (0.04 * f_s)) ** 2)
+
+    return signal, beats
+
+
+# most a streamed beat may trail the zero-phase batch detector (samples at 360 Hz)
+max_delay = 12
+
+
+class TestStreamingPanTompkins(unittest.TestCase):
+    def setUp(self):
+        self.f_s = 360
+        self.signal, self.beats = synthetic_ekg(self.f_s)
+
+    def test_block_size_does_not_change_beats(self):
+        batch = detect_heartbeats_causal(self.signal, self.f_s)
+
+        for block_size in [1, 7, 150, 1000, 4096]:
+            detector = StreamingPanTompkins(self.f_s)
+            streamed = list()
+            for start in range(0, len(self.signal), block_size):
+                streamed.extend(detector.process(self.signal[start:start + block_size]))
+            streamed.extend(detector.flush())
+
+            np.testing.assert_array_equal(np.asarray(streamed), batch, "Block size " + str(block_size))
+
+    def test_finds_every_beat(self):
+        detected = detect_heartbeats_causal(self.signal, self.f_s)
+
+        # ignore the first second while the running threshold settles
+        expected = self.beats[self.beats > self.f_s]
+        detected = detected[detected > self.f_s]
+
+        self.assertEqual(len(detected), len(expected))
+        self.assertTrue(np.all(np.abs(detected - expected) < 90))
+
+    def test_matches_batch_detector(self):
+        # imported here since processed_records_unittest uses synthetic_ekg from this file
+        from processed_records_unittest import write_record
+
+        # the batch detector in the template works on a record file
+        folder = tempfile.mkdtemp()
+        try:
+            path = os.path.join(folder, "mitdb_900.csv")
+            write_record(path, self.signal, self.f_s)
+            envelope, batch = load_detector(default_detector_path, 'detect_heartbeats')(path)
+        finally:
+            shutil.rmtree(folder)
+
+        batch = np.asarray(batch)
+        self.assertEqual(len(batch), len(self.beats))
+
+        for block_size in [1, 150, 4096]:
+            detector = StreamingPanTompkins(self.f_s)
+            streamed = list()
+            for start in range(0, len(self.signal), block_size):
+                streamed.extend(detector.process(self.signal[start:start + block_size]))
+            streamed = np.asarray(streamed + list(detector.flush()))
+
+            # causal filtering can only delay a beat, by at most the filters' group delay (~33 ms)
+            self.assertEqual(len(streamed), len(batch), "Block size " + str(block_size))
+            delay = streamed - batch
+            self.assertTrue(np.all((delay >= 0) & (delay <= max_delay)), "Block size " + str(block_size))
+
+    def test_dc_offset(self):
+        # raw leads are rarely centred on zero; the offset must not swamp the threshold
+        for offset in [-1.5, 3.0]:
+            for adaptive in [False, True]:
+                detected = detect_heartbeats_causal(self.signal + offset, self.f_s, adaptive=adaptive)
+                reference = detect_heartbeats_causal(self.signal, self.f_s, adaptive=adaptive)
+
+                self.assertEqual(len(detected), len(reference), "Offset " + str(offset))
+                self.assertTrue(np.all(np.abs(detected - reference) <= 1), "Offset " + str(offset))
+
+    def test_reset(self):
+        detector = StreamingPanTompkins(self.f_s)
+        first = np.concatenate((detector.process(self.signal), detector.flush()))
+
+        detector.reset()
+        second = np.concatenate((detector.process(self.signal), detector.flush()))
+
+        np.testing.assert_array_equal(first, second)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import numpy as np
+import scipy.signal as sp
+
+from pan_tompkins_utils import bandpass_sos
+
+
+def settling_samples(sos, tolerance=1e-9, max_samples=2 ** 20):
+    """
+    Number of samples until a filter's impulse response has died away. Anything this far from
+    a cut in the signal is not affected by where the cut was made.
+    :param sos: Second-order sections of the filter
+    :param tolerance: Size of the impulse response, relative to its peak, that counts as settled
+    :param max_samples: Longest impulse response to look at
+    :return: Number of samples
+    """
+    length = 1024
+    while True:
+        impulse = np.zeros(length)
+        impulse[0] = 1
+        response = np.abs(sp.sosfilt(sos, impulse))
+
+        above = np.flatnonzero(response > tolerance * np.max(response))
+
+        # settled well before the end of what we looked at, or gave up looking
+        if above[-1] < length // 2 or length >= max_samples:
+            return int(above[-1]) + 1
+
+        length *= 2
+
+
+def iter_filtfilt_blocks(sos, signal, block_size=65536, padding=None, tolerance=1e-9):
+    """
+    Zero-phase filter a signal one block at a time. Each block is filtered forward and backward
+    together with padding samples of real signal on each side, and only the middle is kept.
+    The start-up transients of both passes are confined to the padding, so the output differs
+    from sosfiltfilt over the whole signal by no more than the part of the impulse response
+    that is left after padding samples.
+    :param sos: Second-order sections of the filter
+    :param signal: An array of samples; a memory-mapped array is only read a block at a time
+    :param block_size: Number of output samples produced at a time
+    :param padding: Samples of overlap on each side of a block; None uses settling_samples()
+    :param tolerance: Settling tolerance used when padding is None
+    :return: A generator of (start index, filtered block)
+    """
+    n = len(signal)
+
+    if padding is None:
+        padding = settling_samples(sos, tolerance)
+
+    # sosfiltfilt needs every piece to be longer than its own edge padding
+    edge = 3 * (2 * len(sos) + 1)
+    padding = max(padding, edge)
+
+    # a final block that is too short is merged into the one before
+    starts = list(range(0, n, block_size))
+    if len(starts) > 1 and n - starts[-1] <= edge:
+        starts.pop()
+
+    for i, start in enumerate(starts):
+        end = starts[i + 1] if i + 1 < len(starts) else n
+
+        low = max(0, start - padding)
+        high = min(n, end + padding)
+
+        filtered = sp.sosfiltfilt(sos, np.asarray(signal[low:high], dtype=float))
+
+        yield start, filtered[start - low:end - low]
+
+
+def blockwise_filtfilt(sos, signal, block_size=65536, padding=None, out=None):
+    """
+    Block-wise version of sosfiltfilt for records too long to filter in one piece
+    :param sos: Second-order sections of the filter
+    :param signal: An array of samples; a memory-mapped array is only read a block at a time
+    :param block_size: Number of output samples produced at a time
+    :param padding: Samples of overlap on each side of a block; None uses settling_samples()
+    :param out: Array to write the result into, e.g. a memory-mapped file; None creates one
+    :return: The filtered signal
+    """
+    if out is None:
+        out = np.empty(len(signal))
+
+    for start, block in iter_filtfilt_blocks(sos, signal, block_size, padding):
+        out[start:start + len(block)] = block
+
+    return out
+
+
+def error_report(sos, signal, block_size=65536, padding=None):
+    """
+    Compare blockwise_filtfilt() against sosfiltfilt() on the whole signal
+    :param sos: Second-order sections of the filter
+    :param signal: An array of samples
+    :param block_size: Number of output samples produced at a time
+    :param padding: Samples of overlap on each side of a block; None uses settling_samples()
+    :return: Dictionary of the padding used, max and RMS absolute error, and max error relative to the output's peak
+    """
+    signal = np.asarray(signal, dtype=float)
+
+    if padding is None:
+        padding = settling_samples(sos)
+
+    batch = sp.sosfiltfilt(sos, signal)
+    blocks = blockwise_filtfilt(sos, signal, block_size, padding)
+
+    error = np.abs(blocks - batch)
+    peak = np.max(np.abs(batch))
+
+    return {'block_size': block_size, 'padding': padding, 'max_error': float(np.max(error)),
+            'rms_error': float(np.sqrt(np.mean(np.square(error)))),
+            'relative_error': float(np.max(error) / peak) if peak > 0 else 0.0}
+
+
+if __name__ == "__main__":
+
+    from benchmark_runner import find_record
+    from ekg_loader import load_ekg_record
+
+    database_name = 'mitdb_100'
+
+    data, metadata = load_ekg_record(find_record(database_name) + ".csv")
+    signal = np.asarray(data[:, 1], dtype=float)
+
+    # the Pan-Tompkins band pass used by detect_heartbeats()
+    sos = bandpass_sos(metadata['f_s'])
+
+    print("Settling samples: ", settling_samples(sos))
+
+    print("Block size|\tPadding|\tMax error|\tRMS error|\tRelative error")
+    for block_size in [4096, 65536]:
+        for padding in [50, 200, 800, None]:
+            r = error_report(sos, signal, block_size, padding)
+            print(r['block_size'], "|\t", r['padding'], "|\t", '%.2e' % r['max_error'], "|\t",
+                  '%.2e' % r['rms_error'], "|\t", '%.2e' % r['relative_error'])
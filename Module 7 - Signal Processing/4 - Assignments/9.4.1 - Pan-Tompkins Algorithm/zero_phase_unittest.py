@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import scipy.signal as sp
+from pan_tompkins_utils import bandpass_sos
+from zero_phase import settling_samples, blockwise_filtfilt, iter_filtfilt_blocks, error_report
+from streaming_pan_tompkins_unittest import synthetic_ekg
+
+
+class TestZeroPhase(unittest.TestCase):
+    def setUp(self):
+        self.f_s = 360
+        self.signal, _ = synthetic_ekg(self.f_s, duration=60)
+        self.sos = bandpass_sos(self.f_s)
+
+    def test_matches_filtfilt(self):
+        expected = sp.sosfiltfilt(self.sos, self.signal)
+
+        for block_size in [1000, 4096, len(self.signal)]:
+            np.testing.assert_allclose(blockwise_filtfilt(self.sos, self.signal, block_size), expected, atol=1e-7)
+
+    def test_error_shrinks_with_padding(self):
+        errors = [error_report(self.sos, self.signal, 2000, padding)['max_error'] for padding in [50, 200, 800]]
+
+        self.assertTrue(errors[0] > errors[1] > errors[2])
+        self.assertLess(errors[2], 1e-10)
+
+    def test_settling_samples(self):
+        padding = settling_samples(self.sos, tolerance=1e-6)
+        response = sp.sosfilt(self.sos, np.eye(1, 4 * padding).ravel())
+
+        self.assertLess(np.max(np.abs(response[padding:])), 1e-6 * np.max(np.abs(response)))
+        self.assertGreater(settling_samples(self.sos, tolerance=1e-9), padding)
+
+    def test_short_last_block(self):
+        # the final block would only be 3 samples long, so it is merged into the one before
+        starts = [start for start, block in iter_filtfilt_blocks(self.sos, self.signal[:2003], 1000)]
+        self.assertEqual(starts, [0, 1000])
+
+        np.testing.assert_allclose(blockwise_filtfilt(self.sos, self.signal[:2003], 1000),
+                                   sp.sosfiltfilt(self.sos, self.signal[:2003]), atol=1e-7)
+
+    def test_memory_mapped(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "signal.npy")
+            np.save(path, self.signal)
+
+            signal = np.load(path, mmap_mode='r')
+            out = np.lib.format.open_memmap(os.path.join(folder, "filtered.npy"), mode='w+', shape=signal.shape)
+            blockwise_filtfilt(self.sos, signal, 4096, out=out)
+
+            np.testing.assert_allclose(out, sp.sosfiltfilt(self.sos, self.signal), atol=1e-7)
+            del out, signal
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+from functools import lru_cache
+
+import numpy as np
+import scipy.signal as sp
+
+
+def _key(cutoff, f_s):
+    """
+    Turn filter parameters into hashable cache keys. Sampling rates calculated from a time
+    column (e.g. 359.99999998) are rounded so every record at the same rate shares a design.
+    """
+    if np.ndim(cutoff) == 0:
+        cutoff = float(cutoff)
+    else:
+        cutoff = tuple(float(c) for c in cutoff)
+
+    return cutoff, round(float(f_s), 6)
+
+
+@lru_cache(maxsize=256)
+def _butter(order, cutoff, f_s, btype, output):
+    return sp.butter(order, cutoff, fs=f_s, btype=btype, output=output)
+
+
+@lru_cache(maxsize=256)
+def _butter_zi(order, cutoff, f_s, btype):
+    return sp.sosfilt_zi(_butter(order, cutoff, f_s, btype, 'sos'))
+
+
+@lru_cache(maxsize=256)
+def _firwin(numtaps, cutoff, f_s, pass_zero, window):
+    return sp.firwin(numtaps, cutoff, fs=f_s, pass_zero=pass_zero, window=window)
+
+
+def design_butter(order, cutoff, f_s, btype='lowpass', output='sos'):
+    """
+    Design a butterworth filter, reusing the coefficients if the same filter was designed before
+    :param order: Filter order
+    :param cutoff: Cutoff frequency (Hertz); a pair of frequencies for band pass/stop
+    :param f_s: Sampling rate (Hertz)
+    :param btype: 'lowpass', 'highpass', 'bandpass', or 'bandstop'
+    :param output: 'sos' for second-order sections or 'ba' for numerator/denominator
+    :return: sos array, or (b, a) when output is 'ba'
+    """
+    cutoff, f_s = _key(cutoff, f_s)
+    result = _butter(int(order), cutoff, f_s, btype, output)
+
+    # cached arrays are shared, so hand out copies that are safe to modify
+    if output == 'sos':
+        return result.copy()
+
+    return tuple(r.copy() for r in result)
+
+
+def design_butter_zi(order, cutoff, f_s, btype='lowpass'):
+    """
+    Steady-state initial conditions for sosfilt for a butterworth filter from design_butter(). Multiply
+    by the first sample of a signal to start filtering without a step transient.
+    :param order: Filter order
+    :param cutoff: Cutoff frequency (Hertz); a pair of frequencies for band pass/stop
+    :param f_s: Sampling rate (Hertz)
+    :param btype: 'lowpass', 'highpass', 'bandpass', or 'bandstop'
+    :return: Array of initial conditions with shape (n_sections, 2)
+    """
+    cutoff, f_s = _key(cutoff, f_s)
+
+    return _butter_zi(int(order), cutoff, f_s, btype).copy()
+
+
+def design_fir(numtaps, cutoff, f_s, pass_zero=True, window='hamming'):
+    """
+    Design a windowed FIR filter with firwin, reusing the taps if the same filter was designed before
+    :param numtaps: Number of taps
+    :param cutoff: Cutoff frequency (Hertz), or a list of band edges
+    :param f_s: Sampling rate (Hertz)
+    :param pass_zero: Same as firwin; True for low pass, or 'lowpass', 'highpass', 'bandpass', 'bandstop'
+    :param window: Window used to design the filter
+    :return: Array of filter taps
+    """
+    cutoff, f_s = _key(cutoff, f_s)
+
+    return _firwin(int(numtaps), cutoff, f_s, pass_zero, window).copy()
+
+
+@lru_cache(maxsize=256)
+def _cascade(sections):
+    return np.vstack([design_butter(*s, output='sos') for s in sections])
+
+
+@lru_cache(maxsize=256)
+def _cascade_zi(sections):
+    return sp.sosfilt_zi(_cascade(sections))
+
+
+def _cascade_keys(sections):
+    keys = list()
+    for order, cutoff, f_s, btype in sections:
+        cutoff, f_s = _key(cutoff, f_s)
+        keys.append((int(order), cutoff, f_s, btype))
+
+    return tuple(keys)
+
+
+def design_cascade(*sections):
+    """
+    Stack several butterworth filters into one set of second-order sections so they
+    can be applied in a single pass
+    :param sections: Tuples of (order, cutoff, f_s, btype) for each filter, in the order they are applied
+    :return: Combined sos array
+    """
+    return _cascade(_cascade_keys(sections)).copy()
+
+
+def design_cascade_zi(*sections):
+    """
+    Steady-state initial conditions for sosfilt for a cascade from design_cascade(). Multiply by
+    the first sample of a signal to start filtering without a step transient.
+    :param sections: Tuples of (order, cutoff, f_s, btype) for each filter, in the order they are applied
+    :return: Array of initial conditions with shape (n_sections, 2)
+    """
+    return _cascade_zi(_cascade_keys(sections)).copy()
+
@@ -0,0 +1,84 @@
+import unittest
+import numpy as np
+import scipy.signal as sp
+import filter_bank
+from filter_bank import design_butter, design_butter_zi, design_fir, design_cascade, design_cascade_zi
+
+
+class TestFilterBank(unittest.TestCase):
+    def setUp(self):
+        for function in [filter_bank._butter, filter_bank._butter_zi, filter_bank._firwin, filter_bank._cascade,
+                         filter_bank._cascade_zi]:
+            function.cache_clear()
+
+    def test_butter_matches_scipy(self):
+        np.testing.assert_array_equal(design_butter(4, 15, 360), sp.butter(4, 15, fs=360, output='sos'))
+
+        b, a = design_butter(2, [5, 15], 360, btype='bandpass', output='ba')
+        expected_b, expected_a = sp.butter(2, [5, 15], fs=360, btype='bandpass')
+        np.testing.assert_array_equal(b, expected_b)
+        np.testing.assert_array_equal(a, expected_a)
+
+    def test_fir_matches_scipy(self):
+        np.testing.assert_array_equal(design_fir(31, 40, 360), sp.firwin(31, 40, fs=360))
+        np.testing.assert_array_equal(design_fir(31, [5, 40], 360, pass_zero=False),
+                                      sp.firwin(31, [5, 40], fs=360, pass_zero=False))
+
+    def test_cache_hits(self):
+        design_butter(4, 15, 360)
+
+        # the same design, with a float cutoff and a rate calculated from a time column
+        design_butter(4, 15.0, 359.99999999)
+        design_fir(31, 40, 360)
+        design_fir(31, 40, 360)
+
+        self.assertEqual(filter_bank._butter.cache_info().misses, 1)
+        self.assertEqual(filter_bank._butter.cache_info().hits, 1)
+        self.assertEqual(filter_bank._firwin.cache_info().hits, 1)
+
+        # a different band is a different design
+        design_butter(4, [5, 15], 360, btype='bandpass')
+        design_butter(4, (5, 15), 360, btype='bandpass')
+        self.assertEqual(filter_bank._butter.cache_info().misses, 2)
+        self.assertEqual(filter_bank._butter.cache_info().hits, 2)
+
+    def test_copies_returned(self):
+        taps = design_fir(31, 40, 360)
+        taps[:] = 0
+
+        np.testing.assert_array_equal(design_fir(31, 40, 360), sp.firwin(31, 40, fs=360))
+
+    def test_cascade(self):
+        sos = design_cascade((2, 15, 360, 'lowpass'), (2, 5, 360, 'highpass'))
+
+        expected = np.vstack((sp.butter(2, 15, fs=360, output='sos'), sp.butter(2, 5, fs=360, btype='highpass',
+                                                                                 output='sos')))
+        np.testing.assert_array_equal(sos, expected)
+
+        design_cascade((2, 15, 360, 'lowpass'), (2, 5, 360, 'highpass'))
+        self.assertEqual(filter_bank._cascade.cache_info().hits, 1)
+
+    def test_initial_conditions(self):
+        zi = design_butter_zi(4, 15, 360)
+        np.testing.assert_array_equal(zi, sp.sosfilt_zi(sp.butter(4, 15, fs=360, output='sos')))
+
+        # a constant signal passes through a low pass with no start-up transient
+        filtered, _ = sp.sosfilt(design_butter(4, 15, 360), np.full(100, 2.5), zi=2.5 * zi)
+        np.testing.assert_allclose(filtered, 2.5)
+
+        sections = ((2, 15, 360, 'lowpass'), (2, 5, 360, 'highpass'))
+        zi = design_cascade_zi(*sections)
+        np.testing.assert_array_equal(zi, sp.sosfilt_zi(design_cascade(*sections)))
+
+        # and through a band pass as zeros
+        filtered, _ = sp.sosfilt(design_cascade(*sections), np.full(100, 2.5), zi=2.5 * zi)
+        np.testing.assert_allclose(filtered, 0, atol=1e-12)
+
+        zi[:] = 0
+        design_cascade_zi(*sections)
+        self.assertEqual(filter_bank._cascade_zi.cache_info().hits, 1)
+        self.assertTrue(np.any(design_cascade_zi(*sections) != 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,202 @@
+import time
+
+import numpy as np
+import scipy.signal as sp
+
+# below this many taps, np.convolve beats oaconvolve at every signal length we measured
+# (see benchmark_fir(); the crossover on a 650k sample record is between 192 and 224 taps)
+direct_max_taps = 192
+
+# signals longer than this are filtered a block at a time, so only one block of working memory
+# is used on top of the input and output arrays
+streaming_min_samples = 2 ** 22
+
+# default block size for streaming; long filters get longer blocks so each FFT is worth it
+default_block_size = 65536
+
+
+def choose_method(n_taps, n_samples):
+    """
+    Pick the fastest way to apply an FIR filter
+    :param n_taps: Number of filter taps
+    :param n_samples: Length of the signal
+    :return: 'direct' (np.convolve), 'oaconvolve' (scipy overlap-add FFT), or 'streaming' (block-wise overlap-add)
+    """
+    if n_samples > streaming_min_samples:
+        return 'streaming'
+
+    if n_taps <= direct_max_taps or n_samples <= direct_max_taps:
+        return 'direct'
+
+    return 'oaconvolve'
+
+
+def _convolve(signal, taps):
+    """
+    Full convolution of one piece of signal, choosing direct or FFT based on the tap count
+    """
+    if choose_method(len(taps), len(signal)) == 'direct':
+        return np.convolve(signal, taps)
+
+    return sp.oaconvolve(signal, taps)
+
+
+class StreamingFIR:
+    """
+    Block-wise overlap-add FIR filter. Each block is convolved on its own; the last
+    (taps - 1) outputs, which still need contributions from the next block, are carried over
+    and added to the start of the next block's output. Joining every process() result and
+    flush() gives exactly np.convolve(signal, taps).
+    """
+
+    def __init__(self, taps):
+        """
+        Create a new streaming filter
+        :param taps: Array of FIR filter taps
+        """
+        self.taps = np.asarray(taps, dtype=float)
+
+        self.reset()
+
+    def reset(self):
+        """
+        Clear the carried tail so a new signal can be filtered
+        :return: None
+        """
+        self.tail = np.zeros(len(self.taps) - 1)
+
+        return
+
+    def process(self, block):
+        """
+        Filter the next block of samples
+        :param block: Samples that directly follow the previous block
+        :return: One output sample per input sample
+        """
+        block = np.asarray(block, dtype=float)
+        n = block.size
+
+        if n == 0:
+            return np.zeros(0)
+
+        output = _convolve(block, self.taps)
+
+        # add what the previous blocks contributed to the start of this one
+        overlap = min(self.tail.size, output.size)
+        output[:overlap] += self.tail[:overlap]
+
+        # anything past this block's length is carried forward, along with any of the old
+        # tail that reached further than this (short) block
+        carried = output[n:]
+        leftover = self.tail[overlap:]
+        carried[:leftover.size] += leftover
+        self.tail = carried.copy()
+
+        return output[:n]
+
+    def flush(self):
+        """
+        Signal the end of the input
+        :return: The last (taps - 1) output samples
+        """
+        tail = self.tail
+        self.reset()
+
+        return tail
+
+
+def streaming_fir_filter(taps, signal, block_size=None, out=None):
+    """
+    Filter a signal with StreamingFIR, a block at a time. The working memory is one block; to
+    keep the output off the heap as well, pass a memory-mapped array (np.memmap or
+    np.lib.format.open_memmap) as out.
+    :param taps: Array of FIR filter taps
+    :param signal: An array of samples (a memory-mapped array is read a block at a time)
+    :param block_size: Samples per block; None picks one from the number of taps
+    :param out: Array of len(signal) + len(taps) - 1 samples to write the result to; None allocates one
+    :return: The same result as np.convolve(signal, taps), written to out if it was given
+    """
+    if block_size is None:
+        block_size = max(default_block_size, 8 * len(taps))
+
+    n_output = len(signal) + len(taps) - 1
+    if out is None:
+        out = np.empty(n_output)
+    elif len(out) != n_output:
+        raise ValueError("out must hold " + str(n_output) + " samples, not " + str(len(out)))
+
+    fir = StreamingFIR(taps)
+
+    for start in range(0, len(signal), block_size):
+        block = signal[start:start + block_size]
+        out[start:start + len(block)] = fir.process(block)
+    out[len(signal):] = fir.flush()
+
+    return out
+
+
+def fir_filter(taps, signal, method='auto', block_size=None, out=None):
+    """
+    Apply an FIR filter, picking the fastest method for the tap count and signal length
+    :param taps: Array of FIR filter taps
+    :param signal: An array of samples
+    :param method: 'auto', 'direct', 'oaconvolve', or 'streaming'
+    :param block_size: Samples per block when streaming; None picks one from the number of taps
+    :param out: Output array for streaming (see streaming_fir_filter()); ignored by the other methods
+    :return: The full convolution, the same as np.convolve(signal, taps)
+    """
+    taps = np.asarray(taps, dtype=float)
+
+    if method == 'auto':
+        method = choose_method(len(taps), len(signal))
+
+    if method == 'direct':
+        return np.convolve(np.asarray(signal, dtype=float), taps)
+    if method == 'oaconvolve':
+        return sp.oaconvolve(np.asarray(signal, dtype=float), taps)
+    if method == 'streaming':
+        return streaming_fir_filter(taps, signal, block_size, out)
+
+    raise ValueError("method must be 'auto', 'direct', 'oaconvolve', or 'streaming', not " + repr(method))
+
+
+def benchmark_fir(tap_counts, n_samples=650000, repeats=3, seed=0):
+    """
+    Time every method for a range of tap counts
+    :param tap_counts: List of numbers of taps to try
+    :param n_samples: Length of the test signal (650,000 is a 30 minute record at 360 Hz)
+    :param repeats: Number of runs; the fastest is kept
+    :param seed: Seed for the random test signal
+    :return: List of dictionaries with the taps, the time of each method (seconds), and the automatic choice
+    """
+    rng = np.random.default_rng(seed)
+    signal = rng.standard_normal(n_samples)
+
+    results = list()
+    for n_taps in tap_counts:
+        taps = rng.standard_normal(n_taps)
+        result = {'taps': n_taps, 'auto': choose_method(n_taps, n_samples)}
+
+        for method in ['direct', 'oaconvolve', 'streaming']:
+            best = float('inf')
+            for _ in range(repeats):
+                start = time.perf_counter()
+                fir_filter(taps, signal, method)
+                best = min(best, time.perf_counter() - start)
+            result[method] = best
+
+        results.append(result)
+
+    return results
+
+
+if __name__ == "__main__":
+
+    tap_counts = [8, 20, 64, 128, 256, 512, 1024, 2048, 4096]
+
+    results = benchmark_fir(tap_counts)
+
+    print("Taps|\tDirect (ms)|\tOAConvolve (ms)|\tStreaming (ms)|\tAuto")
+    for r in results:
+        print(r['taps'], "|\t", round(r['direct'] * 1000, 1), "|\t", round(r['oaconvolve'] * 1000, 1), "|\t",
+              round(r['streaming'] * 1000, 1), "|\t", r['auto'])
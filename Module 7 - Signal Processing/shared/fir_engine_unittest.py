@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from fir_engine import StreamingFIR, fir_filter, streaming_fir_filter, choose_method, benchmark_fir
+
+
+class TestFIREngine(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.signal = rng.standard_normal(10007)
+        self.taps = {n: rng.standard_normal(n) for n in [1, 5, 20, 300]}
+
+    def test_methods_match_convolve(self):
+        for taps in self.taps.values():
+            expected = np.convolve(self.signal, taps)
+
+            for method in ['auto', 'direct', 'oaconvolve', 'streaming']:
+                np.testing.assert_allclose(fir_filter(taps, self.signal, method, block_size=1000), expected,
+                                           atol=1e-10)
+
+    def test_streaming_uneven_blocks(self):
+        # blocks shorter than the filter carry the old tail further forward
+        cuts = [0, 3, 4, 150, 152, 160, 5000, len(self.signal)]
+
+        for taps in self.taps.values():
+            fir = StreamingFIR(taps)
+            pieces = [fir.process(self.signal[a:b]) for a, b in zip(cuts[:-1], cuts[1:])]
+            pieces.append(fir.flush())
+
+            for piece, a, b in zip(pieces, cuts[:-1], cuts[1:]):
+                self.assertEqual(len(piece), b - a)
+
+            np.testing.assert_allclose(np.concatenate(pieces), np.convolve(self.signal, taps), atol=1e-10)
+
+    def test_streaming_to_memmap(self):
+        taps = self.taps[20]
+
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "filtered.npy")
+            out = np.lib.format.open_memmap(path, mode='w+', shape=(len(self.signal) + len(taps) - 1,))
+
+            result = fir_filter(taps, self.signal, 'streaming', block_size=1000, out=out)
+            self.assertIs(result, out)
+            out.flush()
+            del result, out
+
+            np.testing.assert_allclose(np.load(path), np.convolve(self.signal, taps), atol=1e-10)
+
+        with self.assertRaises(ValueError):
+            streaming_fir_filter(taps, self.signal, out=np.empty(len(self.signal)))
+
+    def test_choose_method(self):
+        self.assertEqual(choose_method(20, 650000), 'direct')
+        self.assertEqual(choose_method(1024, 650000), 'oaconvolve')
+        self.assertEqual(choose_method(1024, 100), 'direct')
+        self.assertEqual(choose_method(20, 10 ** 8), 'streaming')
+
+        with self.assertRaises(ValueError):
+            fir_filter(self.taps[5], self.signal, 'fft')
+
+    def test_benchmark(self):
+        results = benchmark_fir([8, 512], n_samples=5000, repeats=1)
+
+        self.assertEqual([r['taps'] for r in results], [8, 512])
+        self.assertEqual(results[0]['auto'], 'direct')
+        self.assertTrue(all(r[m] > 0 for r in results for m in ['direct', 'oaconvolve', 'streaming']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import matplotlib.pyplot as plt
+import numpy as np
+import scipy.signal as sp
+from scipy.fft import rfft, rfftfreq
+
+# more points than this are reduced to a min/max envelope before plotting
+default_max_points = 4000
+
+
+def fft_spectrum(signal, f_s):
+    """
+    One-sided amplitude spectrum of a real signal. Uses rfft, so only the non-negative
+    frequencies are ever calculated.
+    :param signal: An array of samples
+    :param f_s: Sampling rate (Hertz)
+    :return:
+    freq: array of frequencies (Hertz)
+    amplitude: |X(freq)|, with the same scaling as numpy's fft
+    """
+    signal = np.asarray(signal, dtype=float)
+
+    return rfftfreq(len(signal), 1 / f_s), np.abs(rfft(signal))
+
+
+def welch_spectrum(signal, f_s, segment_length=4.0, overlap=0.5, window='hann'):
+    """
+    Power spectral density averaged over overlapping segments (Welch's method). Much smoother
+    than a single FFT of a long record, and the frequency resolution is 1 / segment_length.
+    :param signal: An array of samples
+    :param f_s: Sampling rate (Hertz)
+    :param segment_length: Length of each segment (seconds)
+    :param overlap: Fraction of each segment that overlaps the next
+    :param window: Window applied to each segment
+    :return:
+    freq: array of frequencies (Hertz)
+    psd: power spectral density (units^2 / Hz)
+    """
+    signal = np.asarray(signal, dtype=float)
+
+    nperseg = min(int(round(segment_length * f_s)), len(signal))
+    noverlap = int(nperseg * overlap)
+
+    return sp.welch(signal, fs=f_s, window=window, nperseg=nperseg, noverlap=noverlap)
+
+
+def decimate_for_plot(x, y, max_points=default_max_points):
+    """
+    Reduce a long curve to at most max_points points without losing its peaks. The curve is
+    split into equal buckets and only the smallest and largest value in each bucket are kept,
+    so a line plot of the result looks the same as a plot of every point.
+    :param x: Array of x values, in increasing order
+    :param y: Array of y values
+    :param max_points: Largest number of points to return
+    :return: Decimated x and y arrays
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+
+    if len(y) <= max_points:
+        return x, y
+
+    buckets = max_points // 2
+    size = int(np.ceil(len(y) / buckets))
+
+    # pad the last bucket by repeating the final point
+    padding = buckets * size - len(y)
+    x_buckets = np.pad(x, (0, padding), mode='edge').reshape(buckets, size)
+    y_buckets = np.pad(y, (0, padding), mode='edge').reshape(buckets, size)
+
+    rows = np.arange(buckets)
+    low = np.argmin(y_buckets, axis=1)
+    high = np.argmax(y_buckets, axis=1)
+
+    # keep the two points of each bucket in their original order
+    first = np.minimum(low, high)
+    second = np.maximum(low, high)
+    columns = np.column_stack((first, second)).ravel()
+    rows = np.repeat(rows, 2)
+
+    return x_buckets[rows, columns], y_buckets[rows, columns]
+
+
+def plot_spectrum(freq, amplitude, max_points=default_max_points, ylabel='FFT Amplitude |X(freq)|',
+                  title='One-Sided FFT of Signal', show=True):
+    """
+    Plot a spectrum. Short spectra are drawn as a stem plot; long ones are decimated and drawn
+    as a line, since a stem plot of hundreds of thousands of points takes minutes.
+    :param freq: Array of frequencies (Hertz)
+    :param amplitude: Amplitude or power at each frequency
+    :param max_points: Spectra longer than this are decimated
+    :param ylabel: Label for the y axis
+    :param title: Title of the plot
+    :param show: Call plt.show() once drawn
+    :return: None
+    """
+    if len(freq) <= max_points:
+        plt.stem(freq, amplitude, 'b', markerfmt=" ", basefmt="-b")
+    else:
+        plt.plot(*decimate_for_plot(freq, amplitude, max_points), 'b', linewidth=0.8)
+
+    plt.xlabel('Freq (Hz)')
+    plt.ylabel(ylabel)
+    plt.title(title)
+
+    if show:
+        plt.show()
+
+
+def plot_fft_response(signal, f_s, max_points=default_max_points):
+    """
+    Plot the one-sided FFT of a signal
+    :param signal: An array of samples
+    :param f_s: Sampling rate (Hertz)
+    :param max_points: Spectra longer than this are decimated before plotting
+    :return: None
+    """
+    plot_spectrum(*fft_spectrum(signal, f_s), max_points)
@@ -0,0 +1,42 @@
+import unittest
+import numpy as np
+from numpy.fft import fft
+from spectrum_tools import fft_spectrum, welch_spectrum, decimate_for_plot
+
+
+class TestSpectrum(unittest.TestCase):
+    def setUp(self):
+        self.f_s = 360
+        time = np.arange(60 * self.f_s) / self.f_s
+        self.signal = np.sin(2 * np.pi * 12 * time) + 0.1 * np.random.default_rng(0).standard_normal(len(time))
+
+    def test_fft_matches_full_fft(self):
+        freq, amplitude = fft_spectrum(self.signal, self.f_s)
+
+        n = len(self.signal) // 2
+        np.testing.assert_allclose(amplitude[:n], np.abs(fft(self.signal)[:n]), atol=1e-6)
+        np.testing.assert_allclose(freq[:n], np.arange(n) * self.f_s / len(self.signal))
+
+    def test_welch_peak(self):
+        freq, psd = welch_spectrum(self.signal, self.f_s, segment_length=4)
+
+        # resolution is 1 / segment length
+        self.assertAlmostEqual(freq[1] - freq[0], 0.25)
+        self.assertAlmostEqual(freq[np.argmax(psd)], 12)
+
+    def test_decimate_keeps_peaks(self):
+        freq, amplitude = fft_spectrum(self.signal, self.f_s)
+        x, y = decimate_for_plot(freq, amplitude, max_points=1000)
+
+        self.assertLessEqual(len(y), 1000)
+        self.assertEqual(np.max(y), np.max(amplitude))
+        self.assertEqual(np.min(y), np.min(amplitude))
+        self.assertTrue(np.all(np.diff(x) >= 0))
+
+        # short curves are left alone
+        x, y = decimate_for_plot(freq[:500], amplitude[:500], max_points=1000)
+        self.assertEqual(len(y), 500)
+
+
+if __name__ == '__main__':
+    unittest.main()